@@ -0,0 +1,104 @@
+"""Adaptive concurrency against local Ollama stand-ins of different capacity.
+
+Each stand-in runs ``slots`` generations at once and queues the rest, like
+Ollama with ``OLLAMA_NUM_PARALLEL``; the last one also answers 503 once
+``--max-queue`` requests are waiting. For each, it compares serial calls
+with the old 0.1 s pause, a fixed ``--ceiling`` in flight, and the adaptive
+limiter (cold, then warm from the limit it saved). Server latency is the
+time a call spends at the stand-in, queueing included. Exits non-zero if
+the adaptive limiter loses a request, falls well short of the best fixed
+throughput, or learns a limit far from the stand-in's capacity:
+
+    python3 -m benchmarks.adaptive_concurrency --requests 400 --ceiling 16
+"""
+import argparse, os, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from neurometric_benchmark import runners
+from neurometric_benchmark.models import ollama_client
+from neurometric_benchmark.utils.concurrency import InFlightLimiter, AdaptiveLimiter, load_limit, save_limit
+from neurometric_benchmark.utils.stats import StreamingQuantiles
+from benchmarks.standin import serve, ollama_standin
+
+
+def _drive(requests: int, workers: int, limiter, pause: float = 0.0):
+    server = StreamingQuantiles()
+    lock = threading.Lock()
+
+    def timed(model, prompt, temperature=0.7):
+        t0 = time.perf_counter()
+        out = ollama_client.generate(model, prompt, temperature=temperature)
+        with lock:
+            server.add(time.perf_counter() - t0)
+        return out
+
+    def one(i):
+        try:
+            out = runners._call_model(timed, 'standin', f'What is {i} * 7?', 0.7, limiter)
+        except Exception:
+            return False
+        if pause:
+            time.sleep(pause)
+        return bool(out.get('text'))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        ok = sum(pool.map(one, range(requests)))
+    return ok, time.perf_counter() - start, server
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--requests', type=int, default=400)
+    p.add_argument('--delay', type=float, default=0.02, help='Seconds per generation on the stand-in')
+    p.add_argument('--slots', default='1,4,4', help='Generations each stand-in runs at once')
+    p.add_argument('--max-queue', type=int, default=2, help='The last stand-in answers 503 above this many waiting requests')
+    p.add_argument('--ceiling', type=int, default=16, help='Fixed concurrency, and the adaptive ceiling')
+    args = p.parse_args()
+
+    slots = [int(s) for s in args.slots.split(',')]
+    state = os.path.join(tempfile.mkdtemp(), 'concurrency.json')
+    failures = []
+    for i, k in enumerate(slots):
+        max_queue = args.max_queue if i == len(slots) - 1 else None
+        srv, base = serve(ollama_standin(args.delay, slots=k, max_queue=max_queue))
+        ollama_client.configure(endpoints=[base])
+        key = f'{base}|standin'
+        print(f'stand-in with {k} slot(s)' + (f', 503 above {max_queue} queued' if max_queue is not None else ''))
+        results = {}
+        for label, workers, make, pause in (
+            ('serial + 0.1 s pause', 1, lambda: InFlightLimiter(1), 0.1),
+            (f'fixed {args.ceiling} in flight', args.ceiling, lambda: InFlightLimiter(args.ceiling), 0.0),
+            ('adaptive, cold', args.ceiling, lambda: AdaptiveLimiter(load_limit(state, key) or 1, max_limit=args.ceiling), 0.0),
+            ('adaptive, warm', args.ceiling, lambda: AdaptiveLimiter(load_limit(state, key) or 1, max_limit=args.ceiling), 0.0),
+        ):
+            requests = args.requests // 4 if pause else args.requests
+            limiter = make()
+            ok, wall, server = _drive(requests, workers, limiter, pause)
+            results[label] = (ok == requests, requests / wall)
+            line = (f'  {label:22s} {ok:4d}/{requests} ok  {requests / wall:6.1f} req/s  '
+                    f'server p50 {server.quantile(50) * 1000:6.1f} ms  p99 {server.quantile(99) * 1000:6.1f} ms')
+            if isinstance(limiter, AdaptiveLimiter):
+                s = limiter.stats()
+                line += f"  limit {s['start']} -> best {s['best']}  {s['decisions']}"
+                save_limit(state, key, limiter.best)
+            print(line)
+        srv.shutdown()
+        srv.server_close()
+        best_fixed = max(rate for label, (_, rate) in results.items() if not label.startswith('adaptive'))
+        learned = load_limit(state, key)
+        for label in ('adaptive, cold', 'adaptive, warm'):
+            complete, rate = results[label]
+            if not complete or rate < 0.75 * best_fixed:
+                failures.append(f'{k} slot(s), {label}: {rate:.1f} req/s vs {best_fixed:.1f} fixed')
+        # A request or two queued past the slots hides the client's own
+        # turnaround, so a limit up to twice the capacity can really be best.
+        if not k // 2 <= learned <= max(2 * k, k + 2):
+            failures.append(f'{k} slot(s): learned a limit of {learned}')
+    for f in failures:
+        print('FAIL', f)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Ollama requests balanced across several local stand-in servers.
+
+Each stand-in answers one request at a time after ``--delay`` seconds, like
+a model on its own cores; the last one is ``--slow`` times slower. One
+endpoint fails with 503s for a while mid-run and then recovers. Compares a
+single endpoint with routing across all of them at the same concurrency.
+Exits non-zero if a request is lost or the failing endpoint is not ejected
+and re-admitted:
+
+    python3 -m benchmarks.ollama_endpoints --endpoints 3 --requests 300
+"""
+import argparse, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from neurometric_benchmark.models import ollama_client
+from benchmarks.standin import serve, ollama_standin
+
+
+def _drive(requests: int, concurrency: int):
+    def one(i):
+        try:
+            ollama_client._http_generate('standin', f'What is {i} * 7?')[0]['text']
+            return True
+        except Exception:
+            return False
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        ok = sum(pool.map(one, range(requests)))
+    return ok, time.perf_counter() - start
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--endpoints', type=int, default=3)
+    p.add_argument('--requests', type=int, default=300)
+    p.add_argument('--delay', type=float, default=0.01, help='Seconds per generation on each stand-in')
+    p.add_argument('--slow', type=float, default=3.0, help='How much slower the last stand-in is')
+    p.add_argument('--outage', type=float, default=0.3, help='Seconds the failing endpoint answers 503')
+    p.add_argument('--concurrency', type=int, default=8)
+    p.add_argument('--eject-sec', type=float, default=0.1, help='First ejection of a failing endpoint (the client default is 5 s)')
+    args = p.parse_args()
+
+    handlers = [ollama_standin(args.delay * (args.slow if i == args.endpoints - 1 else 1.0)) for i in range(args.endpoints)]
+    servers = [serve(h) for h in handlers]
+    bases = [base for _, base in servers]
+
+    ollama_client.configure(endpoints=bases[:1])
+    ok1, wall1 = _drive(args.requests, args.concurrency)
+
+    ollama_client.EJECT_SEC = args.eject_sec
+    ollama_client.configure(endpoints=bases)
+    flaky = handlers[0]
+
+    def outage():
+        time.sleep(0.1)
+        flaky.status = 503
+        time.sleep(args.outage)
+        flaky.status = 200
+    threading.Thread(target=outage, daemon=True).start()
+    okn, walln = _drive(args.requests, args.concurrency)
+    for srv, _ in servers:
+        srv.shutdown()
+
+    print(f'1 endpoint:   {ok1:5d}/{args.requests} ok  {wall1:6.2f} s  {args.requests / wall1:7.1f} req/s')
+    print(f'{args.endpoints} endpoints:  {okn:5d}/{args.requests} ok  {walln:6.2f} s  {args.requests / walln:7.1f} req/s')
+    eps = ollama_client.stats()['endpoints']
+    for e, h in zip(eps, handlers):
+        print(f"  {e['url']}  delay {h.delay * 1000:4.0f} ms  {e['requests']:4d} ok  {e['failures']:3d} failed  "
+              f"{e['ejections']} ejected  {e['readmissions']} re-admitted  peak {e['peak_in_flight']} in flight  "
+              f"{e['requests_per_sec'] or 0:6.1f} req/s")
+    recovered = eps[0]['ejections'] >= 1 and eps[0]['readmissions'] >= 1 and eps[0]['healthy']
+    sys.exit(0 if okn == ok1 == args.requests and recovered else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Per-request overhead of the Ollama HTTP client against a local stand-in.
+
+Compares the old approach (a fresh ``urllib`` request and TCP connection per
+sample) with the pooled keep-alive client. The stand-in answers instantly, so
+the numbers are pure harness and connection overhead.
+
+    python3 -m benchmarks.ollama_http --requests 2000
+"""
+import argparse, json, time, urllib.request
+
+from neurometric_benchmark.models import ollama_client
+from benchmarks.standin import serve
+
+
+def _urllib_generate(base: str, model: str, prompt: str) -> str:
+    payload = {'model': model, 'prompt': prompt, 'stream': False, 'options': {'temperature': 0.7, 'top_p': 0.95}}
+    req = urllib.request.Request(f'{base}/api/generate', data=json.dumps(payload).encode('utf-8'), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        return json.loads(resp.read().decode('utf-8')).get('response')
+
+
+def _time(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--requests', type=int, default=1000)
+    args = p.parse_args()
+
+    srv, base = serve()
+    ollama_client.configure(endpoints=[base])
+    prompt = 'What is 6 * 7?'
+    before = _time(lambda: _urllib_generate(base, 'standin', prompt), args.requests)
+    after = _time(lambda: ollama_client.generate('standin', prompt), args.requests)
+    srv.shutdown()
+    print(f'urllib, new connection per call: {before * 1e6:8.1f} us/request')
+    print(f'pooled keep-alive client:        {after * 1e6:8.1f} us/request')
+    print(f'speedup: {before / after:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Tail latency of Ollama calls with hedging and deadlines, against stand-ins.
+
+Two stand-ins answer in ``--delay`` seconds, except that every
+``--stall-every``-th request stalls for ``--stall-sec``. Compares plain
+calls, calls hedged at the ``--hedge`` percentile, and plain calls under a
+``--call-timeout`` deadline, then times how long a call takes to give up
+when no server is up at all (health check, then CLI fallback). Exits
+non-zero if hedging loses a request or does not cut p99 latency:
+
+    python3 -m benchmarks.ollama_tail --requests 400 --hedge 95
+"""
+import argparse, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+from neurometric_benchmark.models import ollama_client
+from neurometric_benchmark.utils.stats import latency_summary
+from benchmarks.standin import serve, ollama_standin
+
+
+def _drive(requests: int, concurrency: int):
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            ollama_client.generate('standin', f'What is {i} * 7?')
+            return time.perf_counter() - t0, True
+        except TimeoutError:
+            return time.perf_counter() - t0, False
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    return [lat for lat, _ in results], sum(ok for _, ok in results), time.perf_counter() - start
+
+
+def _stats_delta(before, after):
+    return {k: after[k] - before[k] for k in ('hedges_fired', 'hedges_won', 'deadlines_exceeded', 'health_checks', 'cli_fallbacks')}
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--requests', type=int, default=400)
+    p.add_argument('--concurrency', type=int, default=8)
+    p.add_argument('--delay', type=float, default=0.01)
+    p.add_argument('--stall-every', type=int, default=25)
+    p.add_argument('--stall-sec', type=float, default=1.0)
+    p.add_argument('--hedge', type=float, default=95.0, help='Percentile of observed latency at which to hedge')
+    p.add_argument('--call-timeout', type=float, default=0.25)
+    args = p.parse_args()
+
+    servers = [serve(ollama_standin(args.delay, parallel=True, stall_every=args.stall_every, stall_sec=args.stall_sec)) for _ in range(2)]
+    ollama_client.configure(endpoints=[base for _, base in servers])
+    rows = []
+    for label, hedge, timeout in (('plain', 0, 0), (f'hedged at p{args.hedge:g}', args.hedge, 0), (f'{args.call_timeout:g} s call timeout', 0, args.call_timeout)):
+        ollama_client.configure(hedge_percentile=hedge, call_timeout=timeout)
+        before = ollama_client.stats()
+        lats, ok, wall = _drive(args.requests, args.concurrency)
+        delta = _stats_delta(before, ollama_client.stats())
+        s = latency_summary(lats)
+        rows.append((ok, s))
+        print(f"{label:22s} {ok:4d}/{args.requests} ok  p50 {s['p50'] * 1000:7.1f} ms  p99 {s['p99'] * 1000:7.1f} ms  "
+              f"max {s['max'] * 1000:7.1f} ms  wall {wall:5.2f} s  hedges {delta['hedges_fired']} fired / {delta['hedges_won']} won  "
+              f"deadlines {delta['deadlines_exceeded']}")
+    for srv, _ in servers:
+        srv.shutdown()
+        srv.server_close()
+
+    # Nothing listening: one failed attempt, a health check, then the CLI.
+    srv, base = serve(ollama_standin())
+    srv.shutdown()
+    srv.server_close()
+    ollama_client.configure(endpoints=[base], hedge_percentile=0, call_timeout=0)
+    t0 = time.perf_counter()
+    try:
+        ollama_client.generate('standin', 'What is 6 * 7?')
+        outcome = 'answered by the ollama CLI'
+    except Exception as e:
+        outcome = type(e).__name__
+    print(f'no server up: {time.perf_counter() - t0:.2f} s to fall back ({outcome})')
+
+    (plain_ok, plain), (hedged_ok, hedged), _ = rows
+    sys.exit(0 if hedged_ok == plain_ok == args.requests and hedged['p99'] < plain['p99'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""OpenAI backend against a throttling local stand-in.
+
+The stand-in fakes ``/v1/chat/completions`` with a requests-per-second limit
+(429 + ``retry-after-ms`` above it) and an occasional 500. It compares the
+old approach (a new SDK client per call, SDK default retries) with the shared,
+rate-limited client at the same concurrency. Exits non-zero if the shared
+client loses a request, so it doubles as a check of the retry logic:
+
+    python3 -m benchmarks.openai_backend --requests 300 --rps 50 --concurrency 16
+"""
+import argparse, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+from neurometric_benchmark.models import openai_client
+from benchmarks.standin import serve, chat_standin
+
+
+def _old_generate(model: str, prompt: str) -> str:
+    from openai import OpenAI
+    client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+    resp = client.chat.completions.create(model=model, messages=[{'role': 'user', 'content': prompt}])
+    return resp.choices[0].message.content
+
+
+def _drive(fn, requests: int, concurrency: int):
+    def one(i):
+        try:
+            fn('standin', f'What is {i} * 7?')
+            return True
+        except Exception:
+            return False
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        ok = sum(pool.map(one, range(requests)))
+    return ok, time.perf_counter() - start
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--requests', type=int, default=300)
+    p.add_argument('--rps', type=int, default=50, help='Stand-in limit, requests per second')
+    p.add_argument('--fail-every', type=int, default=40, help='Stand-in answers every k-th request with a 500')
+    p.add_argument('--concurrency', type=int, default=16)
+    p.add_argument('--headroom', type=float, default=0.9, help='Client RPM as a fraction of the stand-in limit')
+    args = p.parse_args()
+
+    os.environ['OPENAI_API_KEY'] = 'standin'
+    results = []
+    for label, fn, configure in (
+        ('new client per call, SDK retries', _old_generate, None),
+        ('shared client, rate-limited', openai_client.generate, lambda: openai_client.configure(rpm=args.rps * 60 * args.headroom)),
+    ):
+        handler = chat_standin(args.rps, args.fail_every)
+        srv, base = serve(handler)
+        os.environ['OPENAI_BASE_URL'] = base + '/v1'
+        if configure:
+            configure()
+        ok, wall = _drive(fn, args.requests, args.concurrency)
+        srv.shutdown()
+        srv.server_close()
+        results.append(ok)
+        print(f"{label:34s} {ok:5d}/{args.requests} ok  {wall:6.2f} s  "
+              f"{args.requests / wall:6.1f} req/s  server saw {handler.counts.get('requests', 0)} requests, "
+              f"{handler.counts.get('throttled', 0)} throttled")
+    print('shared client stats:', openai_client.stats())
+    sys.exit(0 if results[-1] == args.requests else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Local stand-in HTTP servers used by the benchmarks.
+
+They speak just enough of the Ollama API, or of OpenAI chat completions, to
+exercise the clients without a model: every request is answered immediately
+with a canned completion. Ollama answers are one JSON body or, with
+``stream: true``, chunked NDJSON with one token per line.
+"""
+import json, re, time, threading, collections
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+class OllamaStandIn(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # allow keep-alive
+    disable_nagle_algorithm = True  # as Go's net/http (Ollama) does
+    response_text = '42'
+    # Set through ``ollama_standin``: seconds per generation (``slots`` at a
+    # time, like a model on one device, unless ``parallel``), a stall of
+    # ``stall_sec`` on every ``stall_every``-th request, the requests allowed
+    # to wait for the device before a 503 (``max_queue``, None = unbounded),
+    # and the status to answer with.
+    delay = 0.0
+    parallel = False
+    stall_every = 0
+    stall_sec = 0.0
+    max_queue: Optional[int] = None
+    status = 200
+    counts: Dict[str, int] = {}
+    _busy = threading.Semaphore(1)
+    _waiting = [0]
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        body = json.dumps({'version': 'standin'}).encode('utf-8')
+        self.send_response(type(self).status if self.path == '/api/version' else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        req = json.loads(self.rfile.read(length) or b'{}')
+        cls = type(self)
+        with cls._lock:
+            full = cls.max_queue is not None and cls._waiting[0] >= cls.max_queue
+            if not full:
+                cls._waiting[0] += 1
+        if cls.status != 200 or full:
+            with cls._lock:
+                cls.counts['failed'] = cls.counts.get('failed', 0) + 1
+                if not full:
+                    cls._waiting[0] -= 1
+            body = json.dumps({'error': 'unavailable'}).encode('utf-8')
+            self.send_response(503 if full else cls.status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        with cls._lock:
+            cls.counts['requests'] = n = cls.counts.get('requests', 0) + 1
+        delay = cls.stall_sec if cls.stall_every and n % cls.stall_every == 0 else cls.delay
+        if cls.parallel:
+            with cls._lock:
+                cls._waiting[0] -= 1
+            time.sleep(delay)
+        else:
+            with cls._busy:
+                with cls._lock:
+                    cls._waiting[0] -= 1
+                time.sleep(delay)
+        if req.get('stream'):
+            return self._stream(req)
+        body = json.dumps({
+            'model': req.get('model'),
+            'response': self.response_text,
+            'done': True,
+            'prompt_eval_count': len(req.get('prompt', '').split()),
+            'eval_count': 1,
+            'total_duration': 1000,
+            'load_duration': 100,
+            'prompt_eval_duration': 300,
+            'eval_duration': 500,
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, req):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        tokens = re.findall(r'\S+\s*|\s+', self.response_text)
+        try:
+            for tok in tokens:
+                self._chunk({'model': req.get('model'), 'response': tok, 'done': False})
+            self._chunk({'model': req.get('model'), 'response': '', 'done': True,
+                         'prompt_eval_count': len(req.get('prompt', '').split()),
+                         'eval_count': len(tokens), 'eval_duration': 1000 * len(tokens)})
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _chunk(self, obj):
+        line = json.dumps(obj).encode('utf-8') + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+
+    def log_message(self, *args):
+        pass
+
+
+class ChatCompletionsStandIn(BaseHTTPRequestHandler):
+    """``POST /v1/chat/completions`` with an account-style rate limit.
+
+    More than ``rps`` requests within any second get a 429 with
+    ``retry-after-ms`` set to when a slot frees up, and every
+    ``fail_every``-th request (0 = never) gets a 500. Use ``chat_standin`` to
+    get a handler class with its own limits and counters.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    response_text = '42'
+    rps = 0
+    fail_every = 0
+    counts: Dict[str, int] = {}
+    _recent: 'collections.deque[float]' = collections.deque()
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        req = json.loads(self.rfile.read(length) or b'{}')
+        cls = type(self)
+        with cls._lock:
+            cls.counts['requests'] = n = cls.counts.get('requests', 0) + 1
+            now = time.monotonic()
+            while cls._recent and now - cls._recent[0] >= 1.0:
+                cls._recent.popleft()
+            throttle = cls.rps and len(cls._recent) >= cls.rps
+            if throttle:
+                cls.counts['throttled'] = cls.counts.get('throttled', 0) + 1
+                retry_ms = int((1.0 - (now - cls._recent[0])) * 1000) + 1
+            else:
+                cls._recent.append(now)
+            fail = not throttle and cls.fail_every and n % cls.fail_every == 0
+            if fail:
+                cls.counts['failed'] = cls.counts.get('failed', 0) + 1
+        if throttle:
+            return self._json(429, {'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                              {'retry-after-ms': str(retry_ms), 'retry-after': str(max(1, retry_ms // 1000))})
+        if fail:
+            return self._json(500, {'error': {'message': 'The server had an error', 'type': 'server_error'}})
+        prompt = ' '.join(m.get('content', '') for m in req.get('messages', []))
+        self._json(200, {
+            'id': 'chatcmpl-standin',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': req.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.response_text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': 1, 'total_tokens': len(prompt.split()) + 1},
+        })
+
+    def _json(self, status: int, obj, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def chat_standin(rps: int = 0, fail_every: int = 0):
+    """A ``ChatCompletionsStandIn`` subclass with its own limits and counters."""
+    return type('ChatCompletionsStandIn', (ChatCompletionsStandIn,), {
+        'rps': rps, 'fail_every': fail_every, 'counts': {},
+        '_recent': collections.deque(), '_lock': threading.Lock(),
+    })
+
+
+def ollama_standin(delay: float = 0.0, parallel: bool = False, stall_every: int = 0, stall_sec: float = 0.0,
+                   slots: int = 1, max_queue: Optional[int] = None):
+    """An ``OllamaStandIn`` subclass taking ``delay`` seconds per request.
+
+    Requests are served ``slots`` at a time (like ``OLLAMA_NUM_PARALLEL``)
+    unless ``parallel``; every ``stall_every``-th takes ``stall_sec``
+    instead. With ``max_queue``, requests beyond that many waiting for a slot
+    get a 503, as Ollama does when its queue is full. Set ``status`` on the
+    class (e.g. 503) to make it fail until reset.
+    """
+    return type('OllamaStandIn', (OllamaStandIn,), {
+        'delay': delay, 'parallel': parallel, 'stall_every': stall_every, 'stall_sec': stall_sec,
+        'max_queue': max_queue, 'status': 200, 'counts': {}, '_busy': threading.Semaphore(slots),
+        '_waiting': [0], '_lock': threading.Lock(),
+    })
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients hang up mid-stream on purpose
+
+
+def serve(handler=OllamaStandIn) -> Tuple[ThreadingHTTPServer, str]:
+    """Start ``handler`` on a free localhost port; return the server and its base URL."""
+    srv = _Server(('127.0.0.1', 0), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f'http://127.0.0.1:{srv.server_address[1]}'
@@ -0,0 +1,60 @@
+"""CLI startup cost, measured with ``python -X importtime``.
+
+Each entry point is imported in a fresh interpreter several times and the
+fastest cumulative import time is compared with its budget. Modules that an
+entry point must not pull in (matplotlib for ``run``, the OpenAI SDK unless
+that backend is chosen) fail the check regardless of time. Exits non-zero on
+any failure, so it can gate CI:
+
+    python3 -m benchmarks.startup --repeat 5
+"""
+import argparse, subprocess, sys
+from typing import Dict, List, Tuple
+
+# (module, budget in ms, modules it must not import)
+CHECKS: List[Tuple[str, float, Tuple[str, ...]]] = [
+    ('neurometric_benchmark.main', 100.0, ('matplotlib', 'numpy', 'openai', 'neurometric_benchmark.runners')),
+    ('neurometric_benchmark.runners', 250.0, ('matplotlib', 'numpy', 'openai')),
+    ('neurometric_benchmark.models.openai_client', 50.0, ('openai',)),
+]
+
+
+def _importtime(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every module ``module`` loads."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def _leaked(times: Dict[str, int], forbidden: Tuple[str, ...]) -> List[str]:
+    """The modules in ``times`` that are, or belong to, a ``forbidden`` one."""
+    return sorted(m for m in times if m.split('.')[0] in forbidden or m in forbidden)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per entry point (fastest counts)')
+    p.add_argument('--scale', type=float, default=1.0, help='Multiply every budget, e.g. on slow CI machines')
+    args = p.parse_args()
+
+    failed = False
+    for module, budget_ms, forbidden in CHECKS:
+        runs = [_importtime(module) for _ in range(max(1, args.repeat))]
+        best_ms = min(r[module] for r in runs) / 1000.0
+        limit = budget_ms * args.scale
+        leaked = _leaked(runs[0], forbidden)
+        ok = best_ms <= limit and not leaked
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {module:45s} {best_ms:7.1f} ms (budget {limit:.0f} ms)")
+        if leaked:
+            print(f'     imports {", ".join(leaked[:5])}' + (' ...' if len(leaked) > 5 else ''))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
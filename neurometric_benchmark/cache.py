@@ -0,0 +1,127 @@
+import os, json, time, sqlite3, hashlib, threading
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_PATH = os.path.join('.ttc_cache', 'generations.sqlite')
+CACHE_MODES = ('read', 'write', 'off')
+
+
+class GenerationCache:
+    """Content-addressed on-disk cache of model generations (SQLite).
+
+    Entries are keyed on backend, model, the exact prompt, sampling options and
+    the sample index, so a rerun with identical settings replays the same
+    candidates without calling the model. ``mode`` is ``read`` (use hits, never
+    store), ``write`` (use hits and store misses) or ``off``. The cache is kept
+    under ``max_bytes`` and ``max_age_sec`` by evicting least-recently-used rows.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, mode: str = 'write', backend: str = '', max_bytes: int = 1 << 30, max_age_sec: float = 30 * 86400):
+        if mode not in CACHE_MODES:
+            raise ValueError('Unknown cache mode: ' + mode)
+        self.path = path
+        self.mode = mode
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if mode != 'off':
+            d = os.path.dirname(path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS generations ('
+                ' key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,'
+                ' gen_sec REAL NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS generations_lru ON generations(last_used)')
+            self._db.commit()
+            if mode == 'write':
+                self.evict()
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    def key(self, model: str, prompt: str, options: Dict[str, Any], sample_idx: int) -> str:
+        blob = json.dumps({
+            'backend': self.backend,
+            'model': model,
+            'prompt': prompt,
+            'options': options,
+            'sample_idx': sample_idx,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT value, gen_sec, created FROM generations WHERE key = ?', (key,)).fetchone()
+            if row is None or now - row[2] > self.max_age_sec:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.seconds_saved += row[1]
+            if self.mode == 'write':
+                self._db.execute('UPDATE generations SET last_used = ? WHERE key = ?', (now, key))
+                self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, out: Dict[str, Any], gen_sec: float) -> None:
+        if self._db is None or self.mode != 'write':
+            return
+        value = json.dumps(out, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO generations (key, value, size, gen_sec, created, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, value, len(value), gen_sec, now, now),
+            )
+            self._db.commit()
+            self._puts += 1
+        if self._puts % 100 == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired rows, then least-recently-used rows until under ``max_bytes``."""
+        if self._db is None:
+            return 0
+        with self._lock:
+            cur = self._db.execute('DELETE FROM generations WHERE created < ?', (time.time() - self.max_age_sec,))
+            removed = cur.rowcount
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM generations').fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                doomed = []
+                for key, size in self._db.execute('SELECT key, size FROM generations ORDER BY last_used'):
+                    doomed.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                self._db.executemany('DELETE FROM generations WHERE key = ?', doomed)
+                removed += len(doomed)
+            self._db.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'hits': self.hits,
+            'misses': self.misses,
+            'seconds_saved': self.seconds_saved,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
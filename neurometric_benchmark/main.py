@@ -1,22 +1,87 @@
 import argparse, os
-from .runners import evaluate
-from .report import render
-from .rich_report import generate_report as generate_rich_report
 from .utils.logging import ensure_dir
 
+# Subcommand dependencies are imported where they are used, so that e.g. a
+# `run` does not pay for matplotlib and `report` does not start the runner.
+
 def main():
     p = argparse.ArgumentParser(description='Neurometric TTC Benchmark Harness')
     sub = p.add_subparsers(dest='cmd', required=True)
 
     runp = sub.add_parser('run', help='Run a benchmark')
-    runp.add_argument('--task', required=True, help='Path to JSONL task file')
-    runp.add_argument('--model', required=True, help='Model spec, e.g., ollama/llama3.2:1b-instruct or openai/gpt-4o')
-    runp.add_argument('--strategy', choices=['single', 'best_of_n'], default='single')
-    runp.add_argument('--n', type=int, default=1, help='Number of samples for best_of_n')
+    runp.add_argument('--task', help='Path to JSONL task file')
+    runp.add_argument('--model', help='Model spec, e.g., ollama/llama3.2:1b-instruct or openai/gpt-4o')
+    runp.add_argument('--resume', default=None, metavar='RUN_DIR', help='Continue an interrupted run in RUN_DIR with its recorded settings, skipping finished tasks')
+    runp.add_argument('--strategy', choices=['single', 'best_of_n', 'adaptive_best_of_n', 'sweep', 'budgeted', 'cascade'], default='single')
+    runp.add_argument('--n', type=int, default=1, help='Number of samples for best_of_n (maximum for adaptive_best_of_n, N_max for sweep, per-task cap for budgeted if > 1)')
+    runp.add_argument('--wave-size', type=int, default=0, help='adaptive_best_of_n: samples per wave (default: --concurrency); budgeted: samples per allocation (default 2)')
+    runp.add_argument('--consensus', type=int, default=3, help='adaptive_best_of_n/budgeted: stop once this many candidates agree (and are a majority)')
+    runp.add_argument('--budget', type=float, default=None, help='budgeted: total budget for the whole task file, in --budget-unit')
+    runp.add_argument('--budget-unit', choices=['samples', 'tokens', 'seconds'], default='samples', help='budgeted: what --budget counts (output tokens, wall-clock seconds)')
+    runp.add_argument('--task-token-budget', type=int, default=None, help='adaptive_best_of_n: stop a task after this many completion tokens')
+    runp.add_argument('--task-time-budget', type=float, default=None, help='adaptive_best_of_n: stop a task after this many seconds')
+    runp.add_argument('--escalate-to', default=None, metavar='MODEL', help='cascade: larger model for tasks the --model answer fails, e.g. ollama/qwen2.5:7b-instruct or openai/gpt-4o')
+    runp.add_argument('--escalate-below', type=float, default=1.0, help='cascade: escalate when the verifier score is below this')
+    runp.add_argument('--escalate-n', type=int, default=1, help='cascade: samples from the larger model (best-of-N if > 1)')
     runp.add_argument('--temperature', type=float, default=0.7)
+    runp.add_argument('--concurrency', type=int, default=1, help='Max model requests in flight at once, shared by all tasks (1 = serial)')
+    runp.add_argument('--task-concurrency', type=int, default=1, help='Number of tasks evaluated in parallel')
+    runp.add_argument('--adaptive-concurrency', action='store_true', help='Tune requests in flight from measured tokens/sec and latency, up to --concurrency; the best limit is remembered per endpoint and model')
+    runp.add_argument('--concurrency-state', default=os.path.join('.ttc_cache', 'concurrency.json'), help='JSON file of learned limits for --adaptive-concurrency')
+    runp.add_argument('--cache', choices=['read', 'write', 'off'], default='off', help='Generation cache mode: read (hits only), write (read-through) or off')
+    runp.add_argument('--cache-path', default=os.path.join('.ttc_cache', 'generations.sqlite'), help='SQLite file for the generation cache')
+    runp.add_argument('--cache-max-mb', type=float, default=1024, help='Evict least-recently-used entries above this size')
+    runp.add_argument('--cache-max-age-days', type=float, default=30, help='Evict entries older than this')
+    runp.add_argument('--stream', action='store_true', help='Ollama: stream samples and stop each one once its answer is complete')
+    runp.add_argument('--verify-memo', choices=['memory', 'disk', 'off'], default='memory', help='Reuse verification of duplicate candidates: within the run (memory), across runs (disk), or off')
+    runp.add_argument('--verify-memo-path', default=os.path.join('.ttc_cache', 'verifications.sqlite'), help='SQLite file for --verify-memo disk')
+    runp.add_argument('--no-sandbox', action='store_true', help='Run Python verification in-process instead of in sandboxed workers')
+    runp.add_argument('--sandbox-workers', type=int, default=None, help='Worker processes for Python verification')
+    runp.add_argument('--verify-timeout', type=float, default=None, help='Wall-clock limit per Python candidate (seconds)')
+    runp.add_argument('--verify-memory-mb', type=int, default=None, help='Address-space limit per verifier worker (MB)')
+    runp.add_argument('--connect-timeout', type=float, default=None, help='Ollama connect timeout in seconds')
+    runp.add_argument('--read-timeout', type=float, default=None, help='Ollama per-request read timeout in seconds')
+    runp.add_argument('--keep-alive', default=None, help="Ollama keep_alive sent with each request, e.g. 30m or -1 ('' to omit)")
+    runp.add_argument('--call-timeout', type=float, default=None, help='Ollama: give up on one generation (retries and CLI fallback included) after this many seconds')
+    runp.add_argument('--task-deadline', type=float, default=None, help='Ollama: seconds from the start of a task after which its remaining samples count as failed')
+    runp.add_argument('--hedge', type=float, default=None, metavar='PCT', help='Ollama: duplicate a request still running at this percentile of observed latency (e.g. 95) and keep the first answer')
+    runp.add_argument('--ollama-endpoints', default=None, metavar='URL[,URL...]', help='Ollama servers to balance requests across (default: $OLLAMA_BASE_URL)')
+    runp.add_argument('--openai-rpm', type=float, default=None, help='OpenAI: requests per minute to stay under (default: unlimited)')
+    runp.add_argument('--openai-tpm', type=float, default=None, help='OpenAI: tokens per minute to stay under (default: unlimited)')
+    runp.add_argument('--openai-max-retries', type=int, default=None, help='OpenAI: retries on 429/5xx/connection errors (default 6)')
+    runp.add_argument('--progress-every', type=float, default=5.0, metavar='SEC', help='Rewrite progress.json in the run directory this often (0 = only at start and end)')
+    runp.add_argument('--metrics-port', type=int, default=None, help='Serve live run metrics for Prometheus on http://127.0.0.1:PORT/metrics')
+    runp.add_argument('--shard', default=None, metavar='I/K', help='Only run shard I of K (0-based, stable hash of task id)')
     runp.add_argument('--meta-notes', default='', help='Notes to save in run config')
     runp.add_argument('--run-root', default='runs', help='Where to write run artifacts')
 
+    mat = sub.add_parser('matrix', help='Run a grid of models x N x temperature (etc.) in one process, one run dir per cell')
+    mat.add_argument('spec', nargs='?', help='JSON grid spec, e.g. {"task": "tasks/math/basic.jsonl", "strategy": "best_of_n", "grid": [{"model": ["ollama/a", "ollama/b"], "n": [1, 4, 16]}]}')
+    mat.add_argument('--run-root', default=None, help='Where to write the cell runs (default: the spec\'s run_root, else runs)')
+    mat.add_argument('--resume', default=None, metavar='MATRIX_DIR', help='Continue an interrupted matrix, skipping finished cells')
+
+    mrg = sub.add_parser('merge', help='Combine shard run directories into one run')
+    mrg.add_argument('run_dirs', nargs='+', help='Shard run directories')
+    mrg.add_argument('--run-root', default='runs', help='Where to write the merged run')
+    mrg.add_argument('--task', default=None, help='Task file that fixes record order (default: the one the shards used)')
+
+    rsc = sub.add_parser('rescore', help='Re-verify and re-select the candidates a run stored, without calling any model')
+    rsc.add_argument('run_dir', help='Run directory whose details.jsonl has the candidates')
+    rsc.add_argument('--run-root', default='runs', help='Where to write the re-scored run')
+    rsc.add_argument('--task', default=None, help='Task file to verify against (default: the one the run used; prompts must match)')
+    rsc.add_argument('--strategy', choices=['single', 'best_of_n', 'adaptive_best_of_n', 'sweep', 'budgeted', 'cascade'], default=None, help='Selection strategy (default: the run\'s)')
+    rsc.add_argument('--n', type=int, default=None, help='Samples per task, at most what the run drew (default: the run\'s)')
+    rsc.add_argument('--wave-size', type=int, default=None, help='adaptive_best_of_n/budgeted: samples per wave (default: the run\'s)')
+    rsc.add_argument('--consensus', type=int, default=None, help='adaptive_best_of_n/budgeted: agreement that settles a task (default: the run\'s)')
+    rsc.add_argument('--escalate-below', type=float, default=None, help='cascade: escalation threshold (default: the run\'s)')
+    rsc.add_argument('--concurrency', type=int, default=None, help='Candidates verified in parallel per task')
+    rsc.add_argument('--task-concurrency', type=int, default=None, help='Tasks re-scored in parallel')
+    rsc.add_argument('--verify-memo', choices=['memory', 'disk', 'off'], default=None, help='Reuse verification of duplicate candidates (default: the run\'s)')
+    rsc.add_argument('--verify-memo-path', default=None, help='SQLite file for --verify-memo disk')
+    rsc.add_argument('--no-sandbox', action='store_true', help='Run Python verification in-process instead of in sandboxed workers')
+    rsc.add_argument('--sandbox-workers', type=int, default=None, help='Worker processes for Python verification')
+    rsc.add_argument('--verify-timeout', type=float, default=None, help='Wall-clock limit per Python candidate (seconds)')
+
     rep = sub.add_parser('report', help='Render an HTML report for a given run dir')
     rep.add_argument('--run-dir', required=True, help='Path to a run directory containing details.jsonl and summary.json')
     rep.add_argument('--out', default=None, help='Output HTML path (defaults to reports/report_TIMESTAMP.html)')
@@ -25,19 +90,84 @@ def main():
     rich.add_argument('--runs-root', default='runs', help='Directory containing run_* subdirectories')
     rich.add_argument('--out-dir', default='reports', help='Where to write the rich report')
     rich.add_argument('--title', default='Neurometric TTC Benchmark Report')
+    rich.add_argument('--index', default=None, help='Run index file (default: RUNS_ROOT/index.sqlite)')
+    rich.add_argument('--no-refresh', action='store_true', help='Use the index as is instead of picking up new or changed runs first')
+    rich.add_argument('--task-file', default=None, help='Only runs whose task file path contains this')
+    rich.add_argument('--model', default=None, help='Only runs whose model name contains this')
+    rich.add_argument('--since', default=None, metavar='YYYY-MM-DD', help='Only runs finished on or after this date')
+    rich.add_argument('--until', default=None, metavar='YYYY-MM-DD', help='Only runs finished on or before this date')
+    rich.add_argument('--workers', type=int, default=None, help='Processes for re-rendering changed figures (default: one per CPU)')
+
+    idx = sub.add_parser('index', help='Update (or rebuild) the run index used by rich_report')
+    idx.add_argument('--runs-root', default='runs', help='Directory containing run_* subdirectories')
+    idx.add_argument('--index', default=None, help='Run index file (default: RUNS_ROOT/index.sqlite)')
+    idx.add_argument('--rebuild', action='store_true', help='Drop the index and re-read every run')
 
     args = p.parse_args()
     if args.cmd == 'run':
-        backend, name = args.model.split('/', 1)
+        from .runners import evaluate, load_run_config
+        from .report import render
+        if args.resume:
+            kwargs = load_run_config(args.resume)
+            kwargs['resume_dir'] = args.resume
+        elif not args.task or not args.model:
+            p.error('run requires --task and --model (or --resume RUN_DIR)')
+        else:
+            backend, name = args.model.split('/', 1)
+            kwargs = dict(
+                task_path=args.task,
+                model_backend=backend,
+                model_name=name,
+                strategy=args.strategy,
+                temperature=args.temperature,
+                n=args.n,
+                meta_notes=args.meta_notes,
+                concurrency=args.concurrency,
+                task_concurrency=args.task_concurrency,
+                cache_mode=args.cache,
+                wave_size=args.wave_size,
+                consensus=args.consensus,
+                task_token_budget=args.task_token_budget,
+                task_time_budget=args.task_time_budget,
+                stream=args.stream,
+                verify_memo=args.verify_memo,
+                shard=args.shard,
+                budget=args.budget,
+                budget_unit=args.budget_unit,
+                escalate_to=args.escalate_to,
+                escalate_below=args.escalate_below,
+                escalate_n=args.escalate_n,
+                task_deadline=args.task_deadline,
+                adaptive_concurrency=args.adaptive_concurrency,
+            )
+            if args.adaptive_concurrency and args.concurrency <= 1:
+                p.error('--adaptive-concurrency needs --concurrency above 1 as its ceiling')
+            if args.strategy == 'budgeted' and not args.budget:
+                p.error('--strategy budgeted requires --budget')
+            if args.strategy == 'cascade' and (not args.escalate_to or '/' not in args.escalate_to):
+                p.error('--strategy cascade requires --escalate-to BACKEND/MODEL')
+        from .verifiers import sandbox
+        sandbox.configure(not args.no_sandbox, args.sandbox_workers, args.verify_timeout, args.verify_memory_mb)
+        backends = {kwargs['model_backend'], (kwargs.get('escalate_to') or '/').split('/', 1)[0]}
+        if 'ollama' in backends:
+            from .models import ollama_client
+            endpoints = args.ollama_endpoints.split(',') if args.ollama_endpoints else None
+            ollama_client.configure(args.connect_timeout, args.read_timeout, args.keep_alive, endpoints, args.call_timeout, args.hedge)
+        if 'openai' in backends:
+            from .models import openai_client
+            openai_client.configure(args.openai_rpm, args.openai_tpm, args.openai_max_retries)
+        if args.metrics_port:
+            print(f'Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics')
         out = evaluate(
-            task_path=args.task,
-            model_backend=backend,
-            model_name=name,
-            strategy=args.strategy,
-            temperature=args.temperature,
-            n=args.n,
             run_root=args.run_root,
-            meta_notes=args.meta_notes
+            cache_path=args.cache_path,
+            cache_max_mb=args.cache_max_mb,
+            cache_max_age_days=args.cache_max_age_days,
+            verify_memo_path=args.verify_memo_path,
+            concurrency_state_path=args.concurrency_state,
+            progress_every=args.progress_every,
+            metrics_port=args.metrics_port,
+            **kwargs
         )
         run_dir = out['run_dir']
         print(f'Run complete: {run_dir}')
@@ -46,7 +176,71 @@ def main():
         render(os.path.join(run_dir, 'details.jsonl'), os.path.join(run_dir, 'summary.json'), out_html)
         print(f'Report written: {out_html}')
 
+    elif args.cmd == 'matrix':
+        import json
+        from .matrix import run_matrix
+        if not args.spec and not args.resume:
+            p.error('matrix requires a SPEC file (or --resume MATRIX_DIR)')
+        spec = None
+        if args.spec:
+            with open(args.spec, 'r', encoding='utf-8') as f:
+                spec = json.load(f)
+
+        def progress(i, total, entry):
+            c = entry['settings']
+            label = f"{c['model_backend']}/{c['model_name']} {c['strategy']} n={c.get('n', 1)} T={c['temperature']}"
+            if entry['status'] == 'done':
+                print(f"[{i}/{total}] {label}: accuracy {entry['accuracy']:.2%} in {entry['duration_sec']:.1f} s "
+                      f"({entry['cache_hits']} shared samples) -> {entry['run_dir']}")
+            else:
+                print(f"[{i}/{total}] {label}: {entry['error']}")
+
+        out = run_matrix(spec, args.run_root, args.resume, progress)
+        m = out['manifest']
+        failed = sum(1 for e in m['cells'] if e['status'] != 'done')
+        print(f"Matrix complete: {out['matrix_dir']} ({len(m['cells'])} cells, {failed} failed, "
+              f"{m['model_loads']} model loads vs {m['model_loads_in_spec_order']} in spec order)")
+        if failed:
+            raise SystemExit(1)
+
+    elif args.cmd == 'merge':
+        from .merge import merge_runs
+        from .report import render
+        out = merge_runs(args.run_dirs, args.run_root, args.task)
+        run_dir = out['run_dir']
+        print(f"Merged {len(args.run_dirs)} runs ({out['summary']['num_tasks']} tasks): {run_dir}")
+        ensure_dir('reports')
+        out_html = os.path.join('reports', os.path.basename(run_dir).replace('run_', 'report_') + '.html')
+        render(os.path.join(run_dir, 'details.jsonl'), os.path.join(run_dir, 'summary.json'), out_html)
+        print(f'Report written: {out_html}')
+
+    elif args.cmd == 'rescore':
+        from .rescore import rescore_run
+        from .report import render
+        from .verifiers import sandbox
+        sandbox.configure(not args.no_sandbox, args.sandbox_workers, args.verify_timeout)
+        out = rescore_run(
+            args.run_dir, args.run_root, args.task,
+            verify_memo_path=args.verify_memo_path,
+            strategy=args.strategy,
+            n=args.n,
+            wave_size=args.wave_size,
+            consensus=args.consensus,
+            escalate_below=args.escalate_below,
+            concurrency=args.concurrency,
+            task_concurrency=args.task_concurrency,
+            verify_memo=args.verify_memo,
+        )
+        run_dir = out['run_dir']
+        s = out['summary']
+        print(f"Re-scored {s['num_tasks']} tasks in {s['duration_sec']:.1f} s, accuracy {s['accuracy']:.2%}: {run_dir}")
+        ensure_dir('reports')
+        out_html = os.path.join('reports', os.path.basename(run_dir).replace('run_', 'report_') + '.html')
+        render(os.path.join(run_dir, 'details.jsonl'), os.path.join(run_dir, 'summary.json'), out_html)
+        print(f'Report written: {out_html}')
+
     elif args.cmd == 'report':
+        from .report import render
         run_dir = args.run_dir
         out_html = args.out or os.path.join('reports', os.path.basename(run_dir).replace('run_', 'report_') + '.html')
         ensure_dir(os.path.dirname(out_html))
@@ -54,8 +248,29 @@ def main():
         print(f'Report written: {out_html}')
 
     elif args.cmd == 'rich_report':
-        paths = generate_rich_report(args.runs_root, args.out_dir, args.title)
+        from .rich_report import generate_report as generate_rich_report
+        paths = generate_rich_report(
+            args.runs_root, args.out_dir, args.title,
+            index_path=args.index,
+            refresh=not args.no_refresh,
+            task_path=args.task_file,
+            model=args.model,
+            since=args.since,
+            until=args.until,
+            workers=args.workers,
+        )
+        print(f"Figures re-rendered: {len(paths['rendered'])} ({', '.join(paths['rendered']) or 'none changed'})")
         print(f"Rich report written: {paths['html']} and {paths['markdown']}")
 
+    elif args.cmd == 'index':
+        from .run_index import RunIndex, default_index_path
+        index_path = args.index or default_index_path(args.runs_root)
+        idx = RunIndex(index_path)
+        try:
+            counts = idx.ingest(args.runs_root, rebuild=args.rebuild)
+        finally:
+            idx.close()
+        print(f"Index {index_path}: {counts['total']} runs ({counts['added']} added, {counts['updated']} updated, {counts['removed']} removed)")
+
 if __name__ == '__main__':
     main()
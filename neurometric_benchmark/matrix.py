@@ -0,0 +1,173 @@
+import os, json, datetime, inspect, itertools
+from typing import Dict, Any, List, Optional, Callable
+
+from .runners import evaluate
+from .utils.logging import new_run_dir, save_json
+
+MANIFEST = 'matrix.json'
+_EVALUATE_ARGS = set(inspect.signature(evaluate).parameters) - {'run_root', 'resume_dir', 'model_backend', 'model_name'}
+# Same defaults as `run`.
+_DEFAULTS = {'strategy': 'single', 'temperature': 0.7}
+# Backend and verifier settings, named after the `run` flags. They hold for the
+# whole process, so a spec sets them once at its top level, not per cell.
+CLIENT_SETTINGS = ('ollama_endpoints', 'connect_timeout', 'read_timeout', 'keep_alive', 'call_timeout', 'hedge',
+                   'openai_rpm', 'openai_tpm', 'openai_max_retries',
+                   'sandbox', 'sandbox_workers', 'verify_timeout', 'verify_memory_mb')
+
+
+def configure_clients(settings: Dict[str, Any]) -> None:
+    """Apply ``CLIENT_SETTINGS`` the way `run` applies the matching flags."""
+    from .verifiers import sandbox
+    sandbox.configure(settings.get('sandbox'), settings.get('sandbox_workers'), settings.get('verify_timeout'), settings.get('verify_memory_mb'))
+    if any(k in settings for k in CLIENT_SETTINGS[:6]):
+        from .models import ollama_client
+        endpoints = settings.get('ollama_endpoints')
+        if isinstance(endpoints, str):
+            endpoints = endpoints.split(',')
+        ollama_client.configure(settings.get('connect_timeout'), settings.get('read_timeout'), settings.get('keep_alive'),
+                                endpoints, settings.get('call_timeout'), settings.get('hedge'))
+    if any(k in settings for k in CLIENT_SETTINGS[6:9]):
+        from .models import openai_client
+        openai_client.configure(settings.get('openai_rpm'), settings.get('openai_tpm'), settings.get('openai_max_retries'))
+
+
+def _cell(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """``evaluate`` keyword arguments for one cell's settings."""
+    kw = dict(_DEFAULTS)
+    for k, v in settings.items():
+        if k == 'model':
+            if '/' not in str(v):
+                raise ValueError(f'Matrix model must be BACKEND/MODEL, got {v!r}')
+            kw['model_backend'], kw['model_name'] = v.split('/', 1)
+        elif k == 'task':
+            kw['task_path'] = v
+        elif k in _EVALUATE_ARGS:
+            kw[k] = v
+        elif k in CLIENT_SETTINGS:
+            raise ValueError(f'{k} applies to the whole matrix; set it at the top level of the spec')
+        else:
+            raise ValueError('Unknown matrix setting: ' + k)
+    if 'task_path' not in kw or 'model_backend' not in kw:
+        raise ValueError('Every matrix cell needs a task and a model')
+    return kw
+
+
+def expand(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The cells of ``spec`` as ``evaluate`` keyword arguments, in spec order.
+
+    ``spec`` holds the settings shared by every cell plus ``grid``: a dict,
+    or a list of dicts, mapping settings to a value or a list of values. Each
+    dict contributes the cartesian product of its lists; duplicates are
+    dropped. Settings are ``evaluate`` arguments, with ``task`` for
+    ``task_path`` and ``model`` as ``backend/name``. ``CLIENT_SETTINGS`` are
+    not cell settings; ``run_matrix`` applies them to the whole matrix.
+    """
+    common = {k: v for k, v in spec.items() if k not in ('grid', 'run_root') and k not in CLIENT_SETTINGS}
+    grids = spec.get('grid') or [{}]
+    if isinstance(grids, dict):
+        grids = [grids]
+    cells: List[Dict[str, Any]] = []
+    seen = set()
+    for grid in grids:
+        axes = [v if isinstance(v, list) else [v] for v in grid.values()]
+        for combo in itertools.product(*axes):
+            cell = _cell(dict(common, **dict(zip(grid, combo))))
+            key = json.dumps(cell, sort_keys=True)
+            if key not in seen:
+                seen.add(key)
+                cells.append(cell)
+    return cells
+
+
+def _model(cell: Dict[str, Any]) -> str:
+    return f"{cell['model_backend']}/{cell['model_name']}"
+
+
+def schedule(cells: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run every cell of a model back to back, models in order of first appearance.
+
+    Within a model, cells go by temperature and then ``n``, so cells that
+    can share samples run next to each other.
+    """
+    first: Dict[str, int] = {}
+    for c in cells:
+        first.setdefault(_model(c), len(first))
+    return sorted(cells, key=lambda c: (first[_model(c)], c['temperature'], c.get('n', 1)))
+
+
+def model_loads(cells: List[Dict[str, Any]]) -> int:
+    """How many times the model changes when running ``cells`` in order (the first load included)."""
+    return sum(1 for i, c in enumerate(cells) if i == 0 or _model(c) != _model(cells[i - 1]))
+
+
+def run_matrix(spec: Optional[Dict[str, Any]] = None, run_root: Optional[str] = None, resume_dir: Optional[str] = None,
+               progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Run every cell of ``spec`` in one process, one run directory per cell.
+
+    Cells are ordered by ``schedule``. Unless the spec sets ``cache_mode``,
+    all cells share a generation cache in the matrix directory, so sample
+    ``i`` of a prompt at one temperature is drawn once for every N and
+    strategy that needs it. Cells that reuse samples are faster, and their
+    durations show it, but their costs are unchanged.
+
+    Progress is kept in ``matrix.json`` in a ``matrix_*`` directory under
+    ``run_root``. With ``resume_dir`` an interrupted matrix carries on:
+    finished cells are skipped, and the others start over, mostly from the
+    cache. A failing cell is recorded and the rest still run. ``progress(i,
+    total, entry)`` is called after each cell.
+
+    The spec's ``CLIENT_SETTINGS`` (Ollama endpoints, timeouts and hedging,
+    OpenAI rate limits, the verifier sandbox) are applied before the first
+    cell, kept in the manifest for a resume, and recorded as ``clients`` in
+    every cell's ``run_config.json``.
+    """
+    if resume_dir:
+        matrix_dir = resume_dir
+        with open(os.path.join(matrix_dir, MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    else:
+        if spec is None:
+            raise ValueError('Need a matrix spec or a matrix directory to resume')
+        run_root = run_root or spec.get('run_root', 'runs')
+        in_spec_order = expand(spec)
+        cells = schedule(in_spec_order)
+        matrix_dir = new_run_dir(run_root, prefix='matrix')
+        if 'cache_mode' not in spec:
+            shared = {'cache_mode': 'write', 'cache_path': os.path.join(matrix_dir, 'generations.sqlite')}
+            cells = [dict(c, **shared) for c in cells]
+        manifest = {
+            'spec': spec,
+            'run_root': run_root,
+            'clients': {k: spec[k] for k in CLIENT_SETTINGS if k in spec},
+            'model_loads': model_loads(cells),
+            'model_loads_in_spec_order': model_loads(in_spec_order),
+            'cells': [{'settings': c, 'status': 'pending', 'run_dir': None} for c in cells],
+        }
+    path = os.path.join(matrix_dir, MANIFEST)
+    save_json(path, manifest)
+    clients = manifest.get('clients') or {}
+    configure_clients(clients)
+
+    entries = manifest['cells']
+    for i, entry in enumerate(entries, 1):
+        if entry['status'] == 'done':
+            continue
+        entry.update(status='running', started=datetime.datetime.now().isoformat(timespec='seconds'), error=None)
+        save_json(path, manifest)
+        try:
+            out = evaluate(run_root=manifest['run_root'], **entry['settings'])
+        except Exception as e:
+            entry.update(status='error', error=f'{type(e).__name__}: {e}')
+        else:
+            cfg_path = os.path.join(out['run_dir'], 'run_config.json')
+            with open(cfg_path, 'r', encoding='utf-8') as f:
+                cfg = json.load(f)
+            cfg['clients'] = clients
+            save_json(cfg_path, cfg)
+            s = out['summary']
+            entry.update(status='done', run_dir=out['run_dir'], accuracy=s['accuracy'], avg_samples=s['avg_samples'],
+                         total_cost_usd=s['total_cost_usd'], duration_sec=s['duration_sec'], cache_hits=s['cache']['hits'])
+        save_json(path, manifest)
+        if progress is not None:
+            progress(i, len(entries), entry)
+    return {'matrix_dir': matrix_dir, 'manifest': manifest}
@@ -0,0 +1,94 @@
+import os, json
+from typing import Dict, Any, List, Optional
+
+from .runners import load_tasks, task_id, load_run_config, summarize, _write_sweep_summaries, _budget_summary, _cascade_summary, _spent
+from .utils.logging import new_run_dir, read_jsonl, save_json, JsonlWriter
+
+# Settings that may legitimately differ between the shards of one run.
+_PER_SHARD_KEYS = ('shard', 'meta_notes', 'concurrency', 'task_concurrency', 'cache_mode', 'verify_memo')
+
+
+def _sum_counts(blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add up the numeric fields of per-shard stats blocks; other fields come from the first."""
+    out = dict(blocks[0])
+    for b in blocks[1:]:
+        for k, v in b.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool) and isinstance(out.get(k), (int, float)):
+                out[k] += v
+    return out
+
+
+def merge_runs(run_dirs: List[str], run_root: str = 'runs', task_path: Optional[str] = None) -> Dict[str, Any]:
+    """Combine shard run directories into one run with a recomputed summary.
+
+    Records are ordered as in the task file (``task_path``, default the one
+    recorded by the shards); tasks no shard finished are counted as
+    ``missing_tasks``. Shards ran side by side, so ``duration_sec`` is the
+    slowest shard's. Cascade and budgeted runs get their ``cascade`` and
+    ``budget`` blocks back, recomputed from the merged records; the shards
+    split the configured budget, so that is the merged one. Raises
+    ``ValueError`` if the shards were run with different models or
+    strategies, or overlap.
+    """
+    if not run_dirs:
+        raise ValueError('Nothing to merge')
+    configs = [load_run_config(d) for d in run_dirs]
+    base = {k: v for k, v in configs[0].items() if k not in _PER_SHARD_KEYS}
+    for d, cfg in zip(run_dirs[1:], configs[1:]):
+        other = {k: v for k, v in cfg.items() if k not in _PER_SHARD_KEYS}
+        if other != base:
+            diff = sorted(k for k in set(base) | set(other) if base.get(k) != other.get(k))
+            raise ValueError(f'{d} was run with different settings: {", ".join(diff)}')
+
+    by_id: Dict[str, Dict[str, Any]] = {}
+    duration = 0.0
+    shard_summaries: List[Dict[str, Any]] = []
+    for d in run_dirs:
+        for rec in read_jsonl(os.path.join(d, 'details.jsonl')):
+            if rec['task_id'] in by_id:
+                raise ValueError(f"Task {rec['task_id']} appears in more than one shard")
+            by_id[rec['task_id']] = rec
+        summary_path = os.path.join(d, 'summary.json')
+        if os.path.exists(summary_path):
+            with open(summary_path, 'r', encoding='utf-8') as f:
+                shard_summaries.append(json.load(f))
+            duration = max(duration, shard_summaries[-1].get('duration_sec', 0.0))
+
+    task_path = task_path or base.get('task_path')
+    results = []
+    missing = 0
+    if task_path and os.path.exists(task_path):
+        for idx, t in enumerate(load_tasks(task_path), 1):
+            rec = by_id.pop(task_id(t, idx), None)
+            if rec is None:
+                missing += 1
+            else:
+                results.append(rec)
+    # Anything not in the task file keeps shard order.
+    results.extend(by_id.values())
+
+    config = dict(base, shard=None, merged_from=[os.path.abspath(d) for d in run_dirs])
+    run_dir = new_run_dir(run_root)
+    with JsonlWriter(os.path.join(run_dir, 'details.jsonl')) as w:
+        for rec in results:
+            w.write(rec)
+    summary = summarize(results, config, duration)
+    summary['merged_from'] = config['merged_from']
+    summary['missing_tasks'] = missing
+    if config.get('strategy') == 'cascade':
+        summary['cascade'] = _cascade_summary(results, [f"{config['model_backend']}/{config['model_name']}", config['escalate_to']],
+                                              config.get('escalate_below', 1.0))
+        caches = [s['cascade']['cache'] for s in shard_summaries if 'cache' in s.get('cascade', {})]
+        if caches:
+            summary['cascade']['cache'] = _sum_counts(caches)
+    if config.get('budget'):
+        budgets = [s['budget'] for s in shard_summaries if 'budget' in s]
+        unit = config.get('budget_unit', 'samples')
+        info = {'unit': unit, 'spent': {unit: 0.0}, 'rounds': max((b['rounds'] for b in budgets), default=0), 'curve': []}
+        summary['budget'] = _budget_summary(results, info, config['budget'], sum(_spent(r, unit) for r in results))
+        summary['budget']['shard_curves'] = [b['curve'] for b in budgets]
+    save_json(os.path.join(run_dir, 'run_config.json'), config)
+    save_json(os.path.join(run_dir, 'summary.json'), summary)
+    if config.get('strategy') == 'sweep':
+        _write_sweep_summaries(run_dir, summary, results)
+    return {'run_dir': run_dir, 'summary': summary}
@@ -1,49 +1,659 @@
-import json, os, subprocess, urllib.request, time
-from typing import Dict, Any, Optional
+import json, os, socket, subprocess, time, threading, http.client
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, List, Set, Tuple, Callable, Iterator, Collection
+from urllib.parse import urlsplit
 
+from ..utils.stats import StreamingQuantiles
+
+# One base URL, or several comma-separated ones to balance requests across.
 DEFAULT_BASE = os.environ.get('OLLAMA_BASE_URL', 'http://localhost:11434')
+CONNECT_TIMEOUT = float(os.environ.get('OLLAMA_CONNECT_TIMEOUT', '10'))
+READ_TIMEOUT = float(os.environ.get('OLLAMA_READ_TIMEOUT', '600'))
+# How long Ollama keeps the model loaded after a request; sent with every
+# call so the model stays resident for the whole run.
+KEEP_ALIVE: Optional[str] = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+# Endpoint ejection: consecutive failures that eject one, and for how long
+# (doubling on each repeat, up to the maximum).
+EJECT_AFTER = 3
+EJECT_SEC = 5.0
+EJECT_MAX_SEC = 60.0
+# Wall-clock limit for one generate() call, retries and CLI fallback
+# included (None = only the read timeout per attempt).
+CALL_TIMEOUT: Optional[float] = None
+# Hedging: duplicate a non-streaming request that is still running at this
+# percentile of observed latency (None = off), once enough calls were seen.
+HEDGE_PERCENTILE: Optional[float] = None
+HEDGE_MIN_CALLS = 20
+# How long the health check before a CLI fallback may take.
+HEALTH_TIMEOUT = 2.0
+
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError, ConnectionResetError)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A call or task deadline passed before the model answered."""
+
+
+class _Cancel:
+    """Lets another thread abort a request that is blocked on its response."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn: http.client.HTTPConnection) -> bool:
+        with self._lock:
+            self._conn = conn
+            return not self.cancelled
+
+    def detach(self) -> None:
+        with self._lock:
+            self._conn = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            sock = self._conn.sock if self._conn is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of persistent HTTP/1.1 connections, keyed by host.
+
+    Idle connections are reused across calls instead of opening a new TCP
+    connection per request. A connection is only ever used by one thread at a
+    time; it returns to the pool once its response has been fully read.
+    """
+
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT, max_idle: int = 32):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, base: str) -> Tuple[str, str, int]:
+        u = urlsplit(base)
+        scheme = u.scheme or 'http'
+        return scheme, u.hostname or 'localhost', u.port or (443 if scheme == 'https' else 80)
+
+    def _connect(self, key: Tuple[str, str, int]) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        conn = cls(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        # Small request bodies otherwise stall on Nagle + delayed ACK.
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.sock.settimeout(self.read_timeout)
+        return conn
+
+    def _checkout(self, key) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._connect(key), False
+
+    def _checkin(self, key, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _send(self, key, path: str, body: bytes, timeout: Optional[float] = None, cancel: Optional[_Cancel] = None) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send a POST and return the connection with its (unread) response.
+
+        A reused connection that the server has already closed is replaced
+        once, transparently; any other failure propagates to the caller.
+        ``timeout`` shortens the read timeout for this request; ``cancel``
+        can abort it from another thread.
+        """
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        while True:
+            conn, reused = self._checkout(key)
+            if conn.sock is not None:
+                conn.sock.settimeout(min(timeout, self.read_timeout) if timeout else self.read_timeout)
+            if cancel is not None and not cancel.attach(conn):
+                self._checkin(key, conn)
+                raise DeadlineExceeded('request cancelled')
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except _STALE_ERRORS:
+                conn.close()
+                if reused and not (cancel and cancel.cancelled):
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+    def _finish(self, key, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse) -> None:
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+    def post_json(self, base: str, path: str, body: bytes, timeout: Optional[float] = None, cancel: Optional[_Cancel] = None) -> Dict[str, Any]:
+        """POST a JSON body and return the decoded JSON response."""
+        key = self._key(base)
+        conn, resp = self._send(key, path, body, timeout, cancel)
+        try:
+            raw = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        if cancel is not None:
+            cancel.detach()  # the connection may be reused from here on
+        self._finish(key, conn, resp)
+        if resp.status >= 400:
+            raise RuntimeError(f'Ollama HTTP {resp.status}: {raw[:200]!r}')
+        return json.loads(raw.decode('utf-8'))
+
+    def post_stream(self, base: str, path: str, body: bytes, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """POST a JSON body and yield each object of an NDJSON response.
+
+        If the consumer stops early the connection is closed rather than
+        pooled, which also tells the server to cancel the request.
+        """
+        key = self._key(base)
+        conn, resp = self._send(key, path, body, timeout)
+        done = False
+        try:
+            if resp.status >= 400:
+                raise RuntimeError(f'Ollama HTTP {resp.status}: {resp.read()[:200]!r}')
+            while True:
+                line = resp.readline()
+                if not line:
+                    done = True
+                    break
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                if obj.get('done'):
+                    # Drain the end of the body so the connection can be reused.
+                    resp.read()
+                    done = True
+                    yield obj
+                    break
+                yield obj
+        finally:
+            if done:
+                self._finish(key, conn, resp)
+            else:
+                conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for c in conns:
+            c.close()
+
+
+class Router:
+    """Routes each request to the healthy endpoint with the fewest requests in flight.
+
+    Ties go to the endpoint picked least recently. After ``eject_after``
+    consecutive failures an endpoint is ejected for ``eject_sec``, doubling
+    with every repeat ejection up to ``eject_max_sec``. Once that time has
+    passed it is re-admitted on probation: one more failure ejects it again,
+    a success restores it. If every endpoint is ejected, the one due back
+    first is used anyway. Endpoints in ``avoid`` (those that already failed
+    this call) are only picked when no other healthy one is left.
+    """
+
+    def __init__(self, endpoints: List[str], eject_after: Optional[int] = None, eject_sec: Optional[float] = None, eject_max_sec: Optional[float] = None):
+        if not endpoints:
+            raise ValueError('Need at least one Ollama endpoint')
+        self.eject_after = eject_after or EJECT_AFTER
+        self.eject_sec = eject_sec or EJECT_SEC
+        self.eject_max_sec = eject_max_sec or EJECT_MAX_SEC
+        self._lock = threading.Lock()
+        self._picks = 0
+        self._eps = {url: {'in_flight': 0, 'peak_in_flight': 0, 'requests': 0, 'failures': 0, 'consecutive_failures': 0,
+                           'ejections': 0, 'readmissions': 0, 'ejected_until': 0.0, 'probation': False, 'last_pick': 0,
+                           'output_tokens': 0, 'busy_sec': 0.0, 'first': None, 'last': None}
+                     for url in dict.fromkeys(u.rstrip('/') for u in endpoints)}
+
+    @property
+    def endpoints(self) -> List[str]:
+        return list(self._eps)
+
+    def fresh(self, avoid: Collection[str]) -> bool:
+        """Whether a healthy endpoint outside ``avoid`` is left to try."""
+        now = time.monotonic()
+        with self._lock:
+            return any(e['ejected_until'] <= now for u, e in self._eps.items() if u not in avoid)
+
+    def acquire(self, avoid: Collection[str] = ()) -> str:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [(u, e) for u, e in self._eps.items() if e['ejected_until'] <= now]
+            healthy = [(u, e) for u, e in healthy if u not in avoid] or healthy
+            if healthy:
+                url, ep = min(healthy, key=lambda ue: (ue[1]['in_flight'], ue[1]['last_pick']))
+            else:
+                url, ep = min(self._eps.items(), key=lambda ue: ue[1]['ejected_until'])
+            if ep['ejected_until'] and not ep['probation']:
+                ep['probation'] = True
+                ep['readmissions'] += 1
+            ep['ejected_until'] = 0.0
+            self._picks += 1
+            ep['last_pick'] = self._picks
+            ep['in_flight'] += 1
+            ep['peak_in_flight'] = max(ep['peak_in_flight'], ep['in_flight'])
+            if ep['first'] is None:
+                ep['first'] = now
+            return url
+
+    def release(self, url: str, ok: Optional[bool], started: float, output_tokens: int = 0) -> None:
+        """Record the outcome of a request that ``acquire`` sent to ``url`` at ``started``.
+
+        ``ok`` is None for a request cut short by our own deadline or hedge,
+        which says nothing about the endpoint's health.
+        """
+        now = time.monotonic()
+        with self._lock:
+            ep = self._eps[url]
+            ep['in_flight'] -= 1
+            ep['busy_sec'] += now - started
+            ep['last'] = now
+            if ok is None:
+                return
+            if ok:
+                ep['requests'] += 1
+                ep['output_tokens'] += output_tokens
+                ep['consecutive_failures'] = 0
+                ep['probation'] = False
+                return
+            ep['failures'] += 1
+            ep['consecutive_failures'] += 1
+            if ep['ejected_until'] > now:
+                return  # sent before the ejection
+            if ep['probation'] or ep['consecutive_failures'] >= self.eject_after:
+                ep['ejected_until'] = now + min(self.eject_max_sec, self.eject_sec * 2 ** ep['ejections'])
+                ep['ejections'] += 1
+                ep['probation'] = False
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-endpoint counters; throughput is over the span the endpoint was in use."""
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for url, ep in self._eps.items():
+                span = (ep['last'] - ep['first']) if ep['first'] is not None and ep['last'] is not None else 0.0
+                out.append({
+                    'url': url,
+                    'requests': ep['requests'],
+                    'failures': ep['failures'],
+                    'ejections': ep['ejections'],
+                    'readmissions': ep['readmissions'],
+                    'healthy': ep['ejected_until'] <= now,
+                    'peak_in_flight': ep['peak_in_flight'],
+                    'output_tokens': ep['output_tokens'],
+                    'busy_sec': ep['busy_sec'],
+                    'requests_per_sec': ep['requests'] / span if span > 0 else None,
+                    'tokens_per_sec': ep['output_tokens'] / span if span > 0 else None,
+                })
+        return out
+
+
+_POOL = ConnectionPool()
+_ROUTER = Router(DEFAULT_BASE.split(','))
+
 
-def _http_generate(model: str, prompt: str, options: Optional[Dict[str, Any]] = None, json_mode: bool=False, max_retries: int=3) -> Optional[str]:
-    url = f"{DEFAULT_BASE}/api/generate"
-    payload = {'model': model, 'prompt': prompt, 'stream': False}
+def configure(connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None, keep_alive: Optional[str] = None, endpoints: Optional[List[str]] = None, call_timeout: Optional[float] = None, hedge_percentile: Optional[float] = None) -> None:
+    """Override connection timeouts, ``keep_alive``, the endpoints, the call deadline and hedging for subsequent calls."""
+    global _POOL, _ROUTER, KEEP_ALIVE, CALL_TIMEOUT, HEDGE_PERCENTILE
+    if keep_alive is not None:
+        KEEP_ALIVE = keep_alive or None
+    if call_timeout is not None:
+        CALL_TIMEOUT = call_timeout or None
+    if hedge_percentile is not None:
+        HEDGE_PERCENTILE = hedge_percentile or None
+    if endpoints:
+        _ROUTER = Router(endpoints)
+    if connect_timeout is not None or read_timeout is not None:
+        _POOL.close()
+        _POOL = ConnectionPool(
+            connect_timeout=connect_timeout if connect_timeout is not None else _POOL.connect_timeout,
+            read_timeout=read_timeout if read_timeout is not None else _POOL.read_timeout,
+        )
+
+
+def _payload(model: str, prompt: str, options: Optional[Dict[str, Any]], json_mode: bool, stream: bool) -> bytes:
+    payload = {'model': model, 'prompt': prompt, 'stream': stream}
     if options:
         payload['options'] = options
     if json_mode:
         payload['format'] = 'json'
-    data = json.dumps(payload).encode('utf-8')
-    req = urllib.request.Request(url, data=data, headers={'Content-Type':'application/json'})
-    
+    if KEEP_ALIVE:
+        payload['keep_alive'] = KEEP_ALIVE
+    return json.dumps(payload).encode('utf-8')
+
+# Server-side timing fields Ollama returns (nanoseconds) and our names (seconds).
+_SERVER_TIMINGS = (
+    ('total_duration', 'server_total_sec'),
+    ('load_duration', 'server_load_sec'),
+    ('prompt_eval_duration', 'server_prompt_eval_sec'),
+    ('eval_duration', 'server_eval_sec'),
+)
+
+_LATENCY = StreamingQuantiles()  # completed non-streaming requests, for the hedge delay
+_STATS_LOCK = threading.Lock()
+_STATS = {'hedges_fired': 0, 'hedges_won': 0, 'hedges_skipped': 0, 'deadlines_exceeded': 0, 'health_checks': 0, 'cli_fallbacks': 0}
+
+def _count(key: str) -> None:
+    with _STATS_LOCK:
+        _STATS[key] += 1
+
+def _hedge_delay() -> Optional[float]:
+    """Seconds after which a request gets a duplicate; None while hedging is off or warming up."""
+    if not HEDGE_PERCENTILE:
+        return None
+    with _STATS_LOCK:
+        if _LATENCY.count < HEDGE_MIN_CALLS:
+            return None
+        return _LATENCY.quantile(HEDGE_PERCENTILE)
+
+def endpoints() -> List[str]:
+    """Base URLs requests are spread over."""
+    return list(_ROUTER.endpoints)
+
+def stats() -> Dict[str, Any]:
+    delay = _hedge_delay()
+    with _STATS_LOCK:
+        return dict(_STATS, hedge_percentile=HEDGE_PERCENTILE, hedge_after_sec=delay, call_timeout=CALL_TIMEOUT,
+                    endpoints=_ROUTER.stats())
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until the monotonic ``deadline``; raises once it has passed."""
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded('Ollama call deadline exceeded')
+    return left
+
+def _routed(send: Callable[[str], Dict[str, Any]], deadline: Optional[float] = None, cancel: Optional[_Cancel] = None, failed: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """``send(base_url)`` on the endpoint the router picks, reporting the outcome back.
+
+    The router steers clear of the endpoints in ``failed``; if this attempt
+    fails too, its endpoint is added.
+    """
+    router = _ROUTER
+    base = router.acquire(failed or ())
+    started = time.monotonic()
+    try:
+        out = send(base)
+    except Exception:
+        ours = (cancel is not None and cancel.cancelled) or (deadline is not None and time.monotonic() >= deadline)
+        router.release(base, None if ours else False, started)
+        if failed is not None and not ours:
+            failed.add(base)
+        raise
+    router.release(base, True, started, int(out.get('output_tokens') or 0))
+    if len(router.endpoints) > 1:
+        out['endpoint'] = base
+    return out
+
+def _healthy(deadline: Optional[float] = None) -> bool:
+    """Whether any endpoint answers ``GET /api/version`` within ``HEALTH_TIMEOUT``."""
+    _count('health_checks')
+    timeout = HEALTH_TIMEOUT if deadline is None else max(0.01, min(HEALTH_TIMEOUT, deadline - time.monotonic()))
+    for base in _ROUTER.endpoints:
+        scheme, host, port = _POOL._key(base)
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        conn = cls(host, port, timeout=timeout)
+        try:
+            conn.request('GET', '/api/version')
+            if conn.getresponse().status == 200:
+                return True
+        except Exception:
+            pass
+        finally:
+            conn.close()
+    return False
+
+def _result(text: str, final: Dict[str, Any], retries: int) -> Dict[str, Any]:
+    """Generation output with token counts and server timings from the final object."""
+    out = {
+        'text': text,
+        'cost_usd': 0.0,
+        'input_tokens': final.get('prompt_eval_count', 0),
+        'output_tokens': final.get('eval_count', 0),
+        'retries': retries,
+    }
+    for src, dst in _SERVER_TIMINGS:
+        if final.get(src) is not None:
+            out[dst] = final[src] / 1e9
+    return out
+
+def _backoff(attempt: int, deadline: Optional[float] = None, failed: Collection[str] = ()) -> None:
+    # While a healthy endpoint has not failed this call yet, the retry goes
+    # straight to it; only a retry on one that did waits.
+    if not _ROUTER.fresh(failed):
+        delay = 0.5 * (attempt + 1)  # Exponential backoff
+        left = _remaining(deadline)
+        time.sleep(delay if left is None else min(delay, left))
+
+def _with_retries(once: Callable[[int, Set[str]], Dict[str, Any]], max_retries: int, deadline: Optional[float]) -> Tuple[Optional[Dict[str, Any]], int]:
+    """Call ``once(attempt, failed)`` until it succeeds; returns ``(output or None, retries used)``.
+
+    ``failed`` collects the endpoints that failed this call, for ``_routed``
+    to avoid on the retries.
+
+    After a first failure the endpoints get a quick health check: if none is
+    up the output is None straight away, so the caller can fall back to the
+    CLI. If they are up but every attempt fails, this raises instead.
+    """
+    failed: Set[str] = set()
     for attempt in range(max_retries):
         try:
-            with urllib.request.urlopen(req, timeout=600) as resp:
-                body = resp.read().decode('utf-8')
-                obj = json.loads(body)
-                return obj.get('response')
+            return once(attempt, failed), attempt
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(0.5 * (attempt + 1))  # Exponential backoff
-                continue
-            return None
-    return None
+            _remaining(deadline)
+            if attempt == 0 and not _healthy(deadline):
+                return None, attempt
+            if attempt == max_retries - 1:
+                raise RuntimeError(f'Ollama request failed {max_retries} times: {e}') from e
+            _backoff(attempt, deadline, failed)
+    return None, max_retries - 1
+
+def _generate_once(base: str, data: bytes, retries: int, deadline: Optional[float] = None, cancel: Optional[_Cancel] = None) -> Dict[str, Any]:
+    t0 = time.monotonic()
+    obj = _POOL.post_json(base, '/api/generate', data, _remaining(deadline), cancel)
+    with _STATS_LOCK:
+        _LATENCY.add(time.monotonic() - t0)
+    return _result(obj.get('response'), obj, retries)
+
+def _hedged(data: bytes, retries: int, deadline: Optional[float], failed: Optional[Set[str]] = None, limiter=None) -> Dict[str, Any]:
+    """One request, duplicated if it is still running after ``_hedge_delay``; the first success wins.
+
+    The request runs on the caller's thread; only the duplicate gets a
+    thread of its own, started by a timer. The loser is cancelled by closing
+    its connection, which also stops the generation on the server. With a
+    hedge, ``hedge`` is ``won`` if the duplicate answered first, else
+    ``lost``. The duplicate needs a slot of the run's ``limiter`` (held until
+    it finishes); with none free there is no hedge, so hedging never exceeds
+    the configured concurrency.
+    """
+    delay = _hedge_delay()
+    if delay is None:
+        return _routed(lambda base: _generate_once(base, data, retries, deadline), deadline, failed=failed)
+    left = _remaining(deadline)
+    primary, duplicate = _Cancel(), _Cancel()
+    hedge: 'Future[Dict[str, Any]]' = Future()
+    lock = threading.Lock()
+    state = {'closed': False, 'fired': False}
+
+    def fire() -> None:
+        with lock:
+            if state['closed']:
+                return
+            if limiter is not None and not limiter.try_acquire():
+                _count('hedges_skipped')
+                return
+            state['fired'] = True
+        _count('hedges_fired')
+        try:
+            hedge.set_result(_routed(lambda base: _generate_once(base, data, retries, deadline, duplicate), deadline, duplicate, failed))
+            primary.cancel()  # the duplicate won
+        except BaseException as e:
+            hedge.set_exception(e)
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    timer = threading.Timer(delay if left is None else min(delay, left), fire)
+    timer.daemon = True
+    timer.start()
+    try:
+        try:
+            out = _routed(lambda base: _generate_once(base, data, retries, deadline, primary), deadline, primary, failed)
+        except Exception as e:
+            with lock:
+                state['closed'] = True
+                fired = state['fired']
+            if not fired:
+                raise
+            try:
+                out = hedge.result(timeout=_remaining(deadline))
+            except Exception:
+                raise e
+            out['hedge'] = 'won'
+            _count('hedges_won')
+            return out
+        with lock:
+            state['closed'] = True
+            fired = state['fired']
+        if fired:
+            out['hedge'] = 'lost'
+        return out
+    finally:
+        timer.cancel()
+        duplicate.cancel()
+
+def _http_generate(model: str, prompt: str, options: Optional[Dict[str, Any]] = None, json_mode: bool=False, max_retries: int=3, deadline: Optional[float] = None, limiter=None) -> Tuple[Optional[Dict[str, Any]], int]:
+    """Non-streaming generation; returns ``(output or None, retries used)``."""
+    # Serialised once; every retry sends the same bytes.
+    data = _payload(model, prompt, options, json_mode, stream=False)
+    return _with_retries(lambda attempt, failed: _hedged(data, attempt, deadline, failed, limiter), max_retries, deadline)
+
+# Characters that can complete an answer; the stop detector only runs on
+# chunks containing one, which keeps detection linear in practice.
+_BOUNDARY_CHARS = ('\n', '}', '`')
+
+def _stream_once(base: str, data: bytes, stop_when: Optional[Callable[[str], bool]], retries: int, deadline: Optional[float] = None) -> Dict[str, Any]:
+    start = time.time()
+    parts: List[str] = []
+    text = ''
+    ttft = None
+    chunks = 0
+    final: Dict[str, Any] = {}
+    aborted = False
+    stream = _POOL.post_stream(base, '/api/generate', data, _remaining(deadline))
+    try:
+        for obj in stream:
+            piece = obj.get('response') or ''
+            if piece:
+                if ttft is None:
+                    ttft = time.time() - start
+                chunks += 1
+                parts.append(piece)
+            if obj.get('done'):
+                final = obj
+                break
+            _remaining(deadline)
+            if stop_when is not None and piece and any(c in piece for c in _BOUNDARY_CHARS):
+                text = ''.join(parts)
+                parts = [text]
+                if stop_when(text):
+                    aborted = True
+                    break
+    finally:
+        stream.close()
+    out = _result(''.join(parts), final, retries)
+    out['output_tokens'] = final.get('eval_count', chunks)
+    out['ttft_sec'] = ttft
+    out['aborted'] = aborted
+    return out
+
+def _http_generate_stream(model: str, prompt: str, options: Optional[Dict[str, Any]] = None, json_mode: bool=False, stop_when: Optional[Callable[[str], bool]] = None, max_retries: int=3, deadline: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], int]:
+    """Generate with ``stream: true``, cancelling once ``stop_when(text)`` fires.
 
-def _cli_generate(model: str, prompt: str, max_retries: int=3) -> Optional[str]:
+    The output adds ``ttft_sec`` (time to first token) and ``aborted``;
+    ``output_tokens`` counts streamed chunks when the stream was cut short.
+    Returns ``(output or None, retries used)``. Streams are never hedged.
+    """
+    data = _payload(model, prompt, options, json_mode, stream=True)
+    return _with_retries(lambda attempt, failed: _routed(lambda base: _stream_once(base, data, stop_when, attempt, deadline), deadline, failed=failed),
+                         max_retries, deadline)
+
+def _cli_generate(model: str, prompt: str, max_retries: int=3, deadline: Optional[float] = None) -> Tuple[Optional[str], int]:
     for attempt in range(max_retries):
         try:
-            out = subprocess.check_output(['ollama', 'run', model, prompt], stderr=subprocess.STDOUT, timeout=600)
-            return out.decode('utf-8', errors='ignore')
+            left = _remaining(deadline)
+            timeout = _POOL.read_timeout if left is None else min(left, _POOL.read_timeout)
+            out = subprocess.check_output(['ollama', 'run', model, prompt], stderr=subprocess.STDOUT, timeout=timeout)
+            return out.decode('utf-8', errors='ignore'), attempt
+        except DeadlineExceeded:
+            raise
+        except FileNotFoundError:
+            return None, attempt  # no ollama binary
         except Exception as e:
             if attempt < max_retries - 1:
+                _remaining(deadline)
                 time.sleep(0.5 * (attempt + 1))  # Exponential backoff
                 continue
-            return None
-    return None
+            return None, attempt
+    return None, max_retries - 1
+
+def generate(model: str, prompt: str, temperature: float=0.7, top_p: float=0.95, json_mode: bool=False, stream: bool=False, stop_when: Optional[Callable[[str], bool]] = None, deadline: Optional[float] = None, limiter=None) -> Dict[str, Any]:
+    """Generate a completion with Ollama.
 
-def generate(model: str, prompt: str, temperature: float=0.7, top_p: float=0.95, json_mode: bool=False) -> str:
+    Returns the text plus ``input_tokens``/``output_tokens``, the server-side
+    ``server_*_sec`` timings and ``retries`` (failed attempts before success,
+    including the HTTP attempts when falling back to the CLI). With ``stream``
+    the output also carries ``ttft_sec`` and ``aborted``. With several
+    endpoints, each attempt goes where ``Router`` sends it and ``endpoint``
+    records which one answered.
+
+    Everything, retries and CLI fallback included, must finish by
+    ``deadline`` (a ``time.monotonic()`` value) and within ``CALL_TIMEOUT``,
+    else ``DeadlineExceeded`` is raised. The CLI is only tried when no HTTP
+    endpoint passes a health check. With ``HEDGE_PERCENTILE`` set, slow
+    non-streaming requests are hedged (see ``_hedged``), within the free
+    slots of ``limiter`` if given.
+    """
+    if CALL_TIMEOUT:
+        until = time.monotonic() + CALL_TIMEOUT
+        deadline = until if deadline is None else min(deadline, until)
     opts = {'temperature': temperature, 'top_p': top_p}
-    text = _http_generate(model, prompt, options=opts, json_mode=json_mode)
-    if text is not None:
-        return text
-    text = _cli_generate(model, prompt)
+    try:
+        if stream:
+            out, retries = _http_generate_stream(model, prompt, options=opts, json_mode=json_mode, stop_when=stop_when, deadline=deadline)
+        else:
+            out, retries = _http_generate(model, prompt, options=opts, json_mode=json_mode, deadline=deadline, limiter=limiter)
+        if out is not None:
+            return out
+        _count('cli_fallbacks')
+        text, cli_retries = _cli_generate(model, prompt, deadline=deadline)
+    except DeadlineExceeded:
+        _count('deadlines_exceeded')
+        raise
     if text is not None:
-        return text
+        out = _result(text, {}, retries + 1 + cli_retries)
+        out['fallback'] = 'cli'
+        return out
     raise RuntimeError('Failed to generate with Ollama. Is it running and is the model pulled?')
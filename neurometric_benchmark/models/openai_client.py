@@ -1,7 +1,9 @@
 # Optional: remote large model baseline (disabled by default).
 # Requires: pip install openai  (and set OPENAI_API_KEY)
-from typing import Dict, Any
-import os
+import os, time, random, threading
+from typing import Dict, Any, Optional
+
+from ..utils.concurrency import TokenBucket
 
 # Rough per-token pricing for a couple of common OpenAI models. Prices are in
 # USD per token and are only used to provide a ballpark cost estimate in the
@@ -12,10 +14,103 @@ MODEL_PRICES: Dict[str, Any] = {
     "gpt-4o-mini": (0.15 / 1_000_000, 0.60 / 1_000_000),
 }
 
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
+# Account limits to stay under (None = unlimited), retry policy, and the
+# completion size assumed when reserving tokens/min before a call.
+RPM: Optional[float] = None
+TPM: Optional[float] = None
+MAX_RETRIES = 6
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', '600'))
+EXPECTED_OUTPUT_TOKENS = 256
+
+_LOCK = threading.Lock()
+_CLIENT = None
+_REQUESTS: Optional[TokenBucket] = None
+_TOKENS: Optional[TokenBucket] = None
+_HOLD_UNTIL = 0.0  # monotonic time before which no request may start (after a 429)
+_STATS = {'requests': 0, 'retries': 0, 'throttled': 0, 'server_errors': 0, 'connection_errors': 0, 'wait_sec': 0.0, 'backoff_sec': 0.0}
+
+
+def configure(rpm: Optional[float] = None, tpm: Optional[float] = None, max_retries: Optional[int] = None, timeout: Optional[float] = None) -> None:
+    """Set rate limits and retry policy; the shared client is rebuilt lazily."""
+    global RPM, TPM, MAX_RETRIES, TIMEOUT, _CLIENT, _REQUESTS, _TOKENS
+    with _LOCK:
+        if rpm is not None:
+            RPM = rpm or None
+        if tpm is not None:
+            TPM = tpm or None
+        if max_retries is not None:
+            MAX_RETRIES = max_retries
+        if timeout is not None:
+            TIMEOUT = timeout
+        _CLIENT = _REQUESTS = _TOKENS = None
+
+
+def _shared():
+    """The process-wide client and rate buckets, created on first use."""
+    global _CLIENT, _REQUESTS, _TOKENS
+    with _LOCK:
+        if _CLIENT is None:
+            # Imported here so that runs on other backends never load the SDK.
+            try:
+                from openai import OpenAI
+            except Exception:
+                raise RuntimeError('openai package not installed. Run: pip install openai')
+            api_key = os.environ.get('OPENAI_API_KEY')
+            if not api_key:
+                raise RuntimeError('OPENAI_API_KEY not set')
+            # One client means one HTTP connection pool for every thread; its
+            # own retries are off because _retry_delay handles them.
+            _CLIENT = OpenAI(api_key=api_key, max_retries=0, timeout=TIMEOUT)
+            _REQUESTS = TokenBucket(RPM) if RPM else None
+            _TOKENS = TokenBucket(TPM) if TPM else None
+        return _CLIENT, _REQUESTS, _TOKENS
+
+
+def _hold(seconds: float) -> None:
+    global _HOLD_UNTIL
+    _HOLD_UNTIL = max(_HOLD_UNTIL, time.monotonic() + seconds)
+
+
+def _retry_after(exc) -> Optional[float]:
+    """Seconds the server asked us to wait, from ``retry-after(-ms)`` headers."""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        value = headers.get('retry-after')
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                import email.utils
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _retry_delay(exc, attempt: int) -> Optional[float]:
+    """How long to back off before retrying ``exc``; None if it is not retryable."""
+    import openai
+    if isinstance(exc, openai.RateLimitError):
+        kind = 'throttled'
+    elif isinstance(exc, openai.APIStatusError) and exc.status_code >= 500:
+        kind = 'server_errors'
+    elif isinstance(exc, openai.APIConnectionError):  # includes timeouts
+        kind = 'connection_errors'
+    else:
+        return None
+    with _LOCK:
+        _STATS[kind] += 1
+    # Full jitter keeps concurrent callers from retrying in lockstep.
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    hinted = _retry_after(exc)
+    if hinted is not None:
+        delay = hinted + random.uniform(0, BACKOFF_BASE)
+    return delay
+
 
 def generate(model: str, prompt: str, temperature: float = 0.2, top_p: float = 0.95) -> Dict[str, Any]:
     """Generate text from an OpenAI chat model.
@@ -24,19 +119,47 @@ def generate(model: str, prompt: str, temperature: float = 0.2, top_p: float = 0
     that downstream code can aggregate token spend. The cost is a best-effort
     estimate based on the rough model prices above. If pricing information for
     the requested model is unknown, cost will be reported as zero.
+
+    Calls share one client and stay under the configured requests/min and
+    tokens/min; 429s, 5xx and connection errors are retried with jittered
+    exponential backoff, honouring ``Retry-After``. A 429 pauses every caller,
+    not just the one that hit it.
     """
-    if OpenAI is None:
-        raise RuntimeError('openai package not installed. Run: pip install openai')
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        raise RuntimeError('OPENAI_API_KEY not set')
-    client = OpenAI(api_key=api_key)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[{'role': 'user', 'content': prompt}],
-        temperature=temperature,
-        top_p=top_p,
-    )
+    client, requests, tokens = _shared()
+    estimate = len(prompt) // 4 + EXPECTED_OUTPUT_TOKENS
+    waited = 0.0
+    for attempt in range(MAX_RETRIES + 1):
+        wait = max(
+            requests.reserve(1) if requests else 0.0,
+            tokens.reserve(estimate) if tokens else 0.0,
+            _HOLD_UNTIL - time.monotonic(),
+        )
+        if wait > 0:
+            time.sleep(wait)
+            waited += wait
+        try:
+            resp = client.chat.completions.create(
+                model=model,
+                messages=[{'role': 'user', 'content': prompt}],
+                temperature=temperature,
+                top_p=top_p,
+            )
+            break
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt == MAX_RETRIES:
+                raise
+            if tokens:
+                tokens.adjust(-estimate)  # nothing was generated
+            with _LOCK:
+                if getattr(e, 'status_code', None) == 429:
+                    _hold(delay)
+                _STATS['retries'] += 1
+                _STATS['backoff_sec'] += delay
+            time.sleep(delay)
+    with _LOCK:
+        _STATS['requests'] += 1
+        _STATS['wait_sec'] += waited
 
     text = resp.choices[0].message.content
     usage = getattr(resp, 'usage', None)
@@ -48,10 +171,19 @@ def generate(model: str, prompt: str, temperature: float = 0.2, top_p: float = 0
         completion_tokens = getattr(usage, 'completion_tokens', 0)
         in_cost, out_cost = MODEL_PRICES.get(model, (0.0, 0.0))
         cost = prompt_tokens * in_cost + completion_tokens * out_cost
+        if tokens:
+            tokens.adjust(prompt_tokens + completion_tokens - estimate)
 
     return {
         'text': text,
         'cost_usd': cost,
         'input_tokens': prompt_tokens,
         'output_tokens': completion_tokens,
+        'retries': attempt,
+        'rate_wait_sec': waited,
     }
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        return dict(_STATS, rpm=RPM, tpm=TPM)
@@ -0,0 +1,89 @@
+# Offline backend: serves the candidates an earlier run stored in its
+# details.jsonl (``candidates_z``) instead of calling a model. Used by the
+# `rescore` subcommand to re-run verification and selection.
+import os, functools, threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..utils.logging import iter_jsonl, pack_json, unpack_json
+
+SOURCE: Optional[str] = None
+
+_LOCK = threading.Lock()
+_BY_PROMPT: Dict[str, str] = {}  # prompt -> packed candidates of its task
+_STATS = {'tasks': 0, 'served': 0}
+
+
+def configure(run_dir: str, task_path: Optional[str] = None) -> None:
+    """Load the stored candidates of ``run_dir``.
+
+    Candidates are looked up by prompt, rebuilt from ``task_path`` (default:
+    the task file the run used). Runs from before candidates were stored only
+    have their sweep candidates to offer.
+    """
+    global SOURCE
+    from ..runners import load_tasks, task_id, build_prompt, load_run_config
+    cfg = load_run_config(run_dir)
+    task_path = task_path or cfg.get('task_path')
+    blobs: Dict[str, str] = {}
+    for rec in iter_jsonl(os.path.join(run_dir, 'details.jsonl')):
+        if rec.get('candidates_z'):
+            blobs[rec['task_id']] = rec['candidates_z']
+        elif rec.get('candidates') and 'text' in rec['candidates'][0]:
+            blobs[rec['task_id']] = pack_json([dict(c, model=cfg.get('model_name')) for c in rec['candidates']])
+    by_prompt: Dict[str, str] = {}
+    for idx, t in enumerate(load_tasks(task_path), 1):
+        blob = blobs.get(task_id(t, idx))
+        if blob is not None:
+            by_prompt.setdefault(build_prompt(t), blob)
+    with _LOCK:
+        SOURCE = run_dir
+        _BY_PROMPT.clear()
+        _BY_PROMPT.update(by_prompt)
+        _STATS.update(tasks=len(by_prompt), served=0)
+        _candidates.cache_clear()
+
+
+@functools.lru_cache(maxsize=256)
+def _candidates(blob: str) -> Dict[Any, Dict[str, Any]]:
+    return {(c.get('model'), c.get('sample_idx', 0)): c for c in unpack_json(blob)}
+
+
+def stored_samples(model: str) -> Tuple[int, int]:
+    """The fewest and the most samples of ``model`` stored for any task."""
+    with _LOCK:
+        blobs = list(_BY_PROMPT.values())
+    counts = [sum(1 for m, _ in _candidates(blob) if m == model) for blob in blobs]
+    return (min(counts), max(counts)) if counts else (0, 0)
+
+
+def generate(model: str, prompt: str, temperature: float = 0.2, sample_idx: int = 0) -> Dict[str, Any]:
+    """The ``sample_idx``-th stored sample of ``model`` for ``prompt``.
+
+    The stored cost and token counts are kept, and the result is marked
+    ``cached`` since no model ran. Raises ``SampleUnavailable`` if the source
+    run never drew that sample (e.g. adaptive sampling stopped early there),
+    which ends that task's sampling, and ``LookupError`` for a prompt it never
+    saw.
+    """
+    from ..runners import SampleUnavailable
+    if SOURCE is None:
+        raise RuntimeError('replay backend not configured; use the rescore subcommand')
+    blob = _BY_PROMPT.get(prompt)
+    if blob is None:
+        raise LookupError(f'{SOURCE} has no stored samples for this prompt')
+    cand = _candidates(blob).get((model, sample_idx))
+    if cand is None:
+        raise SampleUnavailable(f'{SOURCE} has no stored sample {sample_idx} of {model} for this prompt')
+    with _LOCK:
+        _STATS['served'] += 1
+    out = {k: v for k, v in cand.items() if k not in ('model', 'tier', 'sample_idx')}
+    out.setdefault('cost_usd', 0.0)
+    out['cached'] = True
+    return out
+
+generate.takes_sample_idx = True
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        return dict(_STATS, source=SOURCE)
@@ -1,12 +1,20 @@
 import os, json, datetime
-from typing import Dict, Any
+from html import escape
+from typing import Dict, Any, List, Optional, TextIO
 
-TEMPLATE = """
-<!DOCTYPE html>
+from .utils.logging import iter_jsonl
+from .utils.stats import StreamingQuantiles
+
+# Detail rows per HTML file. Runs with more tasks get their rows split across
+# numbered pages next to the report instead of one huge table.
+DEFAULT_PAGE_SIZE = 1000
+SCORE_BINS = 10
+
+HEAD = """<!DOCTYPE html>
 <html>
 <head>
   <meta charset="utf-8">
-  <title>Neurometric TTC Benchmark Report</title>
+  <title>{title}</title>
   <style>
     body {{ font-family: -apple-system, BlinkMacSystemFont, Segoe UI, Roboto, Arial, sans-serif; margin: 40px; }}
     h1, h2, h3 {{ margin: 0.2em 0; }}
@@ -16,59 +24,203 @@ TEMPLATE = """
     code {{ background: #f2f2f2; padding: 2px 4px; border-radius: 3px; }}
     .ok {{ color: #0a7d00; font-weight: 600; }}
     .bad {{ color: #b00020; font-weight: 600; }}
+    .bar {{ background: #4a7bd0; height: 0.8em; display: inline-block; }}
   </style>
 </head>
 <body>
-  <h1>Neurometric TTC Benchmark Report</h1>
-  <p><strong>Generated:</strong> {date}</p>
+  <h1>{title}</h1>
+"""
+
+SUMMARY = """  <p><strong>Generated:</strong> {date}</p>
   <h2>Summary</h2>
   <table>
     <tr><th>Task File</th><td>{task_path}</td></tr>
     <tr><th>Model</th><td>{model_backend} / {model_name}</td></tr>
     <tr><th>Strategy</th><td>{strategy}</td></tr>
     <tr><th>N</th><td>{n}</td></tr>
+    <tr><th>Samples Used (avg / task)</th><td>{avg_samples:.2f}</td></tr>
     <tr><th>Temperature</th><td>{temperature}</td></tr>
     <tr><th>Num Tasks</th><td>{num_tasks}</td></tr>
     <tr><th>Accuracy</th><td>{accuracy:.2%}</td></tr>
     <tr><th>Duration (s)</th><td>{duration:.1f}</td></tr>
+    <tr><th>Call Latency p50 / p90 / p99 (s)</th><td>{lat}</td></tr>
+    <tr><th>Tokens/sec</th><td>{tps}</td></tr>
     <tr><th>Cost (USD)</th><td>{cost:.4f}</td></tr>
   </table>
-  <h2>Details</h2>
-  <table>
+"""
+
+TABLE_HEAD = """  <table>
     <tr><th>#</th><th>Task ID</th><th>Type</th><th>OK?</th><th>Score</th><th>Meta</th></tr>
-    {rows}
-  </table>
-</body>
+"""
+
+FOOT = """</body>
 </html>
 """
 
-def render(details_path: str, summary_path: str, out_html: str):
+def _fmt(v, spec: str = '.2f') -> str:
+    return '-' if v is None else format(v, spec)
+
+def _row(i: int, rec: Dict[str, Any]) -> str:
+    cls = 'ok' if rec.get('ok') else 'bad'
+    meta = json.dumps(rec.get('meta', {}), default=repr)[:200]
+    return (
+        f"    <tr><td>{i}</td><td>{escape(str(rec.get('task_id')))}</td><td>{escape(str(rec.get('type')))}</td>"
+        f"<td class='{cls}'>{rec.get('ok')}</td><td>{_fmt(rec.get('score'))}</td>"
+        f"<td><code>{escape(meta)}</code></td></tr>\n"
+    )
+
+
+class _Aggregates:
+    """One-pass aggregates over detail records, in memory independent of their number."""
+
+    def __init__(self):
+        self.by_type: Dict[str, List[int]] = {}
+        self.scores = [0] * SCORE_BINS
+        self.unscored = 0
+        self.duration = StreamingQuantiles()
+        self.cost = StreamingQuantiles()
+
+    def add(self, rec: Dict[str, Any]) -> None:
+        counts = self.by_type.setdefault(str(rec.get('type')), [0, 0])
+        counts[0] += 1
+        counts[1] += 1 if rec.get('ok') else 0
+        score = rec.get('score')
+        if isinstance(score, (int, float)):
+            self.scores[min(SCORE_BINS - 1, max(0, int(score * SCORE_BINS)))] += 1
+        else:
+            self.unscored += 1
+        self.duration.add(rec.get('duration_sec'))
+        self.cost.add(rec.get('cost_usd'))
+
+    def write(self, f: TextIO) -> None:
+        f.write('  <h2>Accuracy by Type</h2>\n  <table>\n    <tr><th>Type</th><th>Tasks</th><th>Correct</th><th>Accuracy</th></tr>\n')
+        for t, (n, ok) in sorted(self.by_type.items()):
+            f.write(f'    <tr><td>{escape(t)}</td><td>{n}</td><td>{ok}</td><td>{ok / n:.2%}</td></tr>\n')
+        f.write('  </table>\n  <h2>Score Histogram</h2>\n  <table>\n    <tr><th>Score</th><th>Tasks</th><th></th></tr>\n')
+        peak = max(self.scores + [self.unscored, 1])
+        bins = [(f'{b / SCORE_BINS:.1f}–{(b + 1) / SCORE_BINS:.1f}', c) for b, c in enumerate(self.scores)]
+        if self.unscored:
+            bins.append(('no score', self.unscored))
+        for label, c in bins:
+            f.write(f"    <tr><td>{label}</td><td>{c}</td><td><span class='bar' style='width:{300 * c // peak}px'></span></td></tr>\n")
+        f.write('  </table>\n  <h2>Per-Task Distributions</h2>\n  <table>\n'
+                '    <tr><th></th><th>Mean</th><th>p50</th><th>p90</th><th>p99</th><th>Max</th></tr>\n')
+        for label, q, spec in (('Duration (s)', self.duration, '.2f'), ('Cost (USD)', self.cost, '.4f')):
+            s = q.summary()
+            f.write(f'    <tr><th>{label}</th>' + ''.join(f'<td>{_fmt(s[k], spec)}</td>' for k in ('mean', 'p50', 'p90', 'p99', 'max')) + '</tr>\n')
+        f.write('  </table>\n')
+
+
+class _Pages:
+    """Writes detail rows into numbered page files, ``page_size`` rows each.
+
+    The first page is held back until it overflows, so a run that fits on one
+    page keeps its table inline in the main report.
+    """
+
+    def __init__(self, out_html: str, page_size: int):
+        self.page_size = max(1, int(page_size))
+        self._stem = os.path.splitext(out_html)[0]
+        self.main = os.path.basename(out_html)
+        self.buffered: List[str] = []
+        self.pages: List[str] = []
+        self._f: Optional[TextIO] = None
+        self.rows = 0
+
+    def path(self, k: int) -> str:
+        return f'{self._stem}_details_{k:03d}.html'
+
+    def add(self, row: str) -> None:
+        if self.rows % self.page_size == 0 and self.rows:
+            if self._f is None:
+                self._open(1)
+                self._f.writelines(self.buffered)
+                self.buffered = []
+            self._open(len(self.pages) + 1)
+        self.rows += 1
+        if self._f is None:
+            self.buffered.append(row)
+        else:
+            self._f.write(row)
+
+    def _open(self, k: int) -> None:
+        if self._f is not None:
+            self._close(next_page=k)
+        self.pages.append(self.path(k))
+        self._f = open(self.path(k), 'w', encoding='utf-8')
+        self._f.write(HEAD.format(title=f'Details (page {k})'))
+        self._nav(k, None)
+        self._f.write(TABLE_HEAD)
+
+    def _nav(self, k: int, next_page: Optional[int]) -> None:
+        links = [f"<a href='{escape(self.main)}'>Summary</a>"]
+        if k > 1:
+            links.append(f"<a href='{escape(os.path.basename(self.path(k - 1)))}'>Previous</a>")
+        if next_page:
+            links.append(f"<a href='{escape(os.path.basename(self.path(next_page)))}'>Next</a>")
+        self._f.write('  <p>' + ' | '.join(links) + '</p>\n')
+
+    def _close(self, next_page: Optional[int] = None) -> None:
+        self._f.write('  </table>\n')
+        self._nav(len(self.pages), next_page)
+        self._f.write(FOOT)
+        self._f.close()
+        self._f = None
+
+    def finish(self) -> None:
+        if self._f is not None:
+            self._close()
+
+
+def render(details_path: str, summary_path: str, out_html: str, page_size: int = DEFAULT_PAGE_SIZE) -> List[str]:
+    """Render a run into ``out_html`` while streaming ``details.jsonl``.
+
+    Memory stays bounded by ``page_size`` rows. Returns the written files:
+    the report first, then any detail pages.
+    """
     with open(summary_path, 'r', encoding='utf-8') as f:
         s = json.load(f)
-    rows = []
-    with open(details_path, 'r', encoding='utf-8') as f:
-        for i, line in enumerate(f, 1):
-            rec = json.loads(line)
-            cls = 'ok' if rec.get('ok') else 'bad'
-            meta = rec.get('meta', {})
-            rows.append(
-                f"<tr><td>{i}</td><td>{rec.get('task_id')}</td><td>{rec.get('type')}</td>"
-                f"<td class='{cls}'>{rec.get('ok')}</td><td>{rec.get('score'):.2f}</td>"
-                f"<td><code>{json.dumps(meta)[:200]}</code></td></tr>"
-            )
-    html = TEMPLATE.format(
-        date=datetime.datetime.now().isoformat(timespec='seconds'),
-        task_path=s.get('task_path'),
-        model_backend=s.get('model_backend'),
-        model_name=s.get('model_name'),
-        strategy=s.get('strategy'),
-        n=s.get('n'),
-        temperature=s.get('temperature'),
-        num_tasks=s.get('num_tasks'),
-        accuracy=s.get('accuracy', 0.0),
-        duration=s.get('duration_sec', 0.0),
-        cost=s.get('total_cost_usd', 0.0),
-        rows='\n'.join(rows)
-    )
+    perf = s.get('performance', {})
+    lat = perf.get('latency_sec', {})
+    agg = _Aggregates()
+    pages = _Pages(out_html, page_size)
+    try:
+        for i, rec in enumerate(iter_jsonl(details_path), 1):
+            agg.add(rec)
+            pages.add(_row(i, rec))
+    finally:
+        pages.finish()
     with open(out_html, 'w', encoding='utf-8') as f:
-        f.write(html)
+        f.write(HEAD.format(title='Neurometric TTC Benchmark Report'))
+        f.write(SUMMARY.format(
+            date=datetime.datetime.now().isoformat(timespec='seconds'),
+            task_path=escape(str(s.get('task_path'))),
+            model_backend=escape(str(s.get('model_backend'))),
+            model_name=escape(str(s.get('model_name'))),
+            strategy=escape(str(s.get('strategy'))),
+            n=escape(str(s.get('n'))),
+            avg_samples=s.get('avg_samples', s.get('n') or 1),
+            temperature=escape(str(s.get('temperature'))),
+            num_tasks=escape(str(s.get('num_tasks'))),
+            accuracy=s.get('accuracy', 0.0),
+            duration=s.get('duration_sec', 0.0),
+            lat=' / '.join(_fmt(lat.get(q)) for q in ('p50', 'p90', 'p99')),
+            tps=_fmt(perf.get('tokens', {}).get('tokens_per_sec'), '.1f'),
+            cost=s.get('total_cost_usd', 0.0),
+        ))
+        agg.write(f)
+        f.write('  <h2>Details</h2>\n')
+        if pages.pages:
+            first = 1
+            f.write(f'  <p>{pages.rows} tasks in {len(pages.pages)} pages:</p>\n  <ul>\n')
+            for p in pages.pages:
+                last = min(first + pages.page_size - 1, pages.rows)
+                f.write(f"    <li><a href='{escape(os.path.basename(p))}'>Tasks {first}–{last}</a></li>\n")
+                first = last + 1
+            f.write('  </ul>\n')
+        else:
+            f.write(TABLE_HEAD)
+            f.writelines(pages.buffered)
+            f.write('  </table>\n')
+        f.write(FOOT)
+    return [out_html] + pages.pages
@@ -0,0 +1,54 @@
+import os, json
+from typing import Dict, Any, Optional
+
+from .runners import evaluate, load_run_config
+from .models import replay_client
+from .utils.logging import save_json
+
+# Settings a re-scored run may change; anything else is the source run's.
+RESCORE_OVERRIDES = ('strategy', 'n', 'wave_size', 'consensus', 'escalate_below', 'concurrency', 'task_concurrency', 'verify_memo')
+
+
+def rescore_run(run_dir: str, run_root: str = 'runs', task_path: Optional[str] = None, verify_memo_path: Optional[str] = None, **overrides) -> Dict[str, Any]:
+    """Re-verify and re-select the candidates stored in ``run_dir`` into a new run.
+
+    Every sample is served by the ``replay`` backend, so no model is called:
+    only the verifiers (with any fixes since) and the selection run again.
+    ``task_path`` swaps in a corrected task file with the same prompts.
+    ``overrides`` (see ``RESCORE_OVERRIDES``) change the strategy settings,
+    e.g. a smaller ``n``. A task whose stored samples run out (say adaptive
+    sampling stopped at one, and a corrected answer now wants more) is scored
+    on the ones it has, with ``stop_reason`` ``replay_exhausted``. An ``n``
+    above what the source run stored for any task (for ``sweep``, for every
+    task) raises ``ValueError`` before a run directory is made.
+    """
+    unknown = set(overrides) - set(RESCORE_OVERRIDES)
+    if unknown:
+        raise ValueError('Cannot override ' + ', '.join(sorted(unknown)) + ' when re-scoring')
+    kwargs = load_run_config(run_dir)
+    replay_client.configure(run_dir)
+    kwargs.update({k: v for k, v in overrides.items() if v is not None})
+    if overrides.get('n') is not None:
+        fewest, most = replay_client.stored_samples(kwargs['model_name'])
+        limit = fewest if kwargs['strategy'] == 'sweep' else most
+        if kwargs['n'] > limit:
+            raise ValueError(f'--n {kwargs["n"]} is more than the {limit} samples {run_dir} stored per task')
+    kwargs.update(model_backend='replay', cache_mode='off', stream=False, task_deadline=None, adaptive_concurrency=False, run_root=run_root)
+    if task_path:
+        kwargs['task_path'] = task_path
+    if kwargs.get('escalate_to'):
+        kwargs['escalate_to'] = 'replay/' + kwargs['escalate_to'].split('/', 1)[1]
+    if verify_memo_path:
+        kwargs['verify_memo_path'] = verify_memo_path
+    out = evaluate(**kwargs)
+
+    # Record where the candidates came from next to the recomputed results.
+    source = os.path.abspath(run_dir)
+    for name in ('run_config.json', 'summary.json'):
+        path = os.path.join(out['run_dir'], name)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data['rescored_from'] = source
+        save_json(path, data)
+    out['summary']['rescored_from'] = source
+    return out
@@ -1,104 +1,136 @@
 import os
 import json
+import hashlib
 import datetime
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
-import matplotlib.pyplot as plt
+import numpy as np
 
-from .utils.logging import ensure_dir
+from .run_index import RunIndex, default_index_path
+from .utils.logging import ensure_dir, save_json
 
+MANIFEST = 'figures.json'
 
-def _load_summaries(runs_root: str) -> List[Dict[str, Any]]:
-    runs = []
-    for root, dirs, files in os.walk(runs_root):
-        if 'summary.json' in files:
-            try:
-                with open(os.path.join(root, 'summary.json'), 'r', encoding='utf-8') as f:
-                    s = json.load(f)
-                    s['run_dir'] = root
-                    runs.append(s)
-            except Exception:
-                continue
-    return runs
 
+def _load_summaries(runs_root: str, index_path: Optional[str] = None, refresh: bool = True, **filters: Optional[str]) -> List[Dict[str, Any]]:
+    """Run summaries from the run index, brought up to date first if ``refresh``."""
+    idx = RunIndex(index_path or default_index_path(runs_root))
+    try:
+        if refresh:
+            idx.ingest(runs_root)
+        return idx.query(**filters)
+    finally:
+        idx.close()
 
-def _plot_accuracy_vs_n(runs: List[Dict[str, Any]], out_path: str) -> None:
-    fig, ax = plt.subplots()
-    by_model: Dict[str, List[Dict[str, Any]]] = {}
-    for r in runs:
-        by_model.setdefault(r['model_name'], []).append(r)
-    for model, items in by_model.items():
-        items = sorted(items, key=lambda x: x['n'])
-        xs = [it['n'] for it in items]
-        ys = [it['accuracy'] for it in items]
-        ax.plot(xs, ys, marker='o', label=model)
-    ax.set_xlabel('N')
-    ax.set_ylabel('Accuracy')
-    ax.set_title('Accuracy vs N')
-    ax.legend()
-    fig.savefig(out_path, bbox_inches='tight')
-    plt.close(fig)
 
+def _group(keys: np.ndarray, sort_by: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+    """Indices of each distinct key, sorted by ``sort_by`` within the group."""
+    order = np.lexsort((sort_by, keys))
+    names, starts = np.unique(keys[order], return_index=True)
+    return list(zip(names.tolist(), np.split(order, starts[1:])))
+
+
+def _figure_inputs(runs: List[Dict[str, Any]]) -> Dict[str, Tuple[Callable[..., str], Dict[str, Any]]]:
+    """Plot function and (JSON-able) input for each figure, derived in one pass.
+
+    The inputs are all a figure depends on, so they double as its fingerprint.
+    """
+    model = np.array([r['model_name'] for r in runs])
+    n = np.array([r['n'] for r in runs], dtype=float)
+    acc = np.array([r['accuracy'] for r in runs], dtype=float)
+    dur = np.array([r['duration_sec'] for r in runs], dtype=float)
+    cost = np.array([r.get('total_cost_usd', 0.0) for r in runs], dtype=float)
+    samples = np.array([r.get('avg_samples', r['n']) for r in runs], dtype=float)
+    series = np.array([f"{r['model_name']} ({r.get('strategy', 'best_of_n')})" for r in runs])
+    by_model = _group(model, n)
+
+    def lines(groups, xs, ys):
+        return [(label, xs[idx].tolist(), ys[idx].tolist()) for label, idx in groups]
+
+    lower = np.char.lower(model)
+    oneb = np.flatnonzero(np.char.find(lower, '1b') >= 0)
+    oneb = oneb[np.argsort(n[oneb], kind='stable')]
+    sevenb = np.flatnonzero((np.char.find(lower, '7b') >= 0) & (n == 1))
+    seven = int(sevenb[np.argmax(acc[sevenb])]) if len(oneb) and len(sevenb) else None
+    return {
+        'accuracy_vs_n.png': (_plot_lines, {
+            'series': lines(by_model, n, acc), 'xlabel': 'N', 'ylabel': 'Accuracy', 'title': 'Accuracy vs N'}),
+        # Fixed-N strategies spend exactly ``n``; adaptive ones record ``avg_samples``.
+        'accuracy_vs_samples.png': (_plot_lines, {
+            'series': lines(_group(series, samples), samples, acc), 'xlabel': 'Samples spent per task (avg)',
+            'ylabel': 'Accuracy', 'title': 'Accuracy vs Samples Spent', 'legend_size': 'small'}),
+        'latency_vs_n.png': (_plot_lines, {
+            'series': lines(by_model, n, dur), 'xlabel': 'N', 'ylabel': 'Duration (s)', 'title': 'Latency vs N'}),
+        'cost_vs_accuracy.png': (_plot_cost_vs_accuracy, {
+            'points': [(c, a, f'{m} n={k:g}') for c, a, m, k in zip(cost.tolist(), acc.tolist(), model.tolist(), n.tolist())]}),
+        'efficiency_curve.png': (_plot_efficiency, {
+            'oneb': [(cost[i], acc[i], n[i]) for i in oneb.tolist()] if seven is not None else [],
+            'seven': (cost[seven], acc[seven]) if seven is not None else None}),
+    }
 
-def _plot_latency_vs_n(runs: List[Dict[str, Any]], out_path: str) -> None:
+
+def _pyplot():
+    # Imported on first plot (in the pool workers), so a report with nothing
+    # to re-render never loads matplotlib.
+    import matplotlib
+    matplotlib.use('Agg')  # files only; never probe for a GUI backend
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _plot_lines(out_path: str, series: List[Tuple[str, List[float], List[float]]], xlabel: str, ylabel: str, title: str, legend_size: Optional[str] = None) -> str:
+    plt = _pyplot()
     fig, ax = plt.subplots()
-    by_model: Dict[str, List[Dict[str, Any]]] = {}
-    for r in runs:
-        by_model.setdefault(r['model_name'], []).append(r)
-    for model, items in by_model.items():
-        items = sorted(items, key=lambda x: x['n'])
-        xs = [it['n'] for it in items]
-        ys = [it['duration_sec'] for it in items]
-        ax.plot(xs, ys, marker='o', label=model)
-    ax.set_xlabel('N')
-    ax.set_ylabel('Duration (s)')
-    ax.set_title('Latency vs N')
-    ax.legend()
+    for label, xs, ys in series:
+        ax.plot(xs, ys, marker='o', label=label)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend(fontsize=legend_size)
     fig.savefig(out_path, bbox_inches='tight')
     plt.close(fig)
+    return ''
 
 
-def _plot_cost_vs_accuracy(runs: List[Dict[str, Any]], out_path: str) -> None:
+def _plot_cost_vs_accuracy(out_path: str, points: List[Tuple[float, float, str]]) -> str:
+    plt = _pyplot()
     fig, ax = plt.subplots()
-    for r in runs:
-        cost = r.get('total_cost_usd', 0.0)
-        ax.scatter(cost, r['accuracy'], label=f"{r['model_name']} n={r['n']}")
+    for cost, acc, label in points:
+        ax.scatter(cost, acc, label=label)
     ax.set_xlabel('Cost (USD)')
     ax.set_ylabel('Accuracy')
     ax.set_title('Cost vs Accuracy')
     ax.legend(fontsize='small')
     fig.savefig(out_path, bbox_inches='tight')
     plt.close(fig)
+    return ''
 
 
-def _plot_efficiency(runs: List[Dict[str, Any]], out_path: str) -> str:
+def _plot_efficiency(out_path: str, oneb: List[Tuple[float, float, float]], seven: Optional[Tuple[float, float]]) -> str:
     """Plot efficiency curve for 1B TTC vs 7B single-shot.
 
     Returns a human-readable string describing where the 1B curve crosses the 7B
     baseline, or an empty string if no intersection is found.
     """
+    plt = _pyplot()
     fig, ax = plt.subplots()
-    oneb = [r for r in runs if '1b' in r['model_name'].lower()]
-    sevenb = [r for r in runs if '7b' in r['model_name'].lower() and r.get('n', 1) == 1]
-    if not oneb or not sevenb:
+    if seven is None:
         fig.savefig(out_path, bbox_inches='tight')
         plt.close(fig)
         return ''
-    seven = max(sevenb, key=lambda x: x['accuracy'])
-    baseline_acc = seven['accuracy']
-    ax.scatter([seven.get('total_cost_usd', 0.0)], [seven['accuracy']], marker='x', color='red', label='7B single-shot')
-    ax.annotate('7B n=1', (seven.get('total_cost_usd', 0.0), seven['accuracy']))
-    oneb = sorted(oneb, key=lambda x: x['n'])
-    xs = [r.get('total_cost_usd', 0.0) for r in oneb]
-    ys = [r['accuracy'] for r in oneb]
-    ns = [r['n'] for r in oneb]
+    seven_cost, baseline_acc = seven
+    ax.scatter([seven_cost], [baseline_acc], marker='x', color='red', label='7B single-shot')
+    ax.annotate('7B n=1', (seven_cost, baseline_acc))
+    xs = [c for c, _, _ in oneb]
+    ys = [a for _, a, _ in oneb]
     ax.plot(xs, ys, marker='o', label='1B + TTC')
     cross_text = ''
-    for x, y, n in zip(xs, ys, ns):
+    for x, y, n in oneb:
         if y >= baseline_acc:
             ax.axvline(x, color='gray', linestyle='--')
-            ax.annotate(f'N={n}', (x, y), textcoords='offset points', xytext=(5, -5))
-            cross_text = f"1B+TTC matches 7B single-shot accuracy at N={n} (cost ≈ ${x:.2f})."
+            ax.annotate(f'N={n:g}', (x, y), textcoords='offset points', xytext=(5, -5))
+            cross_text = f"1B+TTC matches 7B single-shot accuracy at N={n:g} (cost ≈ ${x:.2f})."
             break
     ax.set_xlabel('Cost (USD)')
     ax.set_ylabel('Accuracy')
@@ -109,6 +141,55 @@ def _plot_efficiency(runs: List[Dict[str, Any]], out_path: str) -> str:
     return cross_text
 
 
+def _code_fingerprint() -> str:
+    try:
+        from importlib.metadata import version
+        h = hashlib.sha256(version('matplotlib').encode('utf-8'))
+    except Exception:
+        h = hashlib.sha256()
+    with open(__file__, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+def _render_figures(figs_dir: str, figures: Dict[str, Tuple[Callable[..., str], Dict[str, Any]]], workers: Optional[int] = None) -> Tuple[Dict[str, str], List[str]]:
+    """Render figures whose inputs changed since the last report.
+
+    Each figure's fingerprint (its input data plus this module's source) is
+    kept in ``figs_dir/figures.json``; a figure whose fingerprint matches and
+    whose file exists is reused as is. Changed figures render in a process
+    pool. Returns the text each figure produced and the names re-rendered.
+    """
+    manifest_path = os.path.join(figs_dir, MANIFEST)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    code_fp = _code_fingerprint()
+    texts: Dict[str, str] = {}
+    todo: Dict[str, str] = {}
+    for name, (fn, data) in figures.items():
+        fp = hashlib.sha256((code_fp + name + json.dumps(data, sort_keys=True)).encode('utf-8')).hexdigest()
+        old = manifest.get(name)
+        if old and old.get('fingerprint') == fp and os.path.exists(os.path.join(figs_dir, name)):
+            texts[name] = old.get('text', '')
+        else:
+            todo[name] = fp
+    if len(todo) > 1 and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=min(len(todo), workers or os.cpu_count() or 1)) as pool:
+            futures = {name: pool.submit(figures[name][0], os.path.join(figs_dir, name), **figures[name][1]) for name in todo}
+            rendered = {name: fut.result() for name, fut in futures.items()}
+    else:
+        rendered = {name: figures[name][0](os.path.join(figs_dir, name), **figures[name][1]) for name in todo}
+    for name, text in rendered.items():
+        texts[name] = text
+        manifest[name] = {'fingerprint': todo[name], 'text': text}
+    if todo:
+        save_json(manifest_path, manifest)
+    return texts, list(todo)
+
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
@@ -126,6 +207,8 @@ HTML_TEMPLATE = """
   <p><strong>Generated:</strong> {date}</p>
   <h2>Accuracy vs N</h2>
   <img src="{acc_img}" alt="Accuracy vs N">
+  <h2>Accuracy vs Samples Spent</h2>
+  <img src="{samples_img}" alt="Accuracy vs Samples Spent">
   <h2>Latency vs N</h2>
   <img src="{lat_img}" alt="Latency vs N">
   <h2>Cost vs Accuracy</h2>
@@ -145,6 +228,9 @@ Generated: {date}
 ## Accuracy vs N
 ![Accuracy vs N]({acc_img})
 
+## Accuracy vs Samples Spent
+![Accuracy vs Samples Spent]({samples_img})
+
 ## Latency vs N
 ![Latency vs N]({lat_img})
 
@@ -158,46 +244,29 @@ Generated: {date}
 """
 
 
-def generate_report(runs_root: str, out_dir: str, title: str = 'Neurometric TTC Benchmark Report') -> Dict[str, str]:
-    runs = _load_summaries(runs_root)
+def generate_report(runs_root: str, out_dir: str, title: str = 'Neurometric TTC Benchmark Report', index_path: Optional[str] = None, refresh: bool = True, task_path: Optional[str] = None, model: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+    runs = _load_summaries(runs_root, index_path, refresh, task_path=task_path, model=model, since=since, until=until)
     if not runs:
-        raise RuntimeError(f'No runs found under {runs_root}')
+        raise RuntimeError(f'No runs found under {runs_root} matching the filters')
     ensure_dir(out_dir)
     figs_dir = os.path.join(out_dir, 'figs')
     ensure_dir(figs_dir)
-    acc_path = os.path.join(figs_dir, 'accuracy_vs_n.png')
-    lat_path = os.path.join(figs_dir, 'latency_vs_n.png')
-    cost_path = os.path.join(figs_dir, 'cost_vs_accuracy.png')
-    eff_path = os.path.join(figs_dir, 'efficiency_curve.png')
-
-    _plot_accuracy_vs_n(runs, acc_path)
-    _plot_latency_vs_n(runs, lat_path)
-    _plot_cost_vs_accuracy(runs, cost_path)
-    cross_text = _plot_efficiency(runs, eff_path)
-
-    date = datetime.datetime.now().isoformat(timespec='seconds')
-    html = HTML_TEMPLATE.format(
-        title=title,
-        date=date,
-        acc_img=os.path.relpath(acc_path, out_dir),
-        lat_img=os.path.relpath(lat_path, out_dir),
-        cost_img=os.path.relpath(cost_path, out_dir),
-        eff_img=os.path.relpath(eff_path, out_dir),
-        cross_text=cross_text,
-    )
-    md = MD_TEMPLATE.format(
-        title=title,
-        date=date,
-        acc_img=os.path.relpath(acc_path, out_dir),
-        lat_img=os.path.relpath(lat_path, out_dir),
-        cost_img=os.path.relpath(cost_path, out_dir),
-        eff_img=os.path.relpath(eff_path, out_dir),
-        cross_text=cross_text,
-    )
+    texts, rendered = _render_figures(figs_dir, _figure_inputs(runs), workers)
+    imgs = {
+        'acc_img': 'accuracy_vs_n.png',
+        'samples_img': 'accuracy_vs_samples.png',
+        'lat_img': 'latency_vs_n.png',
+        'cost_img': 'cost_vs_accuracy.png',
+        'eff_img': 'efficiency_curve.png',
+    }
+    fields = {k: os.path.relpath(os.path.join(figs_dir, name), out_dir) for k, name in imgs.items()}
+    fields.update(title=title, date=datetime.datetime.now().isoformat(timespec='seconds'), cross_text=texts['efficiency_curve.png'])
+    html = HTML_TEMPLATE.format(**fields)
+    md = MD_TEMPLATE.format(**fields)
     html_path = os.path.join(out_dir, 'rich_report.html')
     md_path = os.path.join(out_dir, 'rich_report.md')
     with open(html_path, 'w', encoding='utf-8') as f:
         f.write(html)
     with open(md_path, 'w', encoding='utf-8') as f:
         f.write(md)
-    return {'html': html_path, 'markdown': md_path}
+    return {'html': html_path, 'markdown': md_path, 'rendered': rendered}
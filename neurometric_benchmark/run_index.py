@@ -0,0 +1,151 @@
+import os, json, sqlite3, datetime
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+from .utils.logging import iter_jsonl
+
+INDEX_FILENAME = 'index.sqlite'
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS runs ('
+    ' run_dir TEXT PRIMARY KEY, mtime REAL NOT NULL, summary TEXT NOT NULL,'
+    ' task_path TEXT, model_backend TEXT, model_name TEXT, strategy TEXT, n INTEGER,'
+    ' accuracy REAL, created TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS runs_model ON runs(model_name)',
+    'CREATE INDEX IF NOT EXISTS runs_task ON runs(task_path)',
+    'CREATE INDEX IF NOT EXISTS runs_created ON runs(created)',
+    'CREATE TABLE IF NOT EXISTS tasks ('
+    ' run_dir TEXT NOT NULL, task_id TEXT NOT NULL, type TEXT, ok INTEGER, score REAL,'
+    ' samples_used INTEGER, cost_usd REAL, duration_sec REAL,'
+    ' PRIMARY KEY (run_dir, task_id))',
+)
+
+
+def default_index_path(runs_root: str) -> str:
+    return os.path.join(runs_root, INDEX_FILENAME)
+
+
+def _summary_files(runs_root: str) -> Iterator[Tuple[str, float]]:
+    """Yield ``(run_dir, summary mtime)`` for every run under ``runs_root``.
+
+    Only directory listings and stats; no file is opened.
+    """
+    stack = [runs_root]
+    while stack:
+        d = stack.pop()
+        try:
+            entries = list(os.scandir(d))
+        except OSError:
+            continue
+        for e in entries:
+            if e.is_dir(follow_symlinks=False):
+                stack.append(e.path)
+            elif e.name == 'summary.json':
+                try:
+                    yield d, e.stat().st_mtime
+                except OSError:
+                    pass
+
+
+class RunIndex:
+    """Persistent SQLite index of run summaries and per-task records.
+
+    ``ingest`` is incremental: a run is (re)parsed only when its
+    ``summary.json`` mtime differs from the indexed one, and runs that have
+    disappeared are dropped. Reports then query the index instead of reading
+    every run.
+    """
+
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path)
+        for stmt in _SCHEMA:
+            self._db.execute(stmt)
+        self._db.commit()
+
+    def ingest(self, runs_root: str, rebuild: bool = False) -> Dict[str, int]:
+        """Bring the index up to date with ``runs_root``; returns change counts."""
+        if rebuild:
+            self._db.execute('DELETE FROM runs')
+            self._db.execute('DELETE FROM tasks')
+        runs_root = os.path.normpath(runs_root)
+        known = dict(self._db.execute('SELECT run_dir, mtime FROM runs'))
+        seen = set()
+        added = updated = 0
+        for run_dir, mtime in _summary_files(runs_root):
+            seen.add(run_dir)
+            if known.get(run_dir) == mtime:
+                continue
+            try:
+                with open(os.path.join(run_dir, 'summary.json'), 'r', encoding='utf-8') as f:
+                    s = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if run_dir in known:
+                updated += 1
+            else:
+                added += 1
+            self._store(run_dir, mtime, s)
+        gone = [d for d in known if d not in seen and (d + os.sep).startswith(runs_root + os.sep)]
+        for d in gone:
+            self._db.execute('DELETE FROM runs WHERE run_dir = ?', (d,))
+            self._db.execute('DELETE FROM tasks WHERE run_dir = ?', (d,))
+        self._db.commit()
+        return {'added': added, 'updated': updated, 'removed': len(gone), 'total': len(seen)}
+
+    def _store(self, run_dir: str, mtime: float, s: Dict[str, Any]) -> None:
+        created = datetime.datetime.fromtimestamp(mtime).isoformat(timespec='seconds')
+        self._db.execute(
+            'INSERT OR REPLACE INTO runs (run_dir, mtime, summary, task_path, model_backend, model_name,'
+            ' strategy, n, accuracy, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (run_dir, mtime, json.dumps(s, ensure_ascii=False), s.get('task_path'), s.get('model_backend'),
+             s.get('model_name'), s.get('strategy'), s.get('n'), s.get('accuracy'), created),
+        )
+        self._db.execute('DELETE FROM tasks WHERE run_dir = ?', (run_dir,))
+        rows = [
+            (run_dir, r.get('task_id'), r.get('type'), int(bool(r.get('ok'))), r.get('score'),
+             r.get('samples_used', 1), r.get('cost_usd', 0.0), r.get('duration_sec'))
+            for r in iter_jsonl(os.path.join(run_dir, 'details.jsonl'))
+        ]
+        self._db.executemany('INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def query(self, task_path: Optional[str] = None, model: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None, include_sweeps: bool = False) -> List[Dict[str, Any]]:
+        """Run summaries matching the filters, each with its ``run_dir``.
+
+        ``task_path`` and ``model`` match substrings; ``since``/``until`` are
+        ISO dates (inclusive) compared with when the summary was written.
+        Sweep parents are skipped unless ``include_sweeps``, as their per-k
+        summaries already represent them.
+        """
+        sql = 'SELECT run_dir, summary FROM runs WHERE 1=1'
+        args: List[Any] = []
+        if task_path:
+            sql += ' AND task_path LIKE ?'
+            args.append(f'%{task_path}%')
+        if model:
+            sql += ' AND model_name LIKE ?'
+            args.append(f'%{model}%')
+        if since:
+            sql += ' AND created >= ?'
+            args.append(since)
+        if until:
+            sql += ' AND created <= ?'
+            args.append(until + 'T23:59:59' if 'T' not in until else until)
+        if not include_sweeps:
+            sql += " AND COALESCE(strategy, '') != 'sweep'"
+        runs = []
+        for run_dir, blob in self._db.execute(sql + ' ORDER BY run_dir', args):
+            s = json.loads(blob)
+            s['run_dir'] = run_dir
+            runs.append(s)
+        return runs
+
+    def task_rows(self, run_dir: str) -> List[Dict[str, Any]]:
+        cur = self._db.execute('SELECT task_id, type, ok, score, samples_used, cost_usd, duration_sec FROM tasks WHERE run_dir = ?', (run_dir,))
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, row)) for row in cur]
+
+    def close(self) -> None:
+        self._db.close()
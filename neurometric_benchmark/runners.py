@@ -1,19 +1,46 @@
-import os, json, time
-from typing import Dict, Any, List, Tuple
-from .utils.logging import ensure_dir, append_jsonl, save_json, new_run_dir
+import os, json, time, math, hashlib, functools, inspect
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Tuple, Optional, Iterator
+from .cache import GenerationCache, DEFAULT_CACHE_PATH
+from .telemetry import RunTelemetry
+from .utils.concurrency import InFlightLimiter, AdaptiveLimiter, load_limit, save_limit, DEFAULT_CONCURRENCY_STATE
+from .utils.stats import latency_summary
+from .utils.text import completion_detector
+from .utils.logging import ensure_dir, save_json, new_run_dir, read_jsonl, JsonlWriter, ReorderBuffer, pack_json
 from .verifiers.numeric import verify_numeric
 from .verifiers.json_schema import verify_json
-from .verifiers.python_code import verify_python
+from .verifiers import sandbox
+from .verifiers.memo import VerificationMemo, normalize_candidate, DEFAULT_MEMO_PATH
 
-def load_tasks(path: str) -> List[Dict[str, Any]]:
-    tasks = []
+
+class SampleUnavailable(LookupError):
+    """A backend that serves stored samples (``replay``) never stored this one."""
+
+def load_tasks(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily yield the tasks in a JSONL file, one line at a time."""
     with open(path, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            tasks.append(json.loads(line))
-    return tasks
+            yield json.loads(line)
+
+def task_id(task: Dict[str, Any], idx: int) -> str:
+    """A task's id, or ``item_<idx>`` from its 1-based position in the file."""
+    return task.get('id', f'item_{idx}')
+
+def parse_shard(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse ``i/k`` (0-based shard ``i`` of ``k``); None or empty means no sharding."""
+    if not spec:
+        return None
+    i, k = (int(x) for x in spec.split('/', 1))
+    if k < 1 or not 0 <= i < k:
+        raise ValueError(f'Invalid shard {spec!r}: expected i/k with 0 <= i < k')
+    return i, k
+
+def shard_of(tid: str, k: int) -> int:
+    """Stable shard of a task id; independent of process, machine and file order."""
+    return int(hashlib.sha1(tid.encode('utf-8')).hexdigest()[:15], 16) % k
 
 def normalize_answer(task: Dict[str, Any], text: str) -> Tuple[bool, float, Dict[str, Any]]:
     ttype = task.get('type')
@@ -22,7 +49,7 @@ def normalize_answer(task: Dict[str, Any], text: str) -> Tuple[bool, float, Dict
     elif ttype == 'json':
         return verify_json(text, task['answer'], required_keys=task.get('required_keys'))
     elif ttype == 'python':
-        return verify_python(text, task['fn_name'], task['tests'])
+        return sandbox.verify_python_sandboxed(text, task['fn_name'], task['tests'])
     else:
         ok = (text.strip() == str(task['answer']).strip())
         return ok, (1.0 if ok else 0.0), {}
@@ -50,75 +77,832 @@ def build_prompt(task: Dict[str, Any]) -> str:
     else:
         return task['prompt']
 
-def _call_model(model_generate, model_name: str, prompt: str, temperature: float) -> Dict[str, Any]:
+def _call_model(model_generate, model_name: str, prompt: str, temperature: float, limiter: Optional[InFlightLimiter] = None, cache: Optional[GenerationCache] = None, sample_idx: int = 0) -> Dict[str, Any]:
     """Helper that normalises the output from different model backends.
 
     Some backends (e.g., OpenAI) return extra metadata such as token counts and
     cost. Others simply return the generated text. This function wraps the call
     so downstream code always receives a dictionary with at least a ``text``
-    field and optional ``cost_usd``.
+    field and optional ``cost_usd``, plus the measured wall time ``latency_sec``
+    (which includes any wait for the ``limiter``'s in-flight request limit).
+    The limiter is told each call's own latency, output tokens and retries.
+
+    With a ``cache``, the ``sample_idx``-th sample for this exact prompt and
+    sampling options (see ``_cache_options``) is served from disk when present (``cached`` is set on the
+    result, which keeps the original ``cost_usd`` so reruns stay comparable).
+    Backends that serve stored samples (``replay``) are passed ``sample_idx``.
+    A call that runs out of time (``TimeoutError``, e.g. a task deadline)
+    yields an empty candidate marked ``deadline_exceeded`` instead of failing
+    the run; it is never cached.
+    """
+    t0 = time.time()
+    key = None
+    if cache is not None and cache.enabled:
+        key = cache.key(model_name, prompt, _cache_options(model_generate, temperature), sample_idx)
+        hit = cache.get(key)
+        if hit is not None:
+            hit['cached'] = True
+            hit['latency_sec'] = time.time() - t0
+            return hit
+    kwargs = {'sample_idx': sample_idx} if getattr(model_generate, 'takes_sample_idx', False) else {}
+    try:
+        if limiter is not None:
+            with limiter:
+                t1 = time.time()
+                out = model_generate(model_name, prompt, temperature=temperature, **kwargs)
+                done = out if isinstance(out, dict) else {'text': out}
+                limiter.observe(time.time() - t1, _output_tokens(done), int(done.get('retries') or 0))
+        else:
+            out = model_generate(model_name, prompt, temperature=temperature, **kwargs)
+    except TimeoutError:
+        out = {'text': '', 'cost_usd': 0.0, 'deadline_exceeded': True}
+        key = None
+    if not isinstance(out, dict):
+        out = {'text': out, 'cost_usd': 0.0}
+    out['latency_sec'] = time.time() - t0
+    if key is not None:
+        cache.put(key, out, out['latency_sec'])
+    return out
+
+
+# Backend arguments that change what a generation returns.
+_OUTPUT_OPTIONS = ('top_p', 'json_mode', 'stream')
+
+def _cache_options(model_generate, temperature: float) -> Dict[str, Any]:
+    """The sampling options a generation is cached under.
+
+    Besides ``temperature``, the backend's own values (defaults, or those
+    bound by ``functools.partial``) of ``_OUTPUT_OPTIONS``, and
+    ``early_stop`` when a ``stop_when`` detector may cut the sample short,
+    so a truncated stream is never served to a run that wants a full one.
+    """
+    opts: Dict[str, Any] = {'temperature': temperature}
+    try:
+        params = inspect.signature(model_generate).parameters
+    except (TypeError, ValueError):
+        return opts
+    for name in _OUTPUT_OPTIONS:
+        if name in params and params[name].default is not inspect.Parameter.empty:
+            opts[name] = params[name].default
+    if 'stop_when' in params and params['stop_when'].default not in (None, inspect.Parameter.empty):
+        opts['early_stop'] = True
+    return opts
+
+def load_backend(backend: str):
+    """The ``generate`` function of a model backend, imported on demand."""
+    if backend == 'ollama':
+        from .models.ollama_client import generate
+    elif backend == 'openai':
+        from .models.openai_client import generate
+    elif backend == 'replay':
+        from .models.replay_client import generate
+    else:
+        raise ValueError('Unknown model backend: ' + backend)
+    return generate
+
+def run_single(model_generate, model_name: str, task: Dict[str, Any], temperature: float, limiter: Optional[InFlightLimiter] = None, cache: Optional[GenerationCache] = None, memo: Optional[VerificationMemo] = None) -> Dict[str, Any]:
+    prompt = build_prompt(task)
+    out = _call_model(model_generate, model_name, prompt, temperature, limiter, cache)
+    cand = _score_candidate(task, out.get('text', ''), memo)
+    out['verify_sec'] = cand['verify_sec']
+    return {'text': cand['text'], 'ok': cand['ok'], 'score': cand['score'], 'dist': cand['dist'], 'meta': cand['meta'],
+            'cost_usd': out.get('cost_usd', 0.0), 'samples_used': 1, 'calls': [_call_info(out)], 'outputs': [dict(out, sample_idx=0)],
+            'dedup_ratio': 0.0, 'verify_memo_hits': int(cand['memo_hit'])}
+
+def _score_candidate(task: Dict[str, Any], text: str, memo: Optional[VerificationMemo] = None) -> Dict[str, Any]:
+    t0 = time.time()
+    hit = False
+    if memo is not None and memo.mode != 'off':
+        (ok, score, meta), hit = memo.lookup(task, text, normalize_answer)
+    else:
+        ok, score, meta = normalize_answer(task, text)
+    if task.get('type') == 'numeric':
+        dist = abs(meta.get('abs_error', 1e9)) if meta and meta.get('abs_error') is not None else 1e9
+    else:
+        dist = 1.0 - float(score)
+    return {'text': text, 'ok': ok, 'score': score, 'dist': dist, 'meta': meta, 'memo_hit': hit, 'verify_sec': time.time() - t0}
+
+def _sample_candidates(model_generate, model_name: str, task: Dict[str, Any], prompt: str, temperature: float, indices: List[int], concurrency: int = 1, limiter: Optional[InFlightLimiter] = None, cache: Optional[GenerationCache] = None, memo: Optional[VerificationMemo] = None) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Generate and verify one candidate per sample index.
+
+    Returns ``(candidate, raw_output)`` pairs in the order of ``indices``.
+    With ``concurrency > 1`` the generations are issued by a bounded thread
+    pool and each one is verified as soon as it arrives. Samples the backend
+    does not have (``SampleUnavailable``) are left out, so fewer pairs than
+    ``indices`` means the stored samples ran out.
     """
-    out = model_generate(model_name, prompt, temperature=temperature)
-    if isinstance(out, dict):
-        return out
+    pairs: List[Any] = [None] * len(indices)
+
+    def sample(j: int) -> bool:
+        try:
+            out = _call_model(model_generate, model_name, prompt, temperature, limiter, cache, sample_idx=indices[j])
+        except SampleUnavailable:
+            return True
+        cand = _score_candidate(task, out.get('text', ''), memo)
+        cand['sample_idx'] = indices[j]
+        out['verify_sec'] = cand['verify_sec']
+        pairs[j] = (cand, out)
+        return bool(out.get('cached') or out.get('deadline_exceeded'))
+
+    if concurrency <= 1:
+        for j in range(len(indices)):
+            instant = sample(j)  # served from cache, or no time left to call the model
+            # Add a small delay between requests to prevent overwhelming Ollama
+            if j < len(indices) - 1 and not instant:  # Don't delay after the last request
+                time.sleep(0.1)
     else:
-        return {'text': out, 'cost_usd': 0.0}
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(indices))) as pool:
+            for fut in as_completed([pool.submit(sample, j) for j in range(len(indices))]):
+                fut.result()
+    return [p for p in pairs if p is not None]
+
+def _call_info(out: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything a backend reported about one call, minus the text."""
+    return {k: v for k, v in out.items() if k != 'text'}
+
+def _select_best(pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]], task: Dict[str, Any]) -> Dict[str, Any]:
+    """Pick the winner by ``(-score, dist)``; ties keep sample order.
 
+    Also reports ``dedup_ratio``, the share of candidates that duplicate an
+    earlier one after whitespace normalisation, ``verify_memo_hits``, and the
+    raw ``outputs`` in sample order (what ``details.jsonl`` stores for replay).
+    """
+    cands = [c for c, _ in pairs]
+    ranked = sorted(cands, key=lambda x: (-x['score'], x['dist']))
+    best = dict(ranked[0])
+    best['all_candidates'] = ranked
+    best['cost_usd'] = sum(o.get('cost_usd', 0.0) for _, o in pairs)
+    best['samples_used'] = len(pairs)
+    best['calls'] = [_call_info(o) for _, o in pairs]
+    best['outputs'] = [dict(o, sample_idx=c['sample_idx']) for c, o in pairs]
+    unique = len({normalize_candidate(task, c['text']) for c in cands})
+    best['dedup_ratio'] = 1.0 - unique / max(len(cands), 1)
+    best['verify_memo_hits'] = sum(1 for c in cands if c.get('memo_hit'))
+    return best
 
-def run_single(model_generate, model_name: str, task: Dict[str, Any], temperature: float) -> Dict[str, Any]:
+def run_best_of_n(model_generate, model_name: str, task: Dict[str, Any], temperature: float, n: int, concurrency: int = 1, limiter: Optional[InFlightLimiter] = None, cache: Optional[GenerationCache] = None, memo: Optional[VerificationMemo] = None) -> Dict[str, Any]:
+    """Sample ``n`` candidates and keep the best by ``(-score, dist)``.
+
+    With ``concurrency > 1`` the candidates are generated in parallel. They are
+    kept in sample order before sorting, so ties resolve exactly as in a serial
+    run. When a replayed run stored fewer than ``n``, the stored ones are used
+    and ``stop_reason`` is ``replay_exhausted``.
+    """
     prompt = build_prompt(task)
-    out = _call_model(model_generate, model_name, prompt, temperature)
-    text = out.get('text', '')
-    ok, score, meta = normalize_answer(task, text)
-    return {'text': text, 'ok': ok, 'score': score, 'meta': meta, 'cost_usd': out.get('cost_usd', 0.0)}
+    pairs = _sample_candidates(model_generate, model_name, task, prompt, temperature, list(range(n)), concurrency, limiter, cache, memo)
+    if not pairs:
+        raise SampleUnavailable(f'no stored sample of {model_name} for task {task.get("id")}')
+    best = _select_best(pairs, task)
+    if len(pairs) < n:
+        best['stop_reason'] = 'replay_exhausted'
+    return best
+
+def _answer_key(task: Dict[str, Any], cand: Dict[str, Any]) -> Optional[str]:
+    """Canonical form of a candidate's answer, used to detect agreement."""
+    meta = cand.get('meta') or {}
+    ttype = task.get('type')
+    if ttype == 'numeric':
+        parsed = meta.get('parsed')
+        return None if parsed is None else repr(float(parsed))
+    if ttype == 'json':
+        obj = meta.get('candidate')
+        return None if obj is None else json.dumps(obj, sort_keys=True, ensure_ascii=False)
+    text = ' '.join((cand.get('text') or '').split())
+    return text or None
+
+def _output_tokens(out: Dict[str, Any]) -> int:
+    """Completion tokens reported by the backend, else a whitespace estimate."""
+    if out.get('output_tokens'):
+        return int(out['output_tokens'])
+    return len((out.get('text') or '').split())
+
+def _settled(cands: List[Dict[str, Any]], votes: Dict[str, int], consensus: int) -> Optional[str]:
+    """``perfect`` or ``consensus`` once more samples are unlikely to help, else None."""
+    top = max(votes.values()) if votes else 0
+    if any(c['score'] >= 1.0 for c in cands):
+        return 'perfect'
+    if top >= consensus and top * 2 > len(cands):
+        return 'consensus'
+    return None
+
+def run_adaptive_best_of_n(model_generate, model_name: str, task: Dict[str, Any], temperature: float, n: int, wave_size: int = 0, consensus: int = 3, token_budget: Optional[int] = None, time_budget: Optional[float] = None, concurrency: int = 1, limiter: Optional[InFlightLimiter] = None, cache: Optional[GenerationCache] = None, memo: Optional[VerificationMemo] = None) -> Dict[str, Any]:
+    """Best-of-N that samples in waves and stops as soon as more samples are unlikely to help.
 
-def run_best_of_n(model_generate, model_name: str, task: Dict[str, Any], temperature: float, n: int) -> Dict[str, Any]:
+    After each wave of ``wave_size`` samples (default: ``concurrency``) it
+    stops on a perfect verifier score, when ``consensus`` candidates agree on
+    the same parsed answer and form a majority, or when the per-task token or
+    time budget is spent. ``n`` caps the total. A replayed run also stops
+    once its stored samples run out (``replay_exhausted``). The result
+    records ``samples_used`` and ``stop_reason``.
+    """
     prompt = build_prompt(task)
-    cands = []
-    total_cost = 0.0
-    for i in range(n):
-        out = _call_model(model_generate, model_name, prompt, temperature)
-        text = out.get('text', '')
-        total_cost += out.get('cost_usd', 0.0)
-        ok, score, meta = normalize_answer(task, text)
-        if task.get('type') == 'numeric':
-            dist = abs(meta.get('abs_error', 1e9)) if meta else 1e9
+    wave = max(1, wave_size or concurrency)
+    pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    cands: List[Dict[str, Any]] = []
+    votes: Dict[str, int] = {}
+    tokens = 0
+    start = time.time()
+    reason = 'exhausted'
+    while len(cands) < n:
+        indices = list(range(len(cands), min(n, len(cands) + wave)))
+        got = _sample_candidates(model_generate, model_name, task, prompt, temperature, indices, concurrency, limiter, cache, memo)
+        for cand, out in got:
+            pairs.append((cand, out))
+            cands.append(cand)
+            tokens += _output_tokens(out)
+            key = _answer_key(task, cand)
+            if key is not None:
+                votes[key] = votes.get(key, 0) + 1
+        if not cands:
+            raise SampleUnavailable(f'no stored sample of {model_name} for task {task.get("id")}')
+        settled = _settled(cands, votes, consensus)
+        if settled:
+            reason = settled
+        elif len(got) < len(indices):
+            reason = 'replay_exhausted'
+        elif token_budget is not None and tokens >= token_budget:
+            reason = 'token_budget'
+        elif time_budget is not None and time.time() - start >= time_budget:
+            reason = 'time_budget'
         else:
-            dist = 1.0 - float(score)
-        cands.append({'text': text, 'ok': ok, 'score': score, 'dist': dist, 'meta': meta})
-        # Add a small delay between requests to prevent overwhelming Ollama
-        if i < n - 1:  # Don't delay after the last request
-            time.sleep(0.1)
-    cands.sort(key=lambda x: (-x['score'], x['dist']))
-    best = cands[0]
-    best['all_candidates'] = cands
-    best['cost_usd'] = total_cost
+            continue
+        break
+    best = _select_best(pairs, task)
+    best['stop_reason'] = reason
     return best
 
-def evaluate(task_path: str, model_backend: str, model_name: str, strategy: str, temperature: float, n: int=1, run_root: str='runs', meta_notes: str='') -> Dict[str, Any]:
-    tasks = load_tasks(task_path)
-    run_dir = new_run_dir(run_root)
-    ensure_dir(run_dir)
-    details_path = os.path.join(run_dir, 'details.jsonl')
+BUDGET_UNITS = ('samples', 'tokens', 'seconds')
+
+def run_budgeted(generator_for, model_name: str, tasks: List[Dict[str, Any]], temperature: float, budget: float, unit: str = 'samples', n: int = 0, wave_size: int = 0, consensus: int = 3, concurrency: int = 1, task_concurrency: int = 1, limiter: Optional[InFlightLimiter] = None, cache: Optional[GenerationCache] = None, memo: Optional[VerificationMemo] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Best-of-N under one compute budget shared by all ``tasks``.
+
+    Every task first gets ``wave_size`` samples (default 2, fewer if the
+    budget cannot cover that, but never none). The rest of the budget goes, a wave at a time,
+    to the unsettled tasks that need it most: lowest best verifier score
+    first, then least agreement between parsed answers. A task is settled by
+    a perfect score or by ``consensus`` as in ``run_adaptive_best_of_n``, or
+    at ``n`` samples when ``n > 1``. ``budget`` is in ``unit``: samples,
+    output tokens or wall-clock seconds. A sample's tokens or seconds are
+    only known afterwards, so for those units the first round is a one-sample
+    probe per task and later waves are cut to what the budget left covers at
+    the average cost of a sample so far; the estimate can still be off by a
+    few samples.
+
+    ``generator_for(task)`` returns the ``model_generate`` to use for a task.
+    Returns the per-task results in task order, plus the spend and the
+    accuracy reached after each round.
+    """
+    if unit not in BUDGET_UNITS:
+        raise ValueError('Unknown budget unit: ' + unit)
+    wave = max(1, wave_size or 2)
+    cap = n if n > 1 else None
+    start = time.time()
+    states = [{'task': t, 'prompt': build_prompt(t), 'gen': generator_for(t), 'pairs': [], 'votes': {},
+               'tokens': 0, 'sec': 0.0, 'reason': None} for t in tasks]
+
+    def spent() -> Dict[str, float]:
+        return {
+            'samples': sum(len(st['pairs']) for st in states),
+            'tokens': sum(st['tokens'] for st in states),
+            'seconds': time.time() - start,
+        }
+
+    def grow(st: Dict[str, Any], k: int) -> None:
+        t0 = time.time()
+        m = len(st['pairs'])
+        got = _sample_candidates(st['gen'], model_name, st['task'], st['prompt'], temperature,
+                                 list(range(m, m + k)), concurrency, limiter, cache, memo)
+        if not st['pairs'] and not got:
+            raise SampleUnavailable(f'no stored sample of {model_name} for task {st["task"].get("id")}')
+        for cand, out in got:
+            st['pairs'].append((cand, out))
+            st['tokens'] += _output_tokens(out)
+            key = _answer_key(st['task'], cand)
+            if key is not None:
+                st['votes'][key] = st['votes'].get(key, 0) + 1
+        st['sec'] += time.time() - t0
+        cands = [c for c, _ in st['pairs']]
+        st['reason'] = (_settled(cands, st['votes'], consensus) or ('cap' if cap and len(cands) >= cap else None)
+                        or ('replay_exhausted' if len(got) < k else None))
+
+    def need(st: Dict[str, Any]) -> float:
+        cands = [c for c, _ in st['pairs']]
+        top = max(st['votes'].values()) if st['votes'] else 0
+        return (1.0 - max(c['score'] for c in cands)) + (1.0 - top / len(cands))
+
+    def run_round(batch: List[Tuple[Dict[str, Any], int]]) -> None:
+        if task_concurrency <= 1 or len(batch) == 1:
+            for st, k in batch:
+                grow(st, k)
+        else:
+            with ThreadPoolExecutor(max_workers=min(task_concurrency, len(batch))) as pool:
+                for fut in [pool.submit(grow, st, k) for st, k in batch]:
+                    fut.result()
+
+    curve: List[Dict[str, float]] = []
+
+    def snapshot() -> None:
+        ok = sum(1 for st in states if min((c for c, _ in st['pairs']), key=lambda c: (-c['score'], c['dist']))['ok'])
+        point = spent()
+        point['accuracy'] = ok / max(len(states), 1)
+        curve.append(point)
+
+    first = 1  # probe: what a sample costs in tokens or seconds is not known yet
+    if unit == 'samples' and states:
+        first = max(1, min(wave, int(budget) // len(states)))
+    run_round([(st, min(first, cap or first)) for st in states])
+    snapshot()
+    rounds = 1
+    while True:
+        left = budget - spent()[unit]
+        pending = [st for st in states if st['reason'] is None]
+        if not pending or left <= 0 or (unit == 'samples' and left < 1):
+            break
+        pending.sort(key=lambda st: (-need(st), len(st['pairs'])))
+        used = spent()
+        per_sample = 1.0 if unit == 'samples' else max(used[unit] / max(used['samples'], 1), 1e-9)
+        batch = []
+        for st in pending[:max(1, task_concurrency)]:
+            if left <= 0:
+                break
+            k = min(wave, cap - len(st['pairs'])) if cap else wave
+            k = min(k, int(left) if unit == 'samples' else max(1, int(left / per_sample)))
+            left -= k * per_sample
+            if k > 0:
+                batch.append((st, k))
+        if not batch:
+            break
+        run_round(batch)
+        snapshot()
+        rounds += 1
     results = []
+    for st in states:
+        best = _select_best(st['pairs'], st['task'])
+        best['stop_reason'] = st['reason'] or 'budget'
+        best['duration_sec'] = st['sec']
+        results.append(best)
+    # Keep the curve short enough for summary.json, always ending on the final point.
+    step = max(1, math.ceil(len(curve) / 100))
+    points = curve[::step] + ([curve[-1]] if (len(curve) - 1) % step else [])
+    return results, {'unit': unit, 'budget': budget, 'spent': spent(), 'rounds': rounds, 'curve': points}
+
+def run_cascade(tiers: List[Dict[str, Any]], task: Dict[str, Any], temperature: float, threshold: float = 1.0, concurrency: int = 1, limiter: Optional[InFlightLimiter] = None, memo: Optional[VerificationMemo] = None) -> Dict[str, Any]:
+    """Try models from smallest to largest, escalating while the verifier score is below ``threshold``.
+
+    Each tier is a dict with ``generate``, ``model`` (the backend/name label),
+    ``model_name``, ``n`` and ``cache``; ``n > 1`` means best-of-N at that
+    tier. The answer is the best over the tiers tried, with ties going to the
+    larger model. ``tiers`` in the result has per-tier samples, cost, latency
+    and score. A replayed run whose source never ran a larger tier for the
+    task stops there (``replay_exhausted``).
+    """
+    tried = []
+    exhausted = False
+    for i, tier in enumerate(tiers):
+        t0 = time.time()
+        try:
+            if tier['n'] > 1:
+                out = run_best_of_n(tier['generate'], tier['model_name'], task, temperature, tier['n'], concurrency, limiter, tier['cache'], memo)
+            else:
+                out = run_single(tier['generate'], tier['model_name'], task, temperature, limiter, tier['cache'], memo)
+        except SampleUnavailable:
+            if not tried:
+                raise
+            exhausted = True
+            break
+        out['tier'] = i
+        out['tier_sec'] = time.time() - t0
+        tried.append(out)
+        if out['score'] >= threshold:
+            break
+    best = dict(min(tried, key=lambda o: (-o['score'], o['dist'], -o['tier'])))
+    best['calls'] = [c for o in tried for c in o.get('calls', [])]
+    best['outputs'] = [dict(x, model=tiers[o['tier']]['model_name'], tier=o['tier']) for o in tried for x in o['outputs']]
+    best['cost_usd'] = sum(o.get('cost_usd', 0.0) for o in tried)
+    best['samples_used'] = sum(o.get('samples_used', 1) for o in tried)
+    best['verify_memo_hits'] = sum(o.get('verify_memo_hits', 0) for o in tried)
+    best['stop_reason'] = 'accepted' if tried[-1]['score'] >= threshold else 'replay_exhausted' if exhausted else 'last_tier'
+    best['tiers'] = [{
+        'model': tiers[o['tier']]['model'],
+        'samples': o.get('samples_used', 1),
+        'cost_usd': o.get('cost_usd', 0.0),
+        'generation_sec': sum(c.get('latency_sec') or 0.0 for c in o.get('calls', []) if not c.get('cached')),
+        'duration_sec': o['tier_sec'],
+        'score': o['score'],
+        'ok': o['ok'],
+    } for o in tried]
+    return best
+
+# Per-sample fields kept in each details.jsonl record.
+_SAMPLE_FIELDS = ('latency_sec', 'verify_sec', 'input_tokens', 'output_tokens', 'retries', 'cached',
+                  'server_load_sec', 'server_eval_sec', 'ttft_sec', 'aborted', 'rate_wait_sec', 'endpoint',
+                  'hedge', 'deadline_exceeded')
+
+# What details.jsonl keeps of every generated candidate (compressed, as
+# ``candidates_z``), enough for the replay backend to serve it again.
+_STORED_FIELDS = ('model', 'tier', 'sample_idx', 'text', 'cost_usd', 'input_tokens', 'output_tokens')
+
+def _stored_candidates(outputs: List[Dict[str, Any]], model_name: str) -> str:
+    rows = []
+    for o in outputs:
+        row = {k: o[k] for k in _STORED_FIELDS if o.get(k) is not None}
+        row.setdefault('model', model_name)
+        rows.append(row)
+    return pack_json(rows)
+
+def _samples(calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Compact per-candidate instrumentation, in sample order."""
+    return [{k: c[k] for k in _SAMPLE_FIELDS if c.get(k) is not None} for c in calls]
+
+def _usage(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-task roll-up of the model calls behind one record."""
+    ttfts = [c['ttft_sec'] for c in calls if c.get('ttft_sec') is not None]
+    aborted = [c for c in calls if c.get('aborted')]
+    full = [c for c in calls if 'aborted' in c and not c['aborted'] and not c.get('cached')]
+    live = [c for c in calls if not c.get('cached')]
+    return {
+        'calls': len(calls),
+        'cached': len(calls) - len(live),
+        'input_tokens': sum(int(c.get('input_tokens') or 0) for c in calls),
+        'output_tokens': sum(int(c.get('output_tokens') or 0) for c in calls),
+        'retries': sum(int(c.get('retries') or 0) for c in calls),
+        'generation_sec': sum(c.get('latency_sec') or 0.0 for c in live),
+        'verification_sec': sum(c.get('verify_sec') or 0.0 for c in calls),
+        'server_load_sec': sum(c.get('server_load_sec') or 0.0 for c in live),
+        'server_eval_sec': sum(c.get('server_eval_sec') or 0.0 for c in live),
+        'rate_wait_sec': sum(c.get('rate_wait_sec') or 0.0 for c in live),
+        'ttft_sec_avg': sum(ttfts) / len(ttfts) if ttfts else None,
+        'aborted': len(aborted),
+        'aborted_tokens': sum(int(c.get('output_tokens') or 0) for c in aborted),
+        'full_streams': len(full),
+        'full_stream_tokens': sum(int(c.get('output_tokens') or 0) for c in full),
+        'hedges': sum(1 for c in live if c.get('hedge')),
+        'hedges_won': sum(1 for c in live if c.get('hedge') == 'won'),
+        'deadline_exceeded': sum(1 for c in calls if c.get('deadline_exceeded')),
+    }
+
+def _performance_summary(results: List[Dict[str, Any]], wall_sec: float, io_sec: float) -> Dict[str, Any]:
+    """Run-level latency percentiles, throughput and where the time went.
+
+    ``generation_sec`` and ``verification_sec`` are summed over calls, so with
+    concurrency they can exceed ``wall_sec``. Tokens/sec uses the server's own
+    eval time when the backend reports it, else call wall time.
+    """
+    usages = [r['usage'] for r in results]
+    latencies = [smp['latency_sec'] for r in results for smp in r.get('samples', [])
+                 if not smp.get('cached') and smp.get('latency_sec') is not None]
+    out_tokens = sum(u['output_tokens'] for u in usages)
+    live_tokens = sum(smp.get('output_tokens', 0) for r in results for smp in r.get('samples', []) if not smp.get('cached'))
+    eval_sec = sum(u['server_eval_sec'] for u in usages)
+    gen_sec = sum(u['generation_sec'] for u in usages)
+    denom = eval_sec or gen_sec
+    return {
+        'latency_sec': latency_summary(latencies),
+        'tokens': {
+            'input': sum(u['input_tokens'] for u in usages),
+            'output': out_tokens,
+            'tokens_per_sec': live_tokens / denom if denom else None,
+        },
+        'retries': sum(u['retries'] for u in usages),
+        'hedges': {'fired': sum(u.get('hedges', 0) for u in usages), 'won': sum(u.get('hedges_won', 0) for u in usages)},
+        'deadline_exceeded': sum(u.get('deadline_exceeded', 0) for u in usages),
+        'time_split_sec': {
+            'wall': wall_sec,
+            'generation': gen_sec,
+            'server_load': sum(u['server_load_sec'] for u in usages),
+            'rate_wait': sum(u.get('rate_wait_sec', 0.0) for u in usages),
+            'verification': sum(u['verification_sec'] for u in usages),
+            'io': io_sec,
+        },
+    }
+
+def _streaming_summary(results: List[Dict[str, Any]], enabled: bool) -> Dict[str, Any]:
+    """Run-level streaming stats.
+
+    Tokens saved are estimated as, for each aborted stream, the mean length of
+    the streams in this run that ran to completion minus what was generated.
+    """
+    usages = [r['usage'] for r in results]
+    ttfts = [u['ttft_sec_avg'] for u in usages if u['ttft_sec_avg'] is not None]
+    aborted = sum(u['aborted'] for u in usages)
+    full = sum(u['full_streams'] for u in usages)
+    saved = None
+    if full:
+        mean_full = sum(u['full_stream_tokens'] for u in usages) / full
+        saved = max(0.0, aborted * mean_full - sum(u['aborted_tokens'] for u in usages))
+    return {
+        'enabled': enabled,
+        'avg_ttft_sec': sum(ttfts) / len(ttfts) if ttfts else None,
+        'aborted_samples': aborted,
+        'tokens_saved_est': saved,
+    }
+
+def best_of_k_curve(cands: List[Dict[str, Any]]) -> List[float]:
+    """Unbiased best-of-k accuracy for every k from one pool of N candidates.
+
+    Returns ``p`` where ``p[k-1]`` is the probability that best-of-k selection
+    over a uniformly random k-subset of ``cands`` (given in sample order)
+    picks a correct candidate. Ranking is the same total order as
+    ``_select_best``: ``(-score, dist)``, then sample order. The candidate at
+    rank ``j`` is chosen exactly when it is in the subset and no better-ranked
+    one is, which happens in ``C(N-1-j, k-1)`` of the ``C(N, k)`` subsets.
+    """
+    n = len(cands)
+    order = sorted(range(n), key=lambda i: (-cands[i]['score'], cands[i]['dist'], i))
+    oks = [1 if cands[i]['ok'] else 0 for i in order]
+    curve = []
+    for k in range(1, n + 1):
+        total = math.comb(n, k)
+        curve.append(sum(math.comb(n - 1 - j, k - 1) for j in range(n) if oks[j]) / total)
+    return curve
+
+def run_sweep(model_generate, model_name: str, task: Dict[str, Any], temperature: float, n: int, concurrency: int = 1, limiter: Optional[InFlightLimiter] = None, cache: Optional[GenerationCache] = None, memo: Optional[VerificationMemo] = None) -> Dict[str, Any]:
+    """Draw ``n`` candidates once and score best-of-k for every ``k <= n``.
+
+    The returned record is the best-of-``n`` winner plus ``best_of_k`` (see
+    ``best_of_k_curve``) and every candidate's verdict, so smaller N never need
+    their own runs. The candidate texts are in the record's ``outputs``.
+    """
+    best = run_best_of_n(model_generate, model_name, task, temperature, n, concurrency, limiter, cache, memo)
+    cands = sorted(best['all_candidates'], key=lambda c: c['sample_idx'])
+    best['best_of_k'] = best_of_k_curve(cands)
+    best['candidates'] = [{k: c[k] for k in ('sample_idx', 'ok', 'score', 'dist')} for c in cands]
+    return best
+
+def _write_sweep_summaries(run_dir: str, summary: Dict[str, Any], results: List[Dict[str, Any]]) -> List[str]:
+    """Write ``k_XXX/summary.json`` (a best-of-k run summary) for each k.
+
+    Cost and duration are pro-rated from the full sweep, as best-of-k spends
+    k/N of its samples; ``estimated_from`` points back at the sweep.
+    """
+    n = summary['n']
+    paths = []
+    for k in range(1, n + 1):
+        acc = sum(r['best_of_k'][k - 1] for r in results) / max(len(results), 1)
+        sub = dict(summary)
+        sub.update({
+            'strategy': 'single' if k == 1 else 'best_of_n',
+            'n': k,
+            'accuracy': acc,
+            'total_samples': k * len(results),
+            'avg_samples': float(k),
+            'duration_sec': summary['duration_sec'] * k / n,
+            'total_cost_usd': summary['total_cost_usd'] * k / n,
+            'estimated_from': run_dir,
+        })
+        d = os.path.join(run_dir, f'k_{k:03d}')
+        ensure_dir(d)
+        save_json(os.path.join(d, 'summary.json'), sub)
+        paths.append(d)
+    return paths
+
+# Settings recorded in run_config.json; a resumed run is re-created from them.
+RUN_CONFIG_KEYS = ('task_path', 'model_backend', 'model_name', 'strategy', 'n', 'temperature', 'concurrency',
+                   'task_concurrency', 'cache_mode', 'stream', 'verify_memo', 'wave_size', 'consensus',
+                   'task_token_budget', 'task_time_budget', 'shard', 'budget', 'budget_unit', 'escalate_to',
+                   'escalate_below', 'escalate_n', 'task_deadline', 'adaptive_concurrency', 'meta_notes')
+
+def _endpoint(backend: str) -> str:
+    """Where ``backend`` sends its requests, to key learned concurrency limits by."""
+    if backend == 'ollama':
+        from .models import ollama_client
+        return ','.join(ollama_client.endpoints())
+    if backend == 'openai':
+        return os.environ.get('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+    return backend
+
+def load_run_config(run_dir: str) -> Dict[str, Any]:
+    """``evaluate`` keyword arguments recorded in ``run_dir/run_config.json``."""
+    with open(os.path.join(run_dir, 'run_config.json'), 'r', encoding='utf-8') as f:
+        cfg = json.load(f)
+    return {k: cfg[k] for k in RUN_CONFIG_KEYS if k in cfg}
+
+def _spent(rec: Dict[str, Any], unit: str) -> float:
+    """What one finished record cost, in budget ``unit``."""
+    if unit == 'samples':
+        return rec.get('samples_used', 1)
+    if unit == 'tokens':
+        return (rec.get('usage') or {}).get('output_tokens', 0)
+    return rec.get('duration_sec', 0.0)
+
+def _budget_summary(results: List[Dict[str, Any]], info: Dict[str, Any], budget: float, prior_used: float = 0.0) -> Dict[str, Any]:
+    """Accuracy against spend for a ``budgeted`` run.
+
+    ``curve`` has the accuracy after each allocation round of this session
+    and ``stop_reasons`` counts why tasks stopped receiving samples.
+    """
+    unit = info['unit']
+    used = prior_used + info['spent'][unit]
+    accuracy = sum(1 for r in results if r['ok']) / max(len(results), 1)
+    reasons: Dict[str, int] = {}
+    for r in results:
+        reasons[r.get('stop_reason') or 'unknown'] = reasons.get(r.get('stop_reason') or 'unknown', 0) + 1
+    return {
+        'unit': unit,
+        'budget': budget,
+        'used': used,
+        'used_fraction': used / budget if budget else None,
+        'accuracy_per_1k': accuracy / used * 1000 if used else None,
+        'rounds': info['rounds'],
+        'stop_reasons': reasons,
+        'curve': info['curve'],
+    }
+
+def _cascade_summary(results: List[Dict[str, Any]], models: List[str], threshold: float) -> Dict[str, Any]:
+    """Per-tier reach, cost and latency of a ``cascade`` run, plus its escalation rate."""
+    tiers = [{'model': m, 'tasks': 0, 'stopped': 0, 'stopped_ok': 0, 'samples': 0, 'cost_usd': 0.0,
+              'generation_sec': 0.0, 'duration_sec': 0.0} for m in models]
+    for r in results:
+        used = r.get('tiers') or []
+        for i, t in enumerate(used[:len(tiers)]):
+            agg = tiers[i]
+            agg['tasks'] += 1
+            agg['samples'] += t['samples']
+            agg['cost_usd'] += t['cost_usd']
+            agg['generation_sec'] += t['generation_sec']
+            agg['duration_sec'] += t['duration_sec']
+        if used and len(used) <= len(tiers):
+            agg = tiers[len(used) - 1]
+            agg['stopped'] += 1
+            agg['stopped_ok'] += 1 if r['ok'] else 0
+    for agg in tiers:
+        agg['accuracy_when_stopped'] = agg['stopped_ok'] / agg['stopped'] if agg['stopped'] else None
+        agg['avg_duration_sec'] = agg['duration_sec'] / agg['tasks'] if agg['tasks'] else None
+    escalated = sum(1 for r in results if len(r.get('tiers') or []) > 1)
+    return {
+        'threshold': threshold,
+        'escalation_rate': escalated / max(len(results), 1),
+        'tiers': tiers,
+    }
+
+def summarize(results: List[Dict[str, Any]], config: Dict[str, Any], duration_sec: float, io_sec: float = 0.0) -> Dict[str, Any]:
+    """Build ``summary.json`` from the ordered per-task records of a run."""
+    total_cost = sum(r.get('cost_usd', 0.0) for r in results)
+    total_samples = sum(r.get('samples_used', 1) for r in results)
+    for r in results:
+        r.setdefault('usage', _usage([]))
+    return {
+        'task_path': config.get('task_path'),
+        'num_tasks': len(results),
+        'accuracy': sum(1 for r in results if r['ok']) / max(len(results), 1),
+        'strategy': config.get('strategy'),
+        'n': config.get('n'),
+        'total_samples': total_samples,
+        'avg_samples': total_samples / max(len(results), 1),
+        'temperature': config.get('temperature'),
+        'model_backend': config.get('model_backend'),
+        'model_name': config.get('model_name'),
+        'duration_sec': duration_sec,
+        'total_cost_usd': total_cost,
+        'concurrency': config.get('concurrency', 1),
+        'task_concurrency': config.get('task_concurrency', 1),
+        'performance': _performance_summary(results, duration_sec, io_sec),
+        'streaming': _streaming_summary(results, bool(config.get('stream'))),
+        'shard': config.get('shard'),
+        'meta_notes': config.get('meta_notes', ''),
+    }
+
+def evaluate(task_path: str, model_backend: str, model_name: str, strategy: str, temperature: float, n: int=1, run_root: str='runs', meta_notes: str='', concurrency: int=1, task_concurrency: int=1, cache_mode: str='off', cache_path: str=DEFAULT_CACHE_PATH, cache_max_mb: float=1024, cache_max_age_days: float=30, wave_size: int=0, consensus: int=3, task_token_budget: Optional[int]=None, task_time_budget: Optional[float]=None, stream: bool=False, verify_memo: str='memory', verify_memo_path: str=DEFAULT_MEMO_PATH, resume_dir: Optional[str]=None, shard: Optional[str]=None, budget: Optional[float]=None, budget_unit: str='samples', escalate_to: Optional[str]=None, escalate_below: float=1.0, escalate_n: int=1, task_deadline: Optional[float]=None, adaptive_concurrency: bool=False, concurrency_state_path: str=DEFAULT_CONCURRENCY_STATE, progress_every: float=5.0, metrics_port: Optional[int]=None) -> Dict[str, Any]:
+    """Run every task in ``task_path`` and write the run artifacts.
+
+    ``task_concurrency`` tasks are kept in flight at once. Records reach
+    ``details.jsonl`` through a reorder buffer, so the file is in task order
+    regardless of completion order. Task and candidate calls all share one
+    ``InFlightLimiter`` of size ``concurrency``. ``cache_mode`` controls the
+    on-disk ``GenerationCache`` underneath every model call. ``wave_size``,
+    ``consensus`` and the ``task_*_budget`` options only apply to
+    ``adaptive_best_of_n``, for which ``n`` is the per-task maximum. A ``sweep``
+    draws ``n`` candidates once and also writes one best-of-k summary per
+    ``k <= n`` under ``k_XXX/``. With ``stream`` (Ollama only) each sample is
+    streamed and cancelled once the task type's completion detector fires.
+    ``budgeted`` spreads one ``budget`` (in ``budget_unit``) over all tasks with
+    ``run_budgeted``; ``n > 1`` caps samples per task. It needs the whole task
+    list up front, and a resumed run gets what the earlier sessions left. Each
+    of ``k`` shards gets ``budget / k``, so the shards together spend ``budget``.
+    ``cascade`` answers with the run's model (best-of-``n`` if ``n > 1``) and
+    escalates to ``escalate_to`` (``backend/model``, best-of-``escalate_n``)
+    for tasks whose verifier score is below ``escalate_below``.
+    ``verify_memo`` (``memory``, ``disk`` or ``off``) reuses verification
+    results for duplicate candidates. ``task_deadline`` (Ollama only) bounds
+    every model call of a task to that many seconds from the task's start;
+    samples that miss it count as empty, failed candidates.
+
+    With ``adaptive_concurrency`` the limiter is an ``AdaptiveLimiter`` and
+    ``concurrency`` is its ceiling: it starts at the limit learned for this
+    endpoint and model in ``concurrency_state_path`` (1 the first time) and
+    the best limit it finds is saved there for the next run. The pools must
+    be able to fill it, so ``single`` runs need ``task_concurrency`` too.
+
+    While it runs, ``progress.json`` in the run directory is rewritten every
+    ``progress_every`` seconds (only at the start and end if 0) with tasks
+    done, accuracy, requests in flight, samples and tokens/sec, verifier time
+    and ETA; with ``metrics_port`` the same numbers are served for Prometheus
+    on ``http://127.0.0.1:<port>/metrics`` (see ``RunTelemetry``).
+
+    With ``resume_dir`` the run continues in that directory: tasks already in
+    its ``details.jsonl`` are skipped and the summary covers old and new
+    records. Pass the settings from ``load_run_config`` so they match.
+
+    Tasks are streamed from the file, never held as a whole. ``shard`` (``i/k``)
+    keeps only the tasks whose id hashes to shard ``i``; ``merge_runs``
+    combines the shard run directories afterwards.
+    """
+    config = {
+        'task_path': task_path,
+        'model_backend': model_backend,
+        'model_name': model_name,
+        'strategy': strategy,
+        'n': n,
+        'temperature': temperature,
+        'concurrency': concurrency,
+        'task_concurrency': task_concurrency,
+        'cache_mode': cache_mode,
+        'stream': stream,
+        'verify_memo': verify_memo,
+        'wave_size': wave_size,
+        'consensus': consensus,
+        'task_token_budget': task_token_budget,
+        'task_time_budget': task_time_budget,
+        'shard': shard,
+        'budget': budget,
+        'budget_unit': budget_unit,
+        'escalate_to': escalate_to,
+        'escalate_below': escalate_below,
+        'escalate_n': escalate_n,
+        'task_deadline': task_deadline,
+        'adaptive_concurrency': adaptive_concurrency,
+        'meta_notes': meta_notes,
+    }
+    shard_ik = parse_shard(shard)
+    model_generate = load_backend(model_backend)
+    if strategy not in ('single', 'best_of_n', 'adaptive_best_of_n', 'sweep', 'budgeted', 'cascade'):
+        raise ValueError('Unknown strategy: ' + strategy)
+    if stream and model_backend != 'ollama':
+        raise ValueError('Streaming is only supported for the ollama backend')
+    if strategy == 'budgeted' and not budget:
+        raise ValueError('The budgeted strategy needs a budget')
+    if strategy == 'cascade' and not escalate_to:
+        raise ValueError('The cascade strategy needs a model to escalate to')
+    if task_deadline and (model_backend != 'ollama' or strategy == 'budgeted'):
+        raise ValueError('Task deadlines are only supported for the ollama backend, and not for budgeted runs')
+    if adaptive_concurrency and (concurrency <= 1 or model_backend == 'replay'):
+        raise ValueError('Adaptive concurrency needs a model server and a concurrency ceiling above 1')
+    if resume_dir:
+        run_dir = resume_dir
+    else:
+        run_dir = new_run_dir(run_root)
+    details_path = os.path.join(run_dir, 'details.jsonl')
+    prior = read_jsonl(details_path, repair=True) if resume_dir else []
+    done_ids = {r['task_id'] for r in prior}
+    save_json(os.path.join(run_dir, 'run_config.json'), config)
+
+    def pending() -> Iterator[Tuple[int, Dict[str, Any]]]:
+        for idx, t in enumerate(load_tasks(task_path), 1):
+            tid = task_id(t, idx)
+            if tid in done_ids or (shard_ik and shard_of(tid, shard_ik[1]) != shard_ik[0]):
+                continue
+            yield idx, t
+
     start = time.time()
-    if model_backend == 'ollama':
-        from .models.ollama_client import generate as model_generate
-    elif model_backend == 'openai':
-        from .models.openai_client import generate as model_generate
+    if adaptive_concurrency:
+        state_key = f'{_endpoint(model_backend)}|{model_name}'
+        limiter = AdaptiveLimiter(load_limit(concurrency_state_path, state_key) or 1, max_limit=concurrency)
     else:
-        raise ValueError('Unknown model backend: ' + model_backend)
-    total_cost = 0.0
-    for idx, t in enumerate(tasks, 1):
-        if strategy == 'single':
-            out = run_single(model_generate, model_name, t, temperature)
-        elif strategy == 'best_of_n':
-            out = run_best_of_n(model_generate, model_name, t, temperature, n)
-        else:
-            raise ValueError('Unknown strategy: ' + strategy)
-        total_cost += out.get('cost_usd', 0.0)
+        limiter = InFlightLimiter(concurrency)
+    cache = GenerationCache(cache_path, cache_mode, backend=model_backend,
+                            max_bytes=int(cache_max_mb * (1 << 20)), max_age_sec=cache_max_age_days * 86400)
+    memo = VerificationMemo(verify_memo, verify_memo_path)
+    backends = [model_backend]
+    if strategy == 'cascade':
+        esc_backend, esc_name = escalate_to.split('/', 1)
+        esc_generate = load_backend(esc_backend)
+        esc_cache = cache if esc_backend == model_backend else GenerationCache(
+            cache_path, cache_mode, backend=esc_backend,
+            max_bytes=int(cache_max_mb * (1 << 20)), max_age_sec=cache_max_age_days * 86400)
+        backends.append(esc_backend)
+    details = JsonlWriter(details_path)
+    writer = ReorderBuffer(details, start=0)
+    telemetry = RunTelemetry(run_dir, {'run': os.path.basename(run_dir), 'model': f'{model_backend}/{model_name}', 'strategy': strategy},
+                             limiter, progress_every, metrics_port)
+    telemetry.add_prior(prior)
+
+    def generator_for(t: Dict[str, Any], generate=model_generate, backend: str = model_backend):
+        kwargs: Dict[str, Any] = {}
+        if backend == 'ollama' and stream:
+            kwargs.update(stream=True, stop_when=completion_detector(t))
+        if backend == 'ollama' and task_deadline:
+            kwargs['deadline'] = time.monotonic() + task_deadline
+        if backend == 'ollama':
+            kwargs['limiter'] = limiter  # hedges take their slots from it too
+        return telemetry.wrap(functools.partial(generate, **kwargs) if kwargs else generate)
+
+    def finish(pos: int, rec: Dict[str, Any]) -> None:
+        telemetry.task_done(rec)
+        writer.put(pos, rec)
+
+    def record(idx: int, t: Dict[str, Any], out: Dict[str, Any], duration_sec: float) -> Dict[str, Any]:
         rec = {
-            'task_id': t.get('id', f'item_{idx}'),
+            'task_id': task_id(t, idx),
             'type': t.get('type'),
             'ok': out['ok'],
             'score': out['score'],
@@ -126,33 +910,117 @@ def evaluate(task_path: str, model_backend: str, model_name: str, strategy: str,
             'text': out.get('text', ''),
             'strategy': strategy,
             'n': n,
+            'samples_used': out.get('samples_used', 1),
+            'stop_reason': out.get('stop_reason'),
+            'dedup_ratio': out.get('dedup_ratio', 0.0),
+            'verify_memo_hits': out.get('verify_memo_hits', 0),
             'cost_usd': out.get('cost_usd', 0.0),
+            'duration_sec': duration_sec,
+            'usage': _usage(out.get('calls', [])),
+            'samples': _samples(out.get('calls', [])),
+            'candidates_z': _stored_candidates(out.get('outputs', []), model_name),
         }
-        results.append(rec)
-        append_jsonl(details_path, rec)
+        if strategy == 'sweep':
+            rec['best_of_k'] = out['best_of_k']
+            rec['candidates'] = out['candidates']
+        if strategy == 'cascade':
+            rec['tiers'] = out['tiers']
+        return rec
+
+    def run_task(pos: int, idx: int, t: Dict[str, Any]) -> None:
+        t0 = time.time()
+        gen = generator_for(t)
+        if strategy == 'single':
+            out = run_single(gen, model_name, t, temperature, limiter, cache, memo)
+        elif strategy == 'best_of_n':
+            out = run_best_of_n(gen, model_name, t, temperature, n, concurrency, limiter, cache, memo)
+        elif strategy == 'sweep':
+            out = run_sweep(gen, model_name, t, temperature, n, concurrency, limiter, cache, memo)
+        elif strategy == 'cascade':
+            tiers = [
+                {'generate': gen, 'model': f'{model_backend}/{model_name}', 'model_name': model_name, 'n': n, 'cache': cache},
+                {'generate': generator_for(t, esc_generate, esc_backend), 'model': escalate_to, 'model_name': esc_name,
+                 'n': escalate_n, 'cache': esc_cache},
+            ]
+            out = run_cascade(tiers, t, temperature, escalate_below, concurrency, limiter, memo)
+        else:
+            out = run_adaptive_best_of_n(gen, model_name, t, temperature, n, wave_size, consensus,
+                                         task_token_budget, task_time_budget, concurrency, limiter, cache, memo)
+        finish(pos, record(idx, t, out, time.time() - t0))
+
+    budget_info = None
+    prior_used = 0.0
+    run_budget = budget / shard_ik[1] if budget and shard_ik else budget  # this shard's share
+    failed = True
+    try:
+        # Inside the try, so a bad task line or a taken metrics port still
+        # closes the writer, caches and memo below.
+        telemetry.tasks_total = len(prior) + sum(1 for _ in pending())
+        telemetry.start()
+        if strategy == 'budgeted':
+            todo = list(pending())
+            prior_used = sum(_spent(r, budget_unit) for r in prior)
+            outs, budget_info = run_budgeted(generator_for, model_name, [t for _, t in todo], temperature, run_budget - prior_used, budget_unit,
+                                             n, wave_size, consensus, concurrency, task_concurrency, limiter, cache, memo)
+            for pos, ((idx, t), out) in enumerate(zip(todo, outs)):
+                finish(pos, record(idx, t, out, out['duration_sec']))
+        elif task_concurrency <= 1:
+            for pos, (idx, t) in enumerate(pending()):
+                run_task(pos, idx, t)
+        else:
+            # Submit lazily, keeping a bounded window of tasks queued or running.
+            with ThreadPoolExecutor(max_workers=task_concurrency) as pool:
+                inflight = set()
+                for pos, (idx, t) in enumerate(pending()):
+                    if len(inflight) >= 2 * task_concurrency:
+                        finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                        for fut in finished:
+                            fut.result()
+                    inflight.add(pool.submit(run_task, pos, idx, t))
+                for fut in as_completed(inflight):
+                    fut.result()
+        failed = False
+    finally:
+        telemetry.stop('failed' if failed else 'done')
+        details.close()
+        cache.close()
+        if strategy == 'cascade' and esc_cache is not cache:
+            esc_cache.close()
+        memo.close()
+    results = prior + writer.records
     end = time.time()
-    acc = sum(1 for r in results if r['ok']) / max(len(results), 1)
-    summary = {
-        'task_path': task_path,
-        'num_tasks': len(results),
-        'accuracy': acc,
-        'strategy': strategy,
-        'n': n,
-        'temperature': temperature,
-        'model_backend': model_backend,
-        'model_name': model_name,
-        'duration_sec': end - start,
-        'total_cost_usd': total_cost,
-        'meta_notes': meta_notes,
-    }
-    save_json(os.path.join(run_dir, 'summary.json'), summary)
-    save_json(os.path.join(run_dir, 'run_config.json'), {
-        'task_path': task_path,
-        'model_backend': model_backend,
-        'model_name': model_name,
-        'strategy': strategy,
-        'n': n,
-        'temperature': temperature,
-        'meta_notes': meta_notes,
+    # Earlier sessions are estimated from their tasks' own durations.
+    prior_sec = sum(r.get('duration_sec', 0.0) for r in prior)
+    summary = summarize(results, config, end - start + prior_sec, details.io_sec)
+    summary.update({
+        'peak_in_flight': limiter.peak,
+        'cache': cache.stats(),
+        'sandbox': sandbox.stats(),
+        'verify_memo': memo.stats(),
     })
+    if adaptive_concurrency:
+        summary['concurrency'] = limiter.stats()
+        if limiter.windows:
+            save_limit(concurrency_state_path, state_key, limiter.best,
+                       tokens_per_sec=limiter.tokens_per_sec.get(limiter.best), run_dir=run_dir)
+    if budget_info is not None:
+        summary['budget'] = _budget_summary(results, budget_info, run_budget, prior_used)
+    if strategy == 'cascade':
+        summary['cascade'] = _cascade_summary(results, [f'{model_backend}/{model_name}', escalate_to], escalate_below)
+        if esc_cache is not cache:
+            summary['cascade']['cache'] = esc_cache.stats()
+    if 'ollama' in backends:
+        from .models import ollama_client
+        summary['ollama'] = ollama_client.stats()
+    if 'openai' in backends:
+        from .models import openai_client
+        summary['openai'] = openai_client.stats()
+    if 'replay' in backends:
+        from .models import replay_client
+        summary['replay'] = replay_client.stats()
+    if resume_dir:
+        summary['resumed'] = {'prior_tasks': len(prior), 'prior_duration_est_sec': prior_sec}
+    save_json(os.path.join(run_dir, 'summary.json'), summary)
+    if strategy == 'sweep':
+        _write_sweep_summaries(run_dir, summary, results)
     return {'run_dir': run_dir, 'summary': summary}
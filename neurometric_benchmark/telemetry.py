@@ -0,0 +1,200 @@
+import os, json, time, functools, threading, collections
+from typing import Dict, Any, List, Optional, Tuple
+
+PROGRESS_FILE = 'progress.json'
+RECENT_SEC = 60.0  # window for the recent samples/sec and tokens/sec
+
+# name, type, help; values come from ``RunTelemetry.snapshot``.
+_METRICS: List[Tuple[str, str, str, str]] = [
+    ('tasks_total', 'gauge', 'tasks', 'Tasks in this run, finished ones included'),
+    ('tasks_done', 'counter', 'tasks_done_total', 'Tasks finished'),
+    ('tasks_ok', 'counter', 'tasks_ok_total', 'Tasks finished with a correct answer'),
+    ('accuracy', 'gauge', 'accuracy', 'Share of finished tasks answered correctly'),
+    ('samples', 'counter', 'samples_total', 'Samples drawn, cached ones included'),
+    ('model_calls', 'counter', 'model_calls_total', 'Calls that reached a model backend'),
+    ('output_tokens', 'counter', 'output_tokens_total', 'Completion tokens generated by model calls'),
+    ('in_flight', 'gauge', 'in_flight_requests', 'Model requests in flight'),
+    ('concurrency_limit', 'gauge', 'concurrency_limit', 'Current limit on requests in flight'),
+    ('samples_per_sec', 'gauge', 'samples_per_second', 'Samples per second over the last minute'),
+    ('tokens_per_sec', 'gauge', 'tokens_per_second', 'Completion tokens per second over the last minute'),
+    ('verify_sec', 'counter', 'verify_seconds_total', 'Time spent in verifiers, summed over candidates'),
+    ('cost_usd', 'counter', 'cost_usd_total', 'Estimated spend'),
+    ('elapsed_sec', 'gauge', 'elapsed_seconds', 'Seconds since this session started'),
+    ('idle_sec', 'gauge', 'idle_seconds', 'Seconds since the last model call or task finished'),
+    ('eta_sec', 'gauge', 'eta_seconds', 'Estimated seconds until the run finishes'),
+]
+
+
+class RunTelemetry:
+    """Live counters of one ``evaluate`` run, for operators watching it.
+
+    ``evaluate`` reports each finished task (``task_done``) and wraps the
+    backends with ``wrap`` so every model call is counted as it returns.
+    ``start`` rewrites ``progress.json`` in the run directory every
+    ``every`` seconds and, with ``port``, serves the same numbers on
+    ``http://127.0.0.1:<port>/metrics`` in Prometheus text format (and as
+    JSON on ``/progress.json``). Rates and ETA only count this session, so a
+    resumed run is not credited with the earlier sessions' work.
+    """
+
+    def __init__(self, run_dir: str, labels: Dict[str, str], limiter=None, every: float = 5.0, port: Optional[int] = None):
+        self.run_dir = run_dir
+        self.labels = labels
+        self.limiter = limiter
+        self.every = every
+        self.port = port
+        self.status = 'running'
+        self.tasks_total: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server = None
+        self._t0 = self._last = time.time()
+        self._recent: 'collections.deque[Tuple[float, int, int]]' = collections.deque()  # (time, samples, tokens)
+        self._c = {'tasks_done': 0, 'tasks_ok': 0, 'session_tasks': 0, 'samples': 0, 'model_calls': 0,
+                   'output_tokens': 0, 'verify_sec': 0.0, 'cost_usd': 0.0}
+
+    def add_prior(self, records: List[Dict[str, Any]]) -> None:
+        """Count the records of earlier sessions of a resumed run."""
+        with self._lock:
+            for rec in records:
+                self._count(rec)
+
+    def _count(self, rec: Dict[str, Any]) -> None:
+        self._c['tasks_done'] += 1
+        self._c['tasks_ok'] += int(bool(rec.get('ok')))
+        self._c['samples'] += rec.get('samples_used', 1)
+        self._c['verify_sec'] += (rec.get('usage') or {}).get('verification_sec', 0.0)
+        self._c['cost_usd'] += rec.get('cost_usd', 0.0)
+
+    def task_done(self, rec: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._count(rec)
+            self._c['session_tasks'] += 1
+            self._recent.append((now, rec.get('samples_used', 1), 0))
+            self._last = now
+
+    def _call_done(self, out: Any) -> None:
+        tokens = int(out.get('output_tokens') or 0) if isinstance(out, dict) else 0
+        now = time.time()
+        with self._lock:
+            self._c['model_calls'] += 1
+            self._c['output_tokens'] += tokens
+            self._recent.append((now, 0, tokens))
+            self._last = now
+
+    def wrap(self, generate):
+        """``generate`` counting each call that returns (attributes such as ``takes_sample_idx`` kept)."""
+        @functools.wraps(generate)
+        def counted(*args, **kwargs):
+            out = generate(*args, **kwargs)
+            self._call_done(out)
+            return out
+        return counted
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            while self._recent and now - self._recent[0][0] > RECENT_SEC:
+                self._recent.popleft()
+            window = min(RECENT_SEC, now - self._t0) or 1e-9
+            c = dict(self._c)
+            recent_samples = sum(s for _, s, _ in self._recent)
+            recent_tokens = sum(t for _, _, t in self._recent)
+            last = self._last
+        elapsed = now - self._t0
+        session = c.pop('session_tasks')
+        eta = None
+        if self.tasks_total is not None and session:
+            eta = max(0, self.tasks_total - c['tasks_done']) * elapsed / session
+        return dict(
+            c,
+            run_dir=self.run_dir,
+            status=self.status,
+            updated=time.strftime('%Y-%m-%dT%H:%M:%S'),
+            tasks_total=self.tasks_total,
+            accuracy=c['tasks_ok'] / c['tasks_done'] if c['tasks_done'] else None,
+            in_flight=getattr(self.limiter, 'in_flight', None),
+            concurrency_limit=getattr(self.limiter, 'limit', None),
+            samples_per_sec=recent_samples / window,
+            tokens_per_sec=recent_tokens / window,
+            elapsed_sec=elapsed,
+            idle_sec=now - last,
+            eta_sec=eta,
+        )
+
+    def prometheus(self) -> str:
+        snap = self.snapshot()
+        labels = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in self.labels.items())
+        lines = []
+        for key, kind, name, help_text in _METRICS:
+            if snap.get(key) is None:
+                continue
+            lines += [f'# HELP ttc_{name} {help_text}', f'# TYPE ttc_{name} {kind}', f'ttc_{name}{{{labels}}} {float(snap[key]):.6g}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self) -> None:
+        """Rewrite ``progress.json`` atomically, so readers never see half a file."""
+        path = os.path.join(self.run_dir, PROGRESS_FILE)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.every):
+            self.write()
+
+    def start(self) -> 'RunTelemetry':
+        if self.port is not None:
+            # Imported here so that runs without --metrics-port never load http.server.
+            from http.server import ThreadingHTTPServer
+            server = ThreadingHTTPServer(('127.0.0.1', self.port), _handler(self))
+            server.daemon_threads = True
+            self.port = server.server_address[1]
+            threading.Thread(target=server.serve_forever, name='ttc-metrics', daemon=True).start()
+            self._server = server
+        self.write()
+        if self.every > 0:
+            self._thread = threading.Thread(target=self._loop, name='ttc-progress', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, status: str = 'done') -> None:
+        """Write the final ``progress.json`` and stop serving.
+
+        Safe after a ``start`` that failed part way (e.g. the port was
+        taken): only what was started is stopped.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.status = status
+        self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _handler(telemetry: RunTelemetry):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, ctype = telemetry.prometheus().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/' + PROGRESS_FILE:
+                body, ctype = json.dumps(telemetry.snapshot()).encode('utf-8'), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', ctype)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    return MetricsHandler
@@ -0,0 +1,253 @@
+import os, json, time, threading
+from typing import Dict, Any, List, Optional
+
+DEFAULT_CONCURRENCY_STATE = os.path.join('.ttc_cache', 'concurrency.json')
+
+
+class InFlightLimiter:
+    """Bounds the number of model calls in flight and records the peak reached.
+
+    Used as a context manager around each generation so that every caller
+    sharing one limiter also shares one global request limit.
+    """
+
+    def __init__(self, limit: int = 1):
+        self.limit = max(1, int(limit))
+        self._sem = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def __enter__(self):
+        self._sem.acquire()
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            self.in_flight -= 1
+        self._sem.release()
+        return False
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free now (for extra requests such as hedges); ``release`` gives it back."""
+        if not self._sem.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        return True
+
+    def release(self) -> None:
+        self.__exit__(None, None, None)
+
+    def observe(self, latency_sec: float, output_tokens: int = 0, errors: int = 0) -> None:
+        """Report a finished call; a fixed limit ignores it."""
+
+
+class AdaptiveLimiter(InFlightLimiter):
+    """In-flight limit tuned during the run from completion tokens/sec and latency.
+
+    Calls report back through ``observe``. After every window of completions
+    (at least ``min_window``, and twice the limit) the limiter decides:
+
+    * errors (exceptions or backend retries) cut the limit by ``backoff``;
+    * so does seconds-per-output-token above ``latency_tolerance`` times the
+      best seen, i.e. a latency spike;
+    * otherwise, if the limit was actually reached, it goes up by one while
+      tokens/sec beats the best lower limit by ``min_gain``. An increase that
+      did not pay off is undone, and that limit is only probed again after
+      ``probe_every`` windows.
+
+    ``best`` is the smallest limit within ``min_gain`` of the highest
+    throughput seen, which is what is worth remembering for the next run.
+    """
+
+    def __init__(self, start: int = 1, min_limit: int = 1, max_limit: int = 16, min_window: int = 8,
+                 min_gain: float = 0.05, latency_tolerance: float = 2.0, backoff: float = 0.5, probe_every: int = 10):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = min(self.max_limit, max(self.min_limit, int(start)))
+        self.start = self.limit
+        self.min_window = min_window
+        self.min_gain = min_gain
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.probe_every = probe_every
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.peak = 0
+        self.windows = 0
+        self.decisions = {'increase': 0, 'no_gain': 0, 'latency': 0, 'error': 0}
+        self.tokens_per_sec: Dict[int, float] = {}
+        self.trajectory: List[List[float]] = []
+        self._t0 = time.monotonic()
+        self._best_spt: Optional[float] = None
+        self._ceiling: Optional[int] = None
+        self._ceiling_until = 0
+        self._reset(self._t0)
+
+    def _reset(self, now: float) -> None:
+        self._window_start = now
+        self._window_peak = self.in_flight
+        self._n = self._tokens = self._errors = 0
+        self._latency = 0.0
+
+    def __enter__(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self._window_peak = max(self._window_peak, self.in_flight)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._cond:
+            self.in_flight -= 1
+            if exc_type is not None:
+                self._errors += 1
+                self._n += 1
+                self._maybe_decide()
+            self._cond.notify_all()
+        return False
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self._window_peak = max(self._window_peak, self.in_flight)
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def observe(self, latency_sec: float, output_tokens: int = 0, errors: int = 0) -> None:
+        with self._cond:
+            self._n += 1
+            self._tokens += output_tokens
+            self._latency += latency_sec
+            self._errors += errors
+            self._maybe_decide()
+            self._cond.notify_all()
+
+    def _maybe_decide(self) -> None:
+        if self._n < max(self.min_window, 2 * self.limit):
+            return
+        now = time.monotonic()
+        old = self.limit
+        self.windows += 1
+        if self._errors:
+            self.limit = max(self.min_limit, int(old * self.backoff))
+            self.decisions['error'] += 1
+        elif self._tokens:
+            tps = self._tokens / max(now - self._window_start, 1e-9)
+            spt = self._latency / self._tokens
+            prev = self.tokens_per_sec.get(old)
+            self.tokens_per_sec[old] = tps if prev is None else 0.5 * (prev + tps)
+            lower = max((k for k in self.tokens_per_sec if k < old), default=None)
+            gained = lower is None or self.tokens_per_sec[old] >= self.tokens_per_sec[lower] * (1 + self.min_gain)
+            if self._best_spt is not None and spt > self.latency_tolerance * self._best_spt:
+                self.limit = max(self.min_limit, int(old * self.backoff))
+                self.decisions['latency'] += 1
+            elif not gained:
+                self.limit = max(self.min_limit, old - 1)
+                self._ceiling, self._ceiling_until = old, self.windows + self.probe_every
+                self.decisions['no_gain'] += 1
+            elif self._window_peak >= old and old < self.max_limit and (
+                    self._ceiling is None or old + 1 < self._ceiling or self.windows >= self._ceiling_until):
+                self.limit = old + 1
+                self.decisions['increase'] += 1
+            self._best_spt = spt if self._best_spt is None else min(self._best_spt, spt)
+        if self.limit != old:
+            self.trajectory.append([round(now - self._t0, 3), self.limit])
+        self._reset(now)
+
+    @property
+    def best(self) -> int:
+        if not self.tokens_per_sec:
+            return self.limit
+        top = max(self.tokens_per_sec.values())
+        return min(k for k, v in self.tokens_per_sec.items() if v * (1 + self.min_gain) >= top)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            step = max(1, -(-len(self.trajectory) // 100))
+            return {
+                'start': self.start,
+                'final': self.limit,
+                'best': self.best,
+                'min': self.min_limit,
+                'max': self.max_limit,
+                'windows': self.windows,
+                'decisions': dict(self.decisions),
+                'tokens_per_sec_by_limit': {str(k): v for k, v in sorted(self.tokens_per_sec.items())},
+                'trajectory': self.trajectory[::step],
+            }
+
+
+def load_limit(path: str, key: str) -> Optional[int]:
+    """The concurrency limit learned for ``key`` in an earlier run, if any."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return int(json.load(f)[key]['limit'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_limit(path: str, key: str, limit: int, **info: Any) -> None:
+    """Remember ``limit`` for ``key`` (written atomically; other keys are kept)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    state[key] = dict(info, limit=int(limit), updated=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class TokenBucket:
+    """Budget of ``per_minute`` units (requests or tokens) that refills continuously.
+
+    ``reserve`` debits immediately and returns how long the caller must wait
+    before using what it reserved, so concurrent callers queue up in order
+    instead of polling. The balance may go negative when a reservation is
+    larger than what is left, or when ``adjust`` corrects an estimate. Without
+    a ``burst`` allowance use is paced evenly, as providers also enforce their
+    per-minute limits over much shorter windows.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else 1.0)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def adjust(self, amount: float) -> None:
+        """Debit (or with a negative ``amount``, credit) without waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
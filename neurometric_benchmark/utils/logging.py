@@ -1,14 +1,24 @@
-import os, json, datetime
-from typing import Dict, Any
+import os, json, time, datetime, threading, zlib, base64
+from typing import Dict, Any, List, Iterator, Tuple
 
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
-def new_run_dir(root: str = 'runs') -> str:
-    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    d = os.path.join(root, f'run_{ts}')
-    ensure_dir(d)
-    return d
+def new_run_dir(root: str = 'runs', prefix: str = 'run') -> str:
+    """Create a fresh ``<prefix>_<date>_<time>_<microseconds>_<pid>`` directory.
+
+    The microsecond timestamp and pid keep parallel launches apart; creation
+    is exclusive, so even a clash within the same process retries.
+    """
+    ensure_dir(root)
+    while True:
+        ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        d = os.path.join(root, f'{prefix}_{ts}_{os.getpid()}')
+        try:
+            os.mkdir(d)
+            return d
+        except FileExistsError:
+            time.sleep(1e-6)
 
 def save_json(path: str, data: Dict[str, Any]):
     with open(path, 'w', encoding='utf-8') as f:
@@ -17,3 +27,138 @@ def save_json(path: str, data: Dict[str, Any]):
 def append_jsonl(path: str, record: Dict[str, Any]):
     with open(path, 'a', encoding='utf-8') as f:
         f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def pack_json(obj: Any) -> str:
+    """``obj`` as zlib-compressed, base64-encoded JSON, to embed in a JSONL record."""
+    raw = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.b64encode(zlib.compress(raw, 6)).decode('ascii')
+
+def unpack_json(blob: str) -> Any:
+    return json.loads(zlib.decompress(base64.b64decode(blob)).decode('utf-8'))
+
+def _scan_jsonl(path: str) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Yield ``(record, end offset)`` up to the first torn or invalid line."""
+    if not os.path.exists(path):
+        return
+    good = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                return
+            good += len(raw)
+            if raw.strip():
+                try:
+                    rec = json.loads(raw)
+                except ValueError:
+                    return
+                yield rec, good
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream the complete records of a JSONL file without holding them all."""
+    for rec, _ in _scan_jsonl(path):
+        yield rec
+
+def read_jsonl(path: str, repair: bool = False) -> List[Dict[str, Any]]:
+    """Read a JSONL file, tolerating a torn final line from an interrupted write.
+
+    With ``repair`` the file is truncated back to its last complete record so
+    that later appends start on a clean line.
+    """
+    records: List[Dict[str, Any]] = []
+    good = 0
+    for rec, good in _scan_jsonl(path):
+        records.append(rec)
+    if repair and os.path.exists(path) and good < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(good)
+    return records
+
+class JsonlWriter:
+    """Single long-lived, buffered JSONL appender.
+
+    Records are flushed (and fsync'd) at most every ``flush_every`` seconds,
+    by the writer itself or a background thread, and always on ``close``, so
+    an interrupted run loses at most the last interval of records.
+    """
+
+    def __init__(self, path: str, flush_every: float = 1.0, fsync: bool = True):
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.io_sec = 0.0
+        self._f = open(path, 'a', encoding='utf-8', buffering=1 << 16)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.time()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            t0 = time.time()
+            self._f.write(line)
+            self._dirty = True
+            if t0 - self._last_flush >= self.flush_every:
+                self._flush_locked()
+            self.io_sec += time.time() - t0
+
+    def _flush_locked(self):
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+        self._dirty = False
+        self._last_flush = time.time()
+
+    def flush(self):
+        with self._lock:
+            if not self._f.closed:
+                t0 = time.time()
+                self._flush_locked()
+                self.io_sec += time.time() - t0
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_every):
+            with self._lock:
+                if self._dirty and not self._f.closed:
+                    t0 = time.time()
+                    self._flush_locked()
+                    self.io_sec += time.time() - t0
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            if not self._f.closed:
+                self._flush_locked()
+                self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class ReorderBuffer:
+    """Hands records to a ``JsonlWriter`` in index order, whatever order they finish in.
+
+    Records that arrive early are held until every lower index has been
+    written, so the file is always a contiguous, deterministic prefix.
+    """
+
+    def __init__(self, writer: JsonlWriter, start: int = 0):
+        self.writer = writer
+        self.records: List[Dict[str, Any]] = []
+        self._next = start
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, idx: int, record: Dict[str, Any]):
+        with self._lock:
+            self._pending[idx] = record
+            while self._next in self._pending:
+                rec = self._pending.pop(self._next)
+                self.writer.write(rec)
+                self.records.append(rec)
+                self._next += 1
@@ -0,0 +1,79 @@
+import math
+from typing import List, Dict, Optional
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated ``q``-th percentile (0-100); None for no values."""
+    if not values:
+        return None
+    xs = sorted(values)
+    pos = (len(xs) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None,
+    }
+
+
+class StreamingQuantiles:
+    """Count, mean, max and approximate quantiles of a stream in bounded memory.
+
+    Non-negative values are counted in logarithmic buckets ``rel_err`` wide, so
+    quantiles are within that relative error and memory grows with the range
+    of magnitudes seen, not with the number of values.
+    """
+
+    def __init__(self, rel_err: float = 0.01):
+        self._gamma = math.log1p(2 * rel_err)
+        self._buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.max: Optional[float] = None
+
+    def add(self, v: Optional[float]) -> None:
+        if v is None:
+            return
+        v = max(0.0, float(v))
+        self.count += 1
+        self.total += v
+        self.max = v if self.max is None else max(self.max, v)
+        if v == 0.0:
+            self.zeros += 1
+        else:
+            b = math.floor(math.log(v) / self._gamma)
+            self._buckets[b] = self._buckets.get(b, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate ``q``-th percentile (0-100); None for no values."""
+        if not self.count:
+            return None
+        rank = q / 100.0 * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for b in sorted(self._buckets):
+            seen += self._buckets[b]
+            if rank < seen:
+                # Bucket midpoint, capped by the exact maximum.
+                return min(math.exp((b + 0.5) * self._gamma), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.quantile(50),
+            'p90': self.quantile(90),
+            'p99': self.quantile(99),
+            'max': self.max,
+        }
@@ -1,7 +1,9 @@
 import re
-from typing import Optional
+from typing import Optional, Callable, Dict, Any
 
 NUM_REGEX = re.compile(r"-?\d+(?:\.\d+)?")
+FINAL_ANSWER_LINE = re.compile(r"^\s*\**\s*final answer\s*\**\s*[:=]?\s*\**\s*\$?-?[\d,]*\.?\d+\s*\**\s*\.?\s*$", re.IGNORECASE)
+BARE_NUMBER_LINE = re.compile(r"^\s*\**\s*\$?-?[\d,]*\.?\d+\s*\**\s*\.?\s*$")
 
 def extract_first_number(text: str) -> Optional[float]:
     if text is None:
@@ -24,3 +26,51 @@ def strip_json_markers(s: str) -> str:
         if s.lower().startswith('json'):
             s = s[4:].strip()
     return s
+
+def numeric_answer_complete(text: str) -> bool:
+    """True once a finished line reads ``Final answer: N``, or the first one is just a number.
+
+    The numeric prompt ends in ``Final answer: ``, so a completion that opens
+    with a bare number is answering it (and the verifier reads the first
+    number anyway); a bare number further down may be an intermediate step.
+    """
+    lines = [line for line in text.split('\n')[:-1] if line.strip()]  # the last element is still being written
+    return bool(lines) and (bool(BARE_NUMBER_LINE.match(lines[0])) or any(FINAL_ANSWER_LINE.match(line) for line in lines))
+
+def json_object_complete(text: str) -> bool:
+    """True once the first top-level ``{...}`` object has been closed."""
+    depth = 0
+    in_str = False
+    escape = False
+    for ch in text:
+        if in_str:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = depth > 0
+        elif ch == '{':
+            depth += 1
+        elif ch == '}' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                return True
+    return False
+
+def code_block_complete(text: str) -> bool:
+    """True once a fenced ```` ``` ```` code block has been opened and closed."""
+    start = text.find('```')
+    return start != -1 and text.find('```', start + 3) != -1
+
+COMPLETION_DETECTORS: Dict[str, Callable[[str], bool]] = {
+    'numeric': numeric_answer_complete,
+    'json': json_object_complete,
+    'python': code_block_complete,
+}
+
+def completion_detector(task: Dict[str, Any]) -> Optional[Callable[[str], bool]]:
+    """Detector that fires once a completion for ``task`` holds a full answer."""
+    return COMPLETION_DETECTORS.get(task.get('type'))
@@ -0,0 +1,145 @@
+"""Memoised verification of candidates.
+
+Results are keyed on the task (id and gold data), a whitespace-normalised
+hash of the candidate text and a fingerprint of the verifier sources, so
+identical candidates are verified once per task and, with a ``disk`` memo,
+once across runs. Editing a verifier changes the fingerprint and so
+invalidates earlier results.
+"""
+import os, json, sqlite3, hashlib, threading
+from typing import Dict, Any, Tuple, Optional, Callable
+
+MEMO_MODES = ('disk', 'memory', 'off')
+DEFAULT_MEMO_PATH = os.path.join('.ttc_cache', 'verifications.sqlite')
+# Results that depend on machine load rather than on the candidate.
+_TRANSIENT_ERRORS = ('timeout', 'worker_crashed')
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_VERIFIER_SOURCES = (
+    os.path.join(_HERE, 'numeric.py'),
+    os.path.join(_HERE, 'json_schema.py'),
+    os.path.join(_HERE, 'python_code.py'),
+    os.path.join(os.path.dirname(_HERE), 'utils', 'text.py'),
+)
+
+
+def _fingerprint() -> str:
+    h = hashlib.sha256()
+    for path in _VERIFIER_SOURCES:
+        try:
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        except OSError:
+            h.update(path.encode('utf-8'))
+    return h.hexdigest()
+
+
+def normalize_candidate(task: Dict[str, Any], text: str) -> str:
+    """Candidate text with differences the verifiers ignore removed.
+
+    Trailing whitespace per line and surrounding blank lines are dropped for
+    typed tasks; exact-match tasks are only stripped, as their verifier does.
+    """
+    text = text or ''
+    if task.get('type') in ('numeric', 'json', 'python'):
+        return '\n'.join(line.rstrip() for line in text.strip().splitlines())
+    return text.strip()
+
+
+class VerificationMemo:
+    """Thread-safe memo of ``(ok, score, meta)`` verification results."""
+
+    def __init__(self, mode: str = 'memory', path: str = DEFAULT_MEMO_PATH):
+        if mode not in MEMO_MODES:
+            raise ValueError('Unknown verify memo mode: ' + mode)
+        self.mode = mode
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._fp = _fingerprint()
+        self._mem: Dict[str, Tuple[bool, float, dict]] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if mode == 'disk':
+            d = os.path.dirname(path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS verifications (key TEXT PRIMARY KEY, result TEXT NOT NULL)')
+            self._db.commit()
+
+    def key(self, task: Dict[str, Any], text: str) -> str:
+        h = hashlib.sha256()
+        h.update(self._fp.encode('utf-8'))
+        h.update(json.dumps(task, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        h.update(b'\0')
+        h.update(normalize_candidate(task, text).encode('utf-8'))
+        return h.hexdigest()
+
+    def lookup(self, task: Dict[str, Any], text: str, verify: Callable[[Dict[str, Any], str], Tuple[bool, float, dict]]) -> Tuple[Tuple[bool, float, dict], bool]:
+        """Return ``(result, hit)``, calling ``verify(task, text)`` on a miss.
+
+        Concurrent lookups of the same key wait for the first one instead of
+        verifying the same candidate again.
+        """
+        key = self.key(task, text)
+        while True:
+            with self._lock:
+                res = self._get(key)
+                if res is not None:
+                    self.hits += 1
+                    return (res[0], res[1], json.loads(json.dumps(res[2]))), True
+                pending = self._inflight.get(key)
+                if pending is None:
+                    self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    break
+            pending.wait()
+            with self._lock:
+                if key not in self._mem:
+                    # The first attempt was not memoisable; verify this one too.
+                    self.misses += 1
+                    break
+        try:
+            res = verify(task, text)
+            self._store(key, res)
+        finally:
+            with self._lock:
+                done = self._inflight.pop(key, None)
+            if done is not None:
+                done.set()
+        return res, False
+
+    def _get(self, key: str) -> Optional[Tuple[bool, float, dict]]:
+        res = self._mem.get(key)
+        if res is None and self._db is not None:
+            row = self._db.execute('SELECT result FROM verifications WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                ok, score, meta = json.loads(row[0])
+                res = (ok, score, meta)
+                self._mem[key] = res
+        return res
+
+    def _store(self, key: str, res: Tuple[bool, float, dict]) -> None:
+        if (res[2] or {}).get('error') in _TRANSIENT_ERRORS:
+            return
+        try:
+            blob = json.dumps(list(res), ensure_ascii=False)
+        except (TypeError, ValueError):
+            return  # meta that cannot be stored is simply not memoised
+        with self._lock:
+            self._mem[key] = (res[0], res[1], json.loads(blob)[2])
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO verifications (key, result) VALUES (?, ?)', (key, blob))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'mode': self.mode, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
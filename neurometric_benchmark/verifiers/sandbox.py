@@ -0,0 +1,199 @@
+"""Process-pool sandbox for the Python code verifier.
+
+Model-written code runs in pre-started worker processes instead of the harness
+process. Each worker has an address-space rlimit, and the parent enforces a
+wall-clock limit per candidate: a worker that overruns is killed and replaced,
+and the candidate gets a structured ``timeout`` error instead of stalling the
+run. Calls are thread-safe, so candidates verified from several threads run
+in parallel, one per worker.
+"""
+import os, sys, json, queue, atexit, threading
+import multiprocessing as mp
+from typing import List, Dict, Any, Tuple, Optional
+
+from .python_code import verify_python
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 2)
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_MEMORY_MB = 512
+
+
+def _apply_limits(memory_mb: Optional[int]) -> None:
+    if resource is None or not memory_mb:
+        return
+    limit = int(memory_mb) << 20
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass  # e.g. macOS does not enforce RLIMIT_AS
+    try:
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    except (ValueError, OSError):
+        pass
+
+
+def _worker_main(conn, memory_mb: Optional[int]) -> None:
+    _apply_limits(memory_mb)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        code, fn_name, tests = job
+        try:
+            res = verify_python(code, fn_name, tests)
+        except BaseException as e:  # SystemExit, MemoryError, ... from candidate code
+            res = (False, 0.0, {'error': 'verifier_error', 'detail': f'{type(e).__name__}: {e}'})
+        try:
+            conn.send(res)
+        except Exception:
+            # Test outputs may hold objects that cannot be pickled.
+            conn.send((res[0], res[1], json.loads(json.dumps(res[2], default=repr))))
+
+
+class SandboxPool:
+    """Pool of worker processes that run ``verify_python`` under limits."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, timeout: float = DEFAULT_TIMEOUT, memory_mb: Optional[int] = DEFAULT_MEMORY_MB):
+        methods = mp.get_all_start_methods()
+        # forkserver forks from a clean single-threaded process, which is safe
+        # even when replacements are started while the harness runs threads.
+        self._ctx = mp.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.timeouts = 0
+        self.crashes = 0
+        self.verified = 0
+        self._lock = threading.Lock()
+        self._idle: 'queue.Queue[Tuple[Any, Any]]' = queue.Queue()
+        self._all: List[Tuple[Any, Any]] = []
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> Tuple[Any, Any]:
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(child, self.memory_mb), daemon=True)
+        proc.start()
+        child.close()
+        worker = (proc, parent)
+        with self._lock:
+            self._all.append(worker)
+        return worker
+
+    def _discard(self, worker: Tuple[Any, Any]) -> None:
+        proc, conn = worker
+        if proc.is_alive():
+            proc.kill()
+        proc.join(1.0)
+        conn.close()
+        with self._lock:
+            if worker in self._all:
+                self._all.remove(worker)
+
+    def verify(self, candidate_text: str, fn_name: str, tests: List[Dict[str, Any]]) -> Tuple[bool, float, dict]:
+        """Same contract as ``verify_python``, run in a worker under the limits."""
+        worker = self._idle.get()
+        proc, conn = worker
+        try:
+            conn.send((candidate_text, fn_name, tests))
+            if conn.poll(self.timeout):
+                res = conn.recv()
+                self._idle.put(worker)
+                with self._lock:
+                    self.verified += 1
+                return res
+            err = {'error': 'timeout', 'timeout_sec': self.timeout}
+            kind = 'timeouts'
+        except (EOFError, OSError):
+            err = {'error': 'worker_crashed', 'exitcode': None}
+            kind = 'crashes'
+        self._discard(worker)
+        if kind == 'crashes':
+            err['exitcode'] = proc.exitcode
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+            self.verified += 1
+        self._idle.put(self._spawn())
+        return False, 0.0, err
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'timeout_sec': self.timeout,
+            'memory_mb': self.memory_mb,
+            'verified': self.verified,
+            'timeouts': self.timeouts,
+            'crashes': self.crashes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            workers = list(self._all)
+        for proc, conn in workers:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker[0].join(1.0)
+            self._discard(worker)
+
+
+_POOL: Optional[SandboxPool] = None
+_POOL_LOCK = threading.Lock()
+_SETTINGS: Dict[str, Any] = {'enabled': True, 'workers': DEFAULT_WORKERS, 'timeout': DEFAULT_TIMEOUT, 'memory_mb': DEFAULT_MEMORY_MB}
+
+
+def configure(enabled: Optional[bool] = None, workers: Optional[int] = None, timeout: Optional[float] = None, memory_mb: Optional[int] = None) -> None:
+    """Change sandbox settings; a running pool is shut down and restarted lazily."""
+    global _POOL
+    for k, v in (('enabled', enabled), ('workers', workers), ('timeout', timeout), ('memory_mb', memory_mb)):
+        if v is not None:
+            _SETTINGS[k] = v
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+
+def get_pool() -> Optional[SandboxPool]:
+    """The shared pool, started on first use; None when the sandbox is disabled."""
+    global _POOL
+    if not _SETTINGS['enabled']:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SandboxPool(_SETTINGS['workers'], _SETTINGS['timeout'], _SETTINGS['memory_mb'])
+        return _POOL
+
+
+def stats() -> Optional[Dict[str, Any]]:
+    return _POOL.stats() if _POOL is not None else None
+
+
+def verify_python_sandboxed(candidate_text: str, fn_name: str, tests: List[Dict[str, Any]]) -> Tuple[bool, float, dict]:
+    """``verify_python`` in the shared sandbox pool (in-process if disabled)."""
+    pool = get_pool()
+    if pool is None:
+        return verify_python(candidate_text, fn_name, tests)
+    return pool.verify(candidate_text, fn_name, tests)
+
+
+@atexit.register
+def _shutdown() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.close()
+        _POOL = None
@@ -0,0 +1,17 @@
+from neurometric_benchmark import runners
+
+TASKS = [{'id': f'arith_{i:03d}', 'type': 'numeric', 'prompt': f'What is {i} * 7?', 'answer': float(i * 7)} for i in range(1, 21)]
+
+
+def _wrong_generate(model, prompt, temperature=0.7, **kwargs):
+    """Ten tokens of a wrong answer, so no task ever settles."""
+    return {'text': '1 2 3 4 5 6 7 8 9 0', 'cost_usd': 0.0, 'output_tokens': 10}
+
+
+def test_token_budget_is_not_overrun_by_the_first_round():
+    results, info = runners.run_budgeted(lambda t: _wrong_generate, 'small', TASKS, 0.7, 500, 'tokens',
+                                         wave_size=4, consensus=100, concurrency=4)
+    # A one-sample probe per task (200 tokens), then waves of 4 while 300 tokens last.
+    assert [r['samples_used'] for r in results] == [5] * 7 + [3] + [1] * 12
+    assert info['spent']['tokens'] == 500
+    assert all(r['stop_reason'] == 'budget' for r in results)
@@ -0,0 +1,34 @@
+import functools
+
+from neurometric_benchmark.cache import GenerationCache
+from neurometric_benchmark.runners import _call_model
+
+
+def test_key_covers_sampling_options(tmp_path):
+    cache = GenerationCache(str(tmp_path / 'g.sqlite'), 'write', backend='ollama')
+    base = {'temperature': 0.7, 'top_p': 0.95, 'stream': False}
+    variants = [base, dict(base, top_p=0.5), dict(base, stream=True), dict(base, stream=True, early_stop=True)]
+    keys = {cache.key('m', 'p', opts, 0) for opts in variants}
+    assert len(keys) == len(variants)
+    cache.close()
+
+
+def test_streamed_and_full_samples_do_not_share_entries(tmp_path):
+    calls = []
+
+    def generate(model, prompt, temperature=0.7, top_p=0.95, stream=False, stop_when=None):
+        calls.append((stream, top_p))
+        return {'text': 'cut' if stop_when else 'full answer', 'output_tokens': 1}
+
+    cache = GenerationCache(str(tmp_path / 'g.sqlite'), 'write', backend='fake')
+    streamed = functools.partial(generate, stream=True, stop_when=lambda text: True)
+    assert _call_model(streamed, 'm', 'p', 0.7, cache=cache)['text'] == 'cut'
+    assert _call_model(generate, 'm', 'p', 0.7, cache=cache)['text'] == 'full answer'
+    assert _call_model(functools.partial(generate, top_p=0.5), 'm', 'p', 0.7, cache=cache)['text'] == 'full answer'
+    assert len(calls) == 3
+
+    # Same options again: served from the cache.
+    again = _call_model(streamed, 'm', 'p', 0.7, cache=cache)
+    assert again['cached'] and again['text'] == 'cut'
+    assert len(calls) == 3
+    cache.close()
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from neurometric_benchmark import runners
+from neurometric_benchmark.merge import merge_runs
+
+TASKS = [{'id': f'arith_{i:03d}', 'type': 'numeric', 'prompt': f'What is {i} * 7?', 'answer': float(i * 7)} for i in range(1, 21)]
+ANSWERS = {runners.build_prompt(t): t['answer'] for t in TASKS}
+
+
+def _fake_generate(model, prompt, temperature=0.7, **kwargs):
+    """The big model is always right, the small one on every other task."""
+    answer = ANSWERS[prompt]
+    right = model == 'big' or int(answer) % 2 == 0
+    return {'text': str(answer if right else answer + 1), 'cost_usd': 0.001 if model == 'big' else 0.0,
+            'input_tokens': 5, 'output_tokens': 1}
+
+
+@pytest.fixture
+def task_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(runners, 'load_backend', lambda backend: _fake_generate)
+    path = tmp_path / 'tasks.jsonl'
+    path.write_text(''.join(json.dumps(t) + '\n' for t in TASKS))
+    return str(path)
+
+
+def _run(tmp_path, task_path, name, **kwargs):
+    return runners.evaluate(task_path, 'fake', 'small', temperature=0.7, run_root=str(tmp_path / 'runs'), concurrency=4,
+                            progress_every=0, cache_mode='write', cache_path=str(tmp_path / f'{name}.sqlite'), **kwargs)
+
+
+def _without_timings(block):
+    return {k: v for k, v in block.items() if 'sec' not in k}
+
+
+def test_merged_cascade_shards_match_unsharded_run(tmp_path, task_path):
+    settings = dict(strategy='cascade', n=2, escalate_to='fake2/big', escalate_n=1)
+    whole = _run(tmp_path, task_path, 'whole', **settings)['summary']
+    shards = [_run(tmp_path, task_path, f'shard{i}', shard=f'{i}/2', **settings)['run_dir'] for i in range(2)]
+    merged = merge_runs(shards, run_root=str(tmp_path / 'merged'))['summary']
+
+    assert merged['accuracy'] == whole['accuracy'] == 1.0
+    assert merged['cascade']['escalation_rate'] == whole['cascade']['escalation_rate'] == 0.5
+    assert merged['cascade']['threshold'] == whole['cascade']['threshold']
+    assert [_without_timings(t) for t in merged['cascade']['tiers']] == [_without_timings(t) for t in whole['cascade']['tiers']]
+    assert _without_timings(merged['cascade']['cache']) == _without_timings(whole['cascade']['cache'])
+
+
+def test_merged_budgeted_shards_keep_budget_accounting(tmp_path, task_path):
+    settings = dict(strategy='budgeted', budget=30, budget_unit='samples', n=4)
+    shards = [_run(tmp_path, task_path, f'shard{i}', shard=f'{i}/2', **settings) for i in range(2)]
+    merged = merge_runs([s['run_dir'] for s in shards], run_root=str(tmp_path / 'merged'))['summary']
+
+    assert [s['summary']['budget']['budget'] for s in shards] == [15, 15]
+    assert merged['budget']['budget'] == 30
+    assert merged['budget']['used'] <= 30
+    assert merged['budget']['used'] == sum(s['summary']['budget']['used'] for s in shards)
+    assert sum(merged['budget']['stop_reasons'].values()) == len(TASKS)
+    assert len(merged['budget']['shard_curves']) == 2
@@ -0,0 +1,48 @@
+import json, os
+
+import pytest
+
+from neurometric_benchmark import runners
+from neurometric_benchmark.rescore import rescore_run
+
+TASKS = [{'id': f'arith_{i:03d}', 'type': 'numeric', 'prompt': f'What is {i} * 7?', 'answer': float(i * 7)} for i in range(1, 7)]
+ANSWERS = {runners.build_prompt(t): t['answer'] for t in TASKS}
+
+
+def _fake_generate(model, prompt, temperature=0.7, **kwargs):
+    return {'text': str(ANSWERS[prompt]), 'cost_usd': 0.0, 'input_tokens': 5, 'output_tokens': 1}
+
+
+def _write_tasks(path, tasks):
+    path.write_text(''.join(json.dumps(t) + '\n' for t in tasks))
+    return str(path)
+
+
+@pytest.fixture
+def source_run(tmp_path, monkeypatch):
+    """An adaptive run that stopped every task at its first (perfect) sample."""
+    real_load_backend = runners.load_backend
+    monkeypatch.setattr(runners, 'load_backend', lambda backend: _fake_generate if backend == 'fake' else real_load_backend(backend))
+    task_path = _write_tasks(tmp_path / 'tasks.jsonl', TASKS)
+    out = runners.evaluate(task_path, 'fake', 'small', 'adaptive_best_of_n', 0.7, n=8, wave_size=1, run_root=str(tmp_path / 'runs'),
+                           progress_every=0)
+    assert out['summary']['accuracy'] == 1.0
+    return out['run_dir']
+
+
+def test_rescore_with_corrected_gold_scores_the_stored_samples(tmp_path, source_run):
+    corrected = [dict(t, answer=t['answer'] + 1) if i % 2 else t for i, t in enumerate(TASKS)]
+    task_path = _write_tasks(tmp_path / 'corrected.jsonl', corrected)
+    out = rescore_run(source_run, run_root=str(tmp_path / 'rescored'), task_path=task_path)
+
+    records = [json.loads(line) for line in open(os.path.join(out['run_dir'], 'details.jsonl'))]
+    assert [r['samples_used'] for r in records] == [1] * len(TASKS)
+    assert [r['stop_reason'] for r in records] == ['perfect', 'replay_exhausted'] * (len(TASKS) // 2)
+    assert [r['ok'] for r in records] == [True, False] * (len(TASKS) // 2)
+    assert out['summary']['accuracy'] == 0.5
+
+
+def test_rescore_rejects_n_above_the_stored_samples(tmp_path, source_run):
+    with pytest.raises(ValueError):
+        rescore_run(source_run, run_root=str(tmp_path / 'rescored'), strategy='best_of_n', n=2)
+    assert not os.path.exists(tmp_path / 'rescored')
@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.startup import CHECKS, _importtime, _leaked
+
+
+@pytest.mark.parametrize('module,forbidden', [(module, forbidden) for module, _, forbidden in CHECKS])
+def test_entry_point_keeps_heavy_imports_lazy(module, forbidden):
+    # Timings stay in `make bench-startup`; which modules load is deterministic.
+    times = _importtime(module)
+    assert module in times
+    assert _leaked(times, forbidden) == []
@@ -0,0 +1,15 @@
+from neurometric_benchmark.utils.text import numeric_answer_complete
+
+
+def test_bare_intermediate_number_does_not_complete_a_numeric_answer():
+    text = 'Each box holds 6 * 7 apples.\n42\nThere are 3 boxes, so 3 * 42 = 126.\n'
+    assert not numeric_answer_complete(text)
+    assert numeric_answer_complete(text + 'Final answer: 126\n')
+    assert not numeric_answer_complete(text + 'Final answer: 126')  # line not finished yet
+
+
+def test_bare_number_completes_when_it_opens_the_completion():
+    # The prompt ends in "Final answer: ", so the first line carries the marker.
+    assert numeric_answer_complete('126\n')
+    assert numeric_answer_complete('\n**126**\nBecause 3 * 42 = 126.')
+    assert not numeric_answer_complete('126')